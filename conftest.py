@@ -0,0 +1 @@
+"""Configuration pytest : la racine du dépôt est ajoutée au sys.path (imports `src.…` et `config`)."""
@@ -1,61 +1,275 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS 
 from werkzeug.utils import secure_filename
-import os
+import json
+import threading
+import time
 import spacy
 
-from src.data_process.utils import simple_cleaning, check_label, detected_language
-from src.path_finding.dijkstra import load_and_merge_data, build_graph, get_fastest_route_for_city, load_graph, \
-    save_graph
-from src.voice_process.hear_voice import process_m4a_file
-from config import model_used_path, UPLOAD_FOLDER, DIJKSTRA_Route
+from src.data_process.utils import simple_cleaning, check_label, detected_language, detected_languages
+from src.path_finding.dijkstra import load_and_merge_data, build_station_graph, get_fastest_route_for_city, load_station_graph, \
+    save_graph, gtfs_fingerprint, load_commune_stations, COMMUNE_STATIONS_PATH
+from src.path_finding.stations import StationIndex
+from src.path_finding.astar import GeoBounds
+from src.path_finding.contraction import ContractionHierarchy
+from src.path_finding.route_table import RouteTable, table_fingerprint
+from src.path_finding.legs import LegPool
+from src.path_finding.csa import Timetable, get_earliest_route_for_city, get_pareto_routes_for_city, time_to_seconds, \
+    parse_date, parse_flag, parse_time
+from src.voice_process.hear_voice import process_audio, audio_format, check_audio, AudioRejected, SpeechUnavailable
+from src.voice_process.audio_pool import AudioPool, QueueFull
+from src.path_finding.route_cache import RouteCache
+# Registers the gazetteer components: models saved with them can be loaded
+from src.models.gazetteer import add_station_gazetteer
+import config
+from config import model_used_path, DIJKSTRA_Route
+
+# Optional settings: older config.py files do not define them
+ROUTE_CACHE_SIZE = getattr(config, "ROUTE_CACHE_SIZE", 4096)
+ROUTE_CACHE_TTL = getattr(config, "ROUTE_CACHE_TTL", 3600)
+ROUTE_CACHE_PATH = getattr(config, "ROUTE_CACHE_PATH", None)
+NLP_BATCH_SIZE = getattr(config, "NLP_BATCH_SIZE", 64)
+NLP_N_PROCESS = getattr(config, "NLP_N_PROCESS", 1)
+STARTUP_BUDGET = getattr(config, "STARTUP_BUDGET", 10)
+ROUTE_SEARCH = getattr(config, "ROUTE_SEARCH", "dijkstra")
+CONTRACTION_HIERARCHY = getattr(config, "CONTRACTION_HIERARCHY", None)
+ROUTE_TABLE = getattr(config, "ROUTE_TABLE", None)
+ROUTE_WORKERS = getattr(config, "ROUTE_WORKERS", 0)
+# "google" (online) or "vosk" (offline, needs the vosk package and a model directory)
+SPEECH_BACKEND = getattr(config, "SPEECH_BACKEND", "google")
+VOSK_MODEL_PATH = getattr(config, "VOSK_MODEL_PATH", None)
+# Uploaded audio: transcoding threads, files in flight per thread before answering 429, and limits
+AUDIO_WORKERS = getattr(config, "AUDIO_WORKERS", 2)
+AUDIO_QUEUE_PER_WORKER = getattr(config, "AUDIO_QUEUE_PER_WORKER", 4)
+AUDIO_MAX_BYTES = getattr(config, "AUDIO_MAX_BYTES", 10 * 1024 * 1024)
+AUDIO_MAX_SECONDS = getattr(config, "AUDIO_MAX_SECONDS", 60)
+# Add the station gazetteer around the NER when the model was not saved with it
+STATION_GAZETTEER = getattr(config, "STATION_GAZETTEER", False)
+
+# Departure time of /api/route, /api/route_batch and /api/voice_route (checked by parse_time)
+TIME_ERROR = "Heure de départ invalide, format attendu : HH:MM ou HH:MM:SS."
+PARETO_ERROR = "Option pareto invalide, valeurs attendues : true ou false."
 
 app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origin": "*"}})
 
-nlp = spacy.load(model_used_path)
+# Heavy resources are loaded in the background so that the process answers
+# /api/health immediately; /api/ready reports when they are available.
+nlp = None
+graphique_dijkstra = None
+station_index = None
+geo_bounds = None
+hierarchy = None
+route_table = None
+graph_fingerprint = None
+leg_pool = None
+timetable = None
+route_cache = RouteCache(ROUTE_CACHE_SIZE, ROUTE_CACHE_TTL, ROUTE_CACHE_PATH)
+audio_pool = AudioPool(AUDIO_WORKERS, AUDIO_WORKERS * AUDIO_QUEUE_PER_WORKER)
+startup = {"ready": threading.Event(), "error": None, "timings": {}}
+timetable_lock = threading.Lock()
 
 
-print("Loading data and building graph...")
-stops, stop_times, trips, routes, calendar_dates, commune_stations = load_and_merge_data()
-if os.path.exists(DIJKSTRA_Route):
-    print("Loading graph from file...")
-    graphique_dijkstra = load_graph(DIJKSTRA_Route)
-else:
-    print("Building graph...")
-    graphique_dijkstra = build_graph(stops, stop_times, trips, routes)
-    save_graph(graphique_dijkstra, DIJKSTRA_Route)
+def timed_step(name, function, *args):
+    """Run one startup step and record its duration in seconds."""
+    start = time.perf_counter()
+    result = function(*args)
+    startup["timings"][name] = round(time.perf_counter() - start, 3)
+    return result
 
-@app.route('/api/route', methods=['POST'])
-def process_route():
-    data = request.json
-    text = data.get('text', '')
-    responses = []
-    error_nlp = []
-    itinerary = []
-    error_route = []
 
-    # Detect langage of the text
-    is_french = detected_language(text)
-    if is_french:
-        # Clean the text
-        text_cleaned = simple_cleaning(text)
-        text_cleaned = text_cleaned.lower()
+def load_resources():
+    """Load the NER model, the graph (from its cache when it is up to date) and the station index."""
+    global nlp, graphique_dijkstra, station_index, geo_bounds, hierarchy, route_table, graph_fingerprint
+    try:
+        start = time.perf_counter()
+        nlp = timed_step("nlp", spacy.load, model_used_path)
+        if STATION_GAZETTEER and "station_gazetteer" not in nlp.pipe_names:
+            timed_step("gazetteer", add_station_gazetteer, nlp)
 
-        # Predict entities
-        doc = nlp(text_cleaned)
-        predicted_entities = [
-            {"start": ent.start_char, "end": ent.end_char, "label": ent.label_}
-            for ent in doc.ents
-        ]
+        print("Loading graph...")
+        fingerprint = timed_step("fingerprint", gtfs_fingerprint)
+        # The array-backed graph is memory-mapped: workers share its pages
+        graph = timed_step("graph_cache", load_station_graph, DIJKSTRA_Route, fingerprint)
+        if graph is None:
+            # stop_times is only parsed when the cached graph is missing or stale
+            print("Building graph...")
+            stops, stop_times, trips, routes, _, _ = timed_step("gtfs", load_and_merge_data)
+            save_graph(timed_step("graph_build", build_station_graph, stops, stop_times, trips, routes), DIJKSTRA_Route, fingerprint)
+            graph = load_station_graph(DIJKSTRA_Route, fingerprint)
+        commune_stations = timed_step("communes", load_commune_stations)
+        station_index = timed_step("station_index", StationIndex, commune_stations, graph)
+        if ROUTE_SEARCH == "astar":
+            geo_bounds = timed_step("geo_bounds", GeoBounds, graph)
+        if CONTRACTION_HIERARCHY:
+            # Built offline by `python -m src.path_finding.contraction build`; ignored when stale
+            hierarchy = timed_step("hierarchy", ContractionHierarchy.load, CONTRACTION_HIERARCHY, fingerprint)
+            if hierarchy is None:
+                print(f"No up-to-date contraction hierarchy in {CONTRACTION_HIERARCHY}, using {ROUTE_SEARCH}")
+        if ROUTE_TABLE:
+            # Built offline by `python -m src.path_finding.route_table build`; ignored when stale
+            route_table = timed_step(
+                "route_table", RouteTable.load, ROUTE_TABLE, table_fingerprint(fingerprint, COMMUNE_STATIONS_PATH)
+            )
+            if route_table is None:
+                print(f"No up-to-date route table in {ROUTE_TABLE}, every route is searched live")
+        graph_fingerprint = fingerprint
+        start_leg_pool()
+        graphique_dijkstra = graph
+        route_cache.clear(fingerprint)
+
+        total = time.perf_counter() - start
+        startup["timings"]["total"] = round(total, 3)
+        print(f"Ready in {total:.2f}s: {startup['timings']}")
+        if total > STARTUP_BUDGET:
+            print(f"Startup exceeded its {STARTUP_BUDGET}s budget")
+    except Exception as e:
+        startup["error"] = repr(e)
+        raise
+    finally:
+        startup["ready"].set()
+
+
+def start_leg_pool():
+    """Start the leg pool (ROUTE_WORKERS > 0) unless this process already has one."""
+    global leg_pool
+    if ROUTE_WORKERS and leg_pool is None:
+        # Worker processes map the same graph files: legs of a route are searched in parallel
+        leg_pool = timed_step(
+            "leg_pool", LegPool, ROUTE_WORKERS, DIJKSTRA_Route, graph_fingerprint, ROUTE_SEARCH == "astar",
+            CONTRACTION_HIERARCHY, ROUTE_TABLE,
+        )
+
+
+def stop_leg_pool():
+    """Shut the leg pool down: a process pool inherited through fork hangs, forked processes start their own."""
+    global leg_pool
+    if leg_pool is not None:
+        leg_pool.shutdown()
+        leg_pool = None
+
+
+def get_timetable():
+    """Build the timetable on the first request with a departure time (it needs stop_times)."""
+    global timetable
+    with timetable_lock:
+        if timetable is None:
+            stops, stop_times, trips, routes, calendar_dates, _ = load_and_merge_data()
+            timetable = timed_step("timetable", Timetable, stops, stop_times, trips, routes, calendar_dates)
+    return timetable
+
+
+def is_ready():
+    return startup["ready"].is_set() and startup["error"] is None
+
+
+@app.before_request
+def wait_for_resources():
+    if request.path.startswith("/api/") and request.path not in ("/api/health", "/api/ready") and not is_ready():
+        return jsonify({"error": "Service en cours de démarrage."}), 503, {"Retry-After": "5"}
+
+
+threading.Thread(target=load_resources, name="load_resources", daemon=True).start()
+
+
+def bounded_int(value, maximum):
+    """Integer request option clamped to [1, maximum] (`maximum` when absent); ValueError if not an integer."""
+    if value is None:
+        return maximum
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f"not an integer: {value!r}")
+    return min(max(int(value), 1), maximum)
 
-        # Check label of entities
-        predicted_entities, error_nlp = check_label(predicted_entities)
+
+def find_route(departure_city, arrival_city, departure_time=None, day=None, pareto=False):
+    """
+    Static route (Dijkstra), or timetable route (CSA) when a departure time or a date is given.
+
+    With `pareto`, return the list of journeys trading arrival time against correspondances.
+    """
+    if departure_time is None and day is None and not pareto:
+        return get_fastest_route_for_city(
+            graphique_dijkstra, station_index, departure_city, arrival_city, geo_bounds, hierarchy, route_table
+        )
+    if departure_time is None:
+        # A date alone means the first trains of that day
+        departure_time = 0
+    if pareto:
+        return get_pareto_routes_for_city(get_timetable(), graphique_dijkstra, station_index, departure_city, arrival_city, departure_time, day)
+    return get_earliest_route_for_city(get_timetable(), graphique_dijkstra, station_index, departure_city, arrival_city, departure_time, day)
+
+
+def itinerary_legs(cities_for_route, departure_time=None, day=None, pareto=False):
+    """Yield (route_part, error) for every leg DEPART -> CORRESPONDANCE(s) -> ARRIVEE, in order, as soon as it is computed."""
+    if not cities_for_route["CORRESPONDANCE"]:
+        # Without correspondance
+        if cities_for_route["DEPART"] and cities_for_route["ARRIVEE"]:
+            yield find_route(cities_for_route["DEPART"], cities_for_route["ARRIVEE"], departure_time, day, pareto)
+    elif departure_time is None and day is None and not pareto:
+        # With correspondance, static legs are independent: searched in parallel when a pool is configured
+        stops = [cities_for_route["DEPART"], *cities_for_route["CORRESPONDANCE"], cities_for_route["ARRIVEE"]]
+        legs = list(zip(stops, stops[1:]))
+        if leg_pool is not None:
+            yield from leg_pool.iter_routes(legs)
+        else:
+            for departure, arrival in legs:
+                yield find_route(departure, arrival)
     else:
-        error_nlp.append("NOT_FRENCH")
+        # With correspondance and a departure time: each leg leaves after the previous one arrives
+        prev_stop = cities_for_route["DEPART"]
+        for correspondance in cities_for_route["CORRESPONDANCE"]:
+            route_part, error_ = find_route(prev_stop, correspondance, departure_time, day, pareto)
+            prev_stop = correspondance
+            # The next leg leaves after the arrival of the previous one (the fastest journey with pareto)
+            if route_part:
+                fastest = route_part[-1] if pareto else route_part
+                departure_time = time_to_seconds(fastest["Heure_arrivee"])
+            yield route_part, error_
 
-    # Get the cities from NLP model
+        yield find_route(prev_stop, cities_for_route["ARRIVEE"], departure_time, day, pareto)
+
+
+def collect_itinerary(cities_for_route, legs):
+    """Turn the (route_part, error) of every leg into (itinerary, error_route)."""
+    itinerary = [route_part for route_part, _ in legs]
+    if not cities_for_route["CORRESPONDANCE"]:
+        # A single leg keeps the error of find_route as is
+        return itinerary, legs[0][1] if legs else []
+    return itinerary, [error_ for _, error_ in legs]
+
+
+def resolve_itinerary(cities_for_route, departure_time=None, day=None, pareto=False):
+    """Compute every leg DEPART -> CORRESPONDANCE(s) -> ARRIVEE and return (itinerary, error_route)."""
+    return collect_itinerary(cities_for_route, list(itinerary_legs(cities_for_route, departure_time, day, pareto)))
+
+
+def clean_text(text):
+    """Return the cleaned, lower-cased text when it is French, otherwise None."""
+    # Detect langage of the text
+    if not detected_language(text):
+        return None
+    # Clean the text
+    return simple_cleaning(text).lower()
+
+
+def clean_texts(texts):
+    """clean_text for a batch: the language of all the texts is detected at once."""
+    return [simple_cleaning(text).lower() if french else None for text, french in zip(texts, detected_languages(texts))]
+
+
+def extract_cities(text_cleaned, doc):
+    """Turn the NER output into (responses, cities_for_route, error_nlp)."""
+    responses = []
     cities_for_route = {"DEPART": None, "ARRIVEE": None, "CORRESPONDANCE": []}
+    predicted_entities = [
+        {"start": ent.start_char, "end": ent.end_char, "label": ent.label_}
+        for ent in doc.ents
+    ]
+
+    # Check label of entities
+    predicted_entities, error_nlp = check_label(predicted_entities)
+
+    # Get the cities from NLP model
     if not error_nlp:
         # Formate the responses
         for cities in predicted_entities:
@@ -71,43 +285,280 @@ def process_route():
                 cities_for_route["ARRIVEE"] = word
             elif label == "CORRESPONDANCE":
                 cities_for_route["CORRESPONDANCE"].append(word)
+    return responses, cities_for_route, error_nlp
+
+
+def route_key(cities_for_route, departure_time=None, day=None, pareto=False):
+    """Cache key of an itinerary request (pareto only appears in the key when it is enabled)."""
+    return route_cache.make_key(
+        cities_for_route["DEPART"], cities_for_route["ARRIVEE"], cities_for_route["CORRESPONDANCE"],
+        departure_time, day, "pareto" if pareto else None,
+    )
+
+
+def cached_itinerary(cities_for_route, departure_time=None, day=None, pareto=False):
+    """Get the fastest route (cached per normalized city chain, departure time, date and pareto option)."""
+    cache_key = route_key(cities_for_route, departure_time, day, pareto)
+    return route_cache.get_or_compute(cache_key, lambda: resolve_itinerary(cities_for_route, departure_time, day, pareto))
 
-        # Get the fastest route
-        if not cities_for_route["CORRESPONDANCE"]:
-            # Without correspondance
-            if cities_for_route["DEPART"] and cities_for_route["ARRIVEE"]:
-                route_part, error_route = get_fastest_route_for_city(graphique_dijkstra, commune_stations, cities_for_route["DEPART"], cities_for_route["ARRIVEE"])
-                itinerary.append(route_part)
-        else:
-            # With correspondance
-            prev_stop = cities_for_route["DEPART"]
-            for correspondance in cities_for_route["CORRESPONDANCE"]:
-                route_part, error_ = get_fastest_route_for_city(graphique_dijkstra, commune_stations, prev_stop, correspondance)
-                prev_stop = correspondance
-                itinerary.append(route_part)
-                error_route.append(error_)
-
-            route_part, error_ = get_fastest_route_for_city(graphique_dijkstra, commune_stations, prev_stop, cities_for_route["ARRIVEE"])
-            itinerary.append(route_part)
-            error_route.append(error_)
 
+def route_response(data):
+    """Answer a /api/route request body: return (payload, HTTP status)."""
+    text = data.get('text', '')
+    try:
+        departure_time = parse_time(data.get('departure_time'))
+    except ValueError:
+        return {"error": TIME_ERROR}, 400
+    try:
+        day = parse_date(data.get('date'))
+    except ValueError:
+        return {"error": "Date invalide, format attendu : AAAA-MM-JJ."}, 400
+    try:
+        pareto = parse_flag(data.get('pareto'))
+    except ValueError:
+        return {"error": PARETO_ERROR}, 400
+    responses = []
+    error_nlp = []
+    itinerary = []
+    error_route = []
+
+    text_cleaned = clean_text(text)
+    if text_cleaned is not None:
+        # Predict entities
+        doc = nlp(text_cleaned)
+        responses, cities_for_route, error_nlp = extract_cities(text_cleaned, doc)
+    else:
+        error_nlp.append("NOT_FRENCH")
+
+    if not error_nlp:
+        itinerary, error_route = cached_itinerary(cities_for_route, departure_time, day, pareto)
         print("Itinerary: ", itinerary)
 
-    return jsonify({"text": text, "responsesmodel": responses, "itinerary": itinerary, "error_nlp": error_nlp, "error_route": error_route})
+    return {"text": text, "responsesmodel": responses, "itinerary": itinerary, "error_nlp": error_nlp, "error_route": error_route}, 200
+
+
+def route_batch_response(data):
+    """Answer a /api/route_batch request body: return (payload, HTTP status)."""
+    texts = data.get('texts', [])
+    if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+        return {"error": "texts doit être une liste de textes."}, 400
+    try:
+        departure_time = parse_time(data.get('departure_time'))
+    except ValueError:
+        return {"error": TIME_ERROR}, 400
+    try:
+        day = parse_date(data.get('date'))
+    except ValueError:
+        return {"error": "Date invalide, format attendu : AAAA-MM-JJ."}, 400
+    try:
+        pareto = parse_flag(data.get('pareto'))
+    except ValueError:
+        return {"error": PARETO_ERROR}, 400
+    try:
+        # Clients may lower the configured values, never raise them
+        batch_size = bounded_int(data.get('batch_size'), NLP_BATCH_SIZE)
+        n_process = bounded_int(data.get('n_process'), NLP_N_PROCESS)
+    except ValueError:
+        return {"error": "batch_size et n_process doivent être des entiers."}, 400
+
+    results = [{"text": text, "responsesmodel": [], "itinerary": [], "error_nlp": [], "error_route": []} for text in texts]
+
+    # Clean every text, then run spaCy once over all the French ones
+    cleaned = list(enumerate(clean_texts(texts)))
+    french = [(index, text_cleaned) for index, text_cleaned in cleaned if text_cleaned is not None]
+    for index, text_cleaned in cleaned:
+        if text_cleaned is None:
+            results[index]["error_nlp"].append("NOT_FRENCH")
+
+    docs = nlp.pipe((text_cleaned for _, text_cleaned in french), batch_size=batch_size, n_process=n_process)
+    pending = {}
+    for (index, text_cleaned), doc in zip(french, docs):
+        responses, cities_for_route, error_nlp = extract_cities(text_cleaned, doc)
+        results[index]["responsesmodel"] = responses
+        results[index]["error_nlp"] = error_nlp
+        if not error_nlp:
+            # Identical city chains are computed only once
+            key = route_key(cities_for_route, departure_time, day, pareto)
+            pending.setdefault(key, (cities_for_route, []))[1].append(index)
+
+    for cities_for_route, indexes in pending.values():
+        itinerary, error_route = cached_itinerary(cities_for_route, departure_time, day, pareto)
+        for index in indexes:
+            results[index]["itinerary"] = itinerary
+            results[index]["error_route"] = error_route
+
+    return {"results": results}, 200
+
+
+def transcribe_upload(data, filename):
+    return process_audio(data, filename, SPEECH_BACKEND, VOSK_MODEL_PATH, AUDIO_MAX_BYTES, AUDIO_MAX_SECONDS)
+
+
+def sse(event, payload):
+    """One Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def voice_route_events(transcription, departure_time=None, day=None, pareto=False):
+    """
+    Server-Sent Events of /api/voice_route: the transcript, then the NER entities, then every leg
+    as soon as it is computed, then the complete answer (same fields as /api/route).
+
+    `transcription` is the future of the upload in the audio pool.
+    """
+    # Sent at once: the client knows the upload was accepted while the audio is transcribed
+    yield ": transcription\n\n"
+    try:
+        text = transcription.result()
+    except SpeechUnavailable as e:
+        yield sse("error", {"error": str(e)})
+        return
+    except ValueError as e:
+        yield sse("error", {"error": str(e) if isinstance(e, AudioRejected) else "Fichier audio illisible."})
+        return
+    if not text:
+        yield sse("error", {"error": "Échec de la transcription."})
+        return
+    yield sse("transcript", {"text": text})
+    yield from route_events(text, departure_time, day, pareto)
+
+
+def route_events(text, departure_time=None, day=None, pareto=False):
+    """Events of /api/voice_route that follow the transcript: entities, every leg as it is computed, done."""
+    responses = []
+    error_nlp = []
+    itinerary = []
+    error_route = []
+    text_cleaned = clean_text(text)
+    if text_cleaned is not None:
+        responses, cities_for_route, error_nlp = extract_cities(text_cleaned, nlp(text_cleaned))
+    else:
+        error_nlp.append("NOT_FRENCH")
+    yield sse("entities", {"responsesmodel": responses, "error_nlp": error_nlp})
+
+    if not error_nlp:
+        cache_key = route_key(cities_for_route, departure_time, day, pareto)
+        cached = route_cache.get(cache_key)
+        if cached is not None:
+            itinerary, error_route = cached
+            errors = error_route if cities_for_route["CORRESPONDANCE"] else [error_route] * len(itinerary)
+            for index, (route_part, error_) in enumerate(zip(itinerary, errors)):
+                yield sse("leg", {"index": index, "route": route_part, "error": error_})
+        else:
+            legs = []
+            for index, (route_part, error_) in enumerate(itinerary_legs(cities_for_route, departure_time, day, pareto)):
+                legs.append((route_part, error_))
+                yield sse("leg", {"index": index, "route": route_part, "error": error_})
+            itinerary, error_route = collect_itinerary(cities_for_route, legs)
+            route_cache.set(cache_key, (itinerary, error_route))
+
+    yield sse("done", {"text": text, "responsesmodel": responses, "itinerary": itinerary, "error_nlp": error_nlp,
+                       "error_route": error_route})
+
+
+@app.route('/api/route', methods=['POST'])
+def process_route():
+    payload, status = route_response(request.json)
+    return jsonify(payload), status
+
+@app.route('/api/route_batch', methods=['POST'])
+def process_route_batch():
+    payload, status = route_batch_response(request.json)
+    return jsonify(payload), status
+
+@app.route('/api/health', methods=['GET'])
+def health():
+    return jsonify({"status": "ok"})
+
+@app.route('/api/ready', methods=['GET'])
+def ready():
+    if startup["error"] is not None:
+        return jsonify({"status": "error", "error": startup["error"], "timings": startup["timings"]}), 500
+    if not is_ready():
+        return jsonify({"status": "starting", "timings": startup["timings"]}), 503
+    return jsonify({"status": "ready", "timings": startup["timings"]})
+
+@app.route('/api/route/cache', methods=['GET'])
+def route_cache_stats():
+    return jsonify(route_cache.stats())
+
+@app.route('/api/pools', methods=['GET'])
+def pool_stats():
+    return jsonify({"audio": audio_pool.stats()})
+
+@app.route('/api/voice_route', methods=['POST'])
+def voice_route():
+    """Audio in, itinerary out in a single request, streamed as Server-Sent Events (see voice_route_events)."""
+    if request.content_length is not None and request.content_length > AUDIO_MAX_BYTES + 1024:
+        return jsonify({"error": f"Fichier audio trop volumineux (maximum {AUDIO_MAX_BYTES} octets)."}), 413
+
+    file = request.files.get('file')
+    if file is None or file.filename == '':
+        return jsonify({"error": "Aucun fichier sélectionné."}), 400
+    filename = secure_filename(file.filename)
+    fmt = audio_format(filename)
+    if fmt is None:
+        return jsonify({"error": "Format du fichier non supporté"}), 400
+    try:
+        day = parse_date(request.form.get('date'))
+    except ValueError:
+        return jsonify({"error": "Date invalide, format attendu : AAAA-MM-JJ."}), 400
+    try:
+        departure_time = parse_time(request.form.get('departure_time'))
+    except ValueError:
+        return jsonify({"error": TIME_ERROR}), 400
+    try:
+        pareto = parse_flag(request.form.get('pareto'))
+    except ValueError:
+        return jsonify({"error": PARETO_ERROR}), 400
+
+    # Errors known before the stream starts keep their HTTP status
+    data = file.read()
+    try:
+        check_audio(data, fmt, AUDIO_MAX_BYTES, AUDIO_MAX_SECONDS)
+        transcription = audio_pool.submit(transcribe_upload, data, filename)
+    except QueueFull:
+        return jsonify({"error": "Serveur surchargé, réessayez plus tard."}), 429, {"Retry-After": "1"}
+    except AudioRejected as e:
+        return jsonify({"error": str(e)}), 413
+    except ValueError:
+        return jsonify({"error": "Fichier audio illisible."}), 400
+
+    return Response(
+        voice_route_events(transcription, departure_time, day, pareto),
+        mimetype="text/event-stream",
+        # Proxies must not buffer the events
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.route('/api/convert_audio', methods=['POST'])
 def convert_audio():
+    # Checked before the multipart body is parsed (1 KB of slack for the form headers)
+    if request.content_length is not None and request.content_length > AUDIO_MAX_BYTES + 1024:
+        return jsonify({"error": f"Fichier audio trop volumineux (maximum {AUDIO_MAX_BYTES} octets)."}), 413
 
     file = request.files['file']
     if file.filename == '':
         return jsonify({"error": "Aucun fichier sélectionné."}), 400
 
     if file :
+        # Decoded in memory, without a wav file (werkzeug may still spool a large upload to a temporary file)
         filename = secure_filename(file.filename)
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
-
-        transcribed_text = process_m4a_file(filepath)
+        data = file.read()
+        try:
+            # Size and duration are checked before the file takes a place in the transcoding pool
+            fmt = audio_format(filename)
+            if fmt is not None:
+                check_audio(data, fmt, AUDIO_MAX_BYTES, AUDIO_MAX_SECONDS)
+            transcribed_text = audio_pool.run(transcribe_upload, data, filename)
+        except QueueFull:
+            return jsonify({"error": "Serveur surchargé, réessayez plus tard."}), 429, {"Retry-After": "1"}
+        except AudioRejected as e:
+            return jsonify({"error": str(e)}), 413
+        except ValueError:
+            return jsonify({"error": "Fichier audio illisible."}), 400
+        except SpeechUnavailable as e:
+            return jsonify({"error": str(e)}), 503
 
         if transcribed_text:
             return jsonify({"transcribedText": transcribed_text})
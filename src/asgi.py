@@ -0,0 +1,411 @@
+"""ASGI variant of the API (Starlette), for `uvicorn src.asgi:app`.
+
+Request handling is async; the CPU-bound work runs in bounded process pools:
+- the route pool runs spaCy and the route search: each worker imports src.app,
+  which loads the model, the graph and the station index once per process;
+- the audio pool runs the conversion and transcription of uploaded files, so a
+  slow /api/convert_audio never delays route requests.
+
+A voice route streams its events from the route worker through a manager queue:
+each leg is sent as soon as the worker has computed it.
+
+When a pool already has `queue_size` requests in flight, new requests get a 429
+with a Retry-After header instead of waiting in an unbounded queue.
+
+With ASGI_PRELOAD, the server process loads the model, the graph and the station
+index before forking the route workers: their pages are shared copy-on-write
+instead of being loaded again by every worker.
+"""
+
+import asyncio
+import gc
+import json
+import multiprocessing
+import multiprocessing.util
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+from werkzeug.utils import secure_filename
+
+import config
+from src.path_finding.csa import parse_date, parse_flag, parse_time
+from src.voice_process.hear_voice import AudioRejected, SpeechUnavailable, audio_format, check_audio
+
+# Optional settings: older config.py files do not define them
+ASGI_ROUTE_WORKERS = getattr(config, "ASGI_ROUTE_WORKERS", os.cpu_count())
+ASGI_AUDIO_WORKERS = getattr(config, "ASGI_AUDIO_WORKERS", 1)
+# Requests in flight per worker before answering 429
+ASGI_QUEUE_PER_WORKER = getattr(config, "ASGI_QUEUE_PER_WORKER", 4)
+ASGI_PRELOAD = getattr(config, "ASGI_PRELOAD", False)
+SPEECH_BACKEND = getattr(config, "SPEECH_BACKEND", "google")
+VOSK_MODEL_PATH = getattr(config, "VOSK_MODEL_PATH", None)
+AUDIO_MAX_BYTES = getattr(config, "AUDIO_MAX_BYTES", 10 * 1024 * 1024)
+AUDIO_MAX_SECONDS = getattr(config, "AUDIO_MAX_SECONDS", 60)
+
+
+def preload_resources():
+    """Load the route resources in the server process, before the route workers are forked."""
+    import src.app as service
+
+    wait_for_resources(service)
+    # The leg pool's processes and threads would not survive the fork: each route worker starts its own
+    service.stop_leg_pool()
+    for thread in threading.enumerate():
+        if thread.name == "load_resources":
+            thread.join()
+    # Objects loaded so far are never collected: the GC no longer writes to their pages in the workers
+    gc.freeze()
+
+
+def wait_for_resources(service):
+    """Wait until src.app has loaded its resources (it starts loading them on import)."""
+    service.startup["ready"].wait()
+    if service.startup["error"] is not None:
+        raise RuntimeError(service.startup["error"])
+
+
+def init_route_worker():
+    """Load the model, the graph, the station index and the leg pool in the worker."""
+    import src.app as service
+
+    wait_for_resources(service)
+    # Forked from a preloaded server, the worker has the resources but no leg pool
+    service.start_leg_pool()
+    # Run when the worker exits, before multiprocessing waits for its children (the leg processes)
+    multiprocessing.util.Finalize(None, service.stop_leg_pool, exitpriority=10)
+
+
+def route_task(data):
+    import src.app as service
+
+    return service.route_response(data)
+
+
+def route_batch_task(data):
+    import src.app as service
+
+    return service.route_batch_response(data)
+
+
+def route_events_task(events, text, departure_time, day, pareto):
+    import src.app as service
+
+    # The events of a voice route after its transcript (entities, legs, done), put in the manager
+    # queue `events` as soon as each one is computed, then None
+    try:
+        for event in service.route_events(text, departure_time, day, pareto):
+            events.put(event)
+    finally:
+        events.put(None)
+
+
+def route_cache_task():
+    import src.app as service
+
+    # Each worker has its own cache (shared only through ROUTE_CACHE_PATH): the stats of the worker that ran this
+    # task, not of the whole pool (a ProcessPoolExecutor cannot address each of its workers)
+    return {"scope": "worker", "worker": os.getpid(), **service.route_cache.stats()}
+
+
+def transcribe_task(data, filename):
+    from src.voice_process.hear_voice import process_audio
+
+    return process_audio(data, filename, SPEECH_BACKEND, VOSK_MODEL_PATH, AUDIO_MAX_BYTES, AUDIO_MAX_SECONDS)
+
+
+def worker_ready(_=None):
+    return True
+
+
+class QueueFull(Exception):
+    """The pool already has as many requests in flight as it accepts."""
+
+
+class BoundedPool:
+    """Process pool that refuses new work once `queue_size` tasks are submitted and not finished."""
+
+    def __init__(self, workers, queue_size, initializer=None, start_method="spawn"):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        # spawn (default): workers never inherit the event loop or the server's threads;
+        # fork: workers share the pages of everything the server loaded before the fork
+        self._executor = ProcessPoolExecutor(
+            workers, mp_context=multiprocessing.get_context(start_method), initializer=initializer
+        )
+
+    def submit(self, function, *args):
+        """Asyncio future of function(*args) in a worker; QueueFull at once if the pool is full."""
+        if self.in_flight >= self.queue_size:
+            self.rejected += 1
+            raise QueueFull()
+        # Counted only once the executor accepted the task (run_in_executor raises on a broken pool)
+        future = asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, _):
+        self.in_flight -= 1
+        self.completed += 1
+
+    async def run(self, function, *args):
+        return await self.submit(function, *args)
+
+    async def warm_up(self):
+        """Start every worker now (and run its initializer) instead of on the first requests."""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self._executor, worker_ready) for _ in range(self.workers)))
+
+    def pids(self):
+        """Process ids of the started workers."""
+        return [process.pid for process in (self._executor._processes or {}).values()]
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "in_flight": self.in_flight,
+            # Tasks submitted but not yet picked up by a worker
+            "queued": max(0, self.in_flight - self.workers),
+            "max_in_flight": self.max_in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def sse(event, payload):
+    """One Server-Sent Event (same format as src.app.sse)."""
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def service_starting():
+    return JSONResponse({"error": "Service en cours de démarrage."}, status_code=503, headers={"Retry-After": "5"})
+
+
+def too_many_requests():
+    return JSONResponse({"error": "Serveur surchargé, réessayez plus tard."}, status_code=429, headers={"Retry-After": "1"})
+
+
+def create_app(route_workers=ASGI_ROUTE_WORKERS, audio_workers=ASGI_AUDIO_WORKERS, queue_per_worker=ASGI_QUEUE_PER_WORKER,
+               preload=ASGI_PRELOAD):
+    """Build the Starlette application and its pools (started by the lifespan handler)."""
+    state = {"route_pool": None, "audio_pool": None, "events_manager": None, "event_readers": None,
+             "ready": asyncio.Event(), "error": None}
+
+    async def warm_up():
+        try:
+            await state["route_pool"].warm_up()
+            state["ready"].set()
+        except Exception as e:
+            state["error"] = repr(e)
+
+    @asynccontextmanager
+    async def lifespan(app):
+        if preload:
+            # Like gunicorn --preload: the server only starts once the resources are loaded, and the
+            # route workers are forked right away, once the loading thread and the leg pool have stopped
+            preload_resources()
+            state["route_pool"] = BoundedPool(route_workers, route_workers * queue_per_worker, init_route_worker, "fork")
+            await state["route_pool"].warm_up()
+        else:
+            state["route_pool"] = BoundedPool(route_workers, route_workers * queue_per_worker, init_route_worker)
+        state["audio_pool"] = BoundedPool(audio_workers, audio_workers * queue_per_worker)
+        # Voice route events go from the route workers to the server through this manager's queues;
+        # one reader thread per route task that can be in flight
+        state["events_manager"] = multiprocessing.get_context("spawn").Manager()
+        state["event_readers"] = ThreadPoolExecutor(route_workers * queue_per_worker, thread_name_prefix="route-events")
+        # Workers load their resources in the background: /api/health answers immediately
+        warming = asyncio.create_task(warm_up())
+        try:
+            yield
+        finally:
+            warming.cancel()
+            state["route_pool"].shutdown()
+            state["audio_pool"].shutdown()
+            state["event_readers"].shutdown(wait=False, cancel_futures=True)
+            state["events_manager"].shutdown()
+
+    async def stream_events(events, future):
+        """Events put by route_events_task in the manager queue `events`, as they come; then its error, if any."""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                # With a timeout: a worker that died never puts the final None
+                event = await loop.run_in_executor(state["event_readers"], events.get, True, 1)
+            except queue.Empty:
+                if future.done():
+                    break
+                continue
+            if event is None:
+                break
+            yield event
+        await future
+
+    async def run_route(function, request):
+        if not state["ready"].is_set():
+            return service_starting()
+        data = await request.json()
+        try:
+            payload, status = await state["route_pool"].run(function, data)
+        except QueueFull:
+            return too_many_requests()
+        return JSONResponse(payload, status_code=status)
+
+    async def process_route(request):
+        return await run_route(route_task, request)
+
+    async def process_route_batch(request):
+        return await run_route(route_batch_task, request)
+
+    async def convert_audio(request):
+        # Checked before the multipart body is read (1 KB of slack for the form headers)
+        if int(request.headers.get("content-length", 0)) > AUDIO_MAX_BYTES + 1024:
+            return JSONResponse({"error": f"Fichier audio trop volumineux (maximum {AUDIO_MAX_BYTES} octets)."}, status_code=413)
+        form = await request.form()
+        file = form.get("file")
+        if file is None or not getattr(file, "filename", ""):
+            return JSONResponse({"error": "Aucun fichier sélectionné."}, status_code=400)
+        # Starlette keeps uploads up to 1 MB in memory and spools larger ones to a temporary file;
+        # the worker then decodes the bytes in memory (no wav file)
+        content = await file.read()
+        filename = secure_filename(file.filename)
+        try:
+            # Size and duration are checked before the file takes a place in the audio pool
+            fmt = audio_format(filename)
+            if fmt is not None:
+                check_audio(content, fmt, AUDIO_MAX_BYTES, AUDIO_MAX_SECONDS)
+            transcribed_text = await state["audio_pool"].run(transcribe_task, content, filename)
+        except QueueFull:
+            return too_many_requests()
+        except AudioRejected as e:
+            return JSONResponse({"error": str(e)}, status_code=413)
+        except ValueError:
+            return JSONResponse({"error": "Fichier audio illisible."}, status_code=400)
+        except SpeechUnavailable as e:
+            return JSONResponse({"error": str(e)}, status_code=503)
+        if transcribed_text:
+            return JSONResponse({"transcribedText": transcribed_text})
+        return JSONResponse({"error": "Échec de la transcription."}, status_code=500)
+
+    async def voice_route(request):
+        """Same Server-Sent Events as the Flask /api/voice_route, streamed out of the route worker."""
+        if int(request.headers.get("content-length", 0)) > AUDIO_MAX_BYTES + 1024:
+            return JSONResponse({"error": f"Fichier audio trop volumineux (maximum {AUDIO_MAX_BYTES} octets)."}, status_code=413)
+        if not state["ready"].is_set():
+            return service_starting()
+        form = await request.form()
+        file = form.get("file")
+        if file is None or not getattr(file, "filename", ""):
+            return JSONResponse({"error": "Aucun fichier sélectionné."}, status_code=400)
+        filename = secure_filename(file.filename)
+        fmt = audio_format(filename)
+        if fmt is None:
+            return JSONResponse({"error": "Format du fichier non supporté"}, status_code=400)
+        try:
+            day = parse_date(form.get("date"))
+        except ValueError:
+            return JSONResponse({"error": "Date invalide, format attendu : AAAA-MM-JJ."}, status_code=400)
+        try:
+            departure_time = parse_time(form.get("departure_time"))
+        except ValueError:
+            return JSONResponse({"error": "Heure de départ invalide, format attendu : HH:MM ou HH:MM:SS."}, status_code=400)
+        try:
+            pareto = parse_flag(form.get("pareto"))
+        except ValueError:
+            return JSONResponse({"error": "Option pareto invalide, valeurs attendues : true ou false."}, status_code=400)
+
+        # Errors known before the stream starts keep their HTTP status
+        content = await file.read()
+        try:
+            check_audio(content, fmt, AUDIO_MAX_BYTES, AUDIO_MAX_SECONDS)
+            transcription = state["audio_pool"].submit(transcribe_task, content, filename)
+        except QueueFull:
+            return too_many_requests()
+        except AudioRejected as e:
+            return JSONResponse({"error": str(e)}, status_code=413)
+        except ValueError:
+            return JSONResponse({"error": "Fichier audio illisible."}, status_code=400)
+
+        async def events():
+            # Sent at once: the client knows the upload was accepted while the audio is transcribed
+            yield ": transcription\n\n"
+            try:
+                text = await transcription
+            except SpeechUnavailable as e:
+                yield sse("error", {"error": str(e)})
+                return
+            except ValueError as e:
+                yield sse("error", {"error": str(e) if isinstance(e, AudioRejected) else "Fichier audio illisible."})
+                return
+            if not text:
+                yield sse("error", {"error": "Échec de la transcription."})
+                return
+            yield sse("transcript", {"text": text})
+            events = await asyncio.get_running_loop().run_in_executor(state["event_readers"], state["events_manager"].Queue)
+            try:
+                future = state["route_pool"].submit(route_events_task, events, text, departure_time, day, pareto)
+            except QueueFull:
+                yield sse("error", {"error": "Serveur surchargé, réessayez plus tard."})
+                return
+            async for event in stream_events(events, future):
+                yield event
+
+        return StreamingResponse(
+            events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    async def health(request):
+        return JSONResponse({"status": "ok"})
+
+    async def ready(request):
+        if state["error"] is not None:
+            return JSONResponse({"status": "error", "error": state["error"]}, status_code=500)
+        if not state["ready"].is_set():
+            return JSONResponse({"status": "starting"}, status_code=503)
+        return JSONResponse({"status": "ready"})
+
+    async def route_cache_stats(request):
+        if not state["ready"].is_set():
+            return service_starting()
+        try:
+            stats = await state["route_pool"].run(route_cache_task)
+            return JSONResponse({**stats, "workers": state["route_pool"].workers})
+        except QueueFull:
+            return too_many_requests()
+
+    async def pool_stats(request):
+        return JSONResponse({"route": state["route_pool"].stats(), "audio": state["audio_pool"].stats()})
+
+    return Starlette(
+        routes=[
+            Route("/api/route", process_route, methods=["POST"]),
+            Route("/api/route_batch", process_route_batch, methods=["POST"]),
+            Route("/api/convert_audio", convert_audio, methods=["POST"]),
+            Route("/api/voice_route", voice_route, methods=["POST"]),
+            Route("/api/health", health, methods=["GET"]),
+            Route("/api/ready", ready, methods=["GET"]),
+            Route("/api/route/cache", route_cache_stats, methods=["GET"]),
+            Route("/api/pools", pool_stats, methods=["GET"]),
+        ],
+        middleware=[Middleware(CORSMiddleware, allow_origins=["*"])],
+        lifespan=lifespan,
+    )
+
+
+app = create_app()
@@ -0,0 +1,96 @@
+"""
+Benchmark de la détection de langue sur data/dataset_Mozghan.csv (phrases françaises)
+et sur quelques phrases anglaises.
+
+Usage:
+    python -m src.data_process.benchmark_language [--dataset data/dataset_Mozghan.csv] [--repeat 3]
+
+Référence : l'ancien detected_language (mots-clés, puis langid.classify pour tous
+les autres textes). Le rapport donne l'accord avec la référence, la part des
+textes tranchée par chaque niveau (mots-clés, trigrammes, langid) et le temps
+moyen par texte de la référence, de detected_language et de detected_languages.
+"""
+
+import argparse
+import time
+
+import pandas as pd
+
+from src.data_process.utils.language import classify_languages
+from src.data_process.utils.utils import detected_language, detected_languages, keyword_language, langid_language
+
+ENGLISH_SENTENCES = [
+    "I want to go from Paris to Lyon tomorrow morning",
+    "How can I get to Marseille by train?",
+    "Is there a train from Bordeaux to Nice today",
+    "Please find me a route between Lille and Nantes",
+    "what is the fastest way to reach Toulouse",
+    "I need a ticket for Strasbourg",
+    "book me on the next train to Rennes",
+    "which trains leave Dijon after six pm",
+    "can you help me travel to Brest",
+    "my flight was cancelled so I will take the train to Grenoble",
+    "going from Nancy to Metz",
+    "how long does it take from Caen to Rouen",
+]
+
+
+def reference_language(text):
+    """Ancien comportement : mots-clés, puis langid."""
+    keyword = keyword_language(text)
+    return keyword if keyword is not None else langid_language(text)
+
+
+def timed(function, *args, repeat=3):
+    """(résultat, meilleur temps en secondes sur `repeat` exécutions)."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def benchmark(name, texts, repeat):
+    # Le modèle langid est chargé avant les mesures
+    langid_language("bonjour")
+    reference, reference_time = timed(lambda: [reference_language(text) for text in texts], repeat=repeat)
+    single, single_time = timed(lambda: [detected_language(text) for text in texts], repeat=repeat)
+    batch, batch_time = timed(detected_languages, texts, repeat=repeat)
+    assert single == batch
+
+    keywords = [keyword_language(text) for text in texts]
+    rest = [text for text, keyword in zip(texts, keywords) if keyword is None]
+    trigrams = sum(result is not None for result in classify_languages(rest))
+    agree = sum(a == b for a, b in zip(reference, batch))
+
+    print(f"--- {name} : {len(texts)} textes")
+    print(
+        f"tranchés par les mots-clés {len(texts) - len(rest)}, par les trigrammes {trigrams}, "
+        f"par langid {len(rest) - trigrams} (référence : {len(rest)} appels à langid)"
+    )
+    print(f"accord avec la référence {agree / len(texts):.2%} ({len(texts) - agree} différences)")
+    print(f"détectés en français : référence {sum(reference)}, nouveau {sum(batch)}")
+    print(
+        f"par texte : référence {reference_time / len(texts) * 1e6:.1f} µs, "
+        f"detected_language {single_time / len(texts) * 1e6:.1f} µs (x{reference_time / single_time:.1f}), "
+        f"detected_languages {batch_time / len(texts) * 1e6:.1f} µs (x{reference_time / batch_time:.1f})"
+    )
+    differences = [(text, old) for text, old, new in zip(texts, reference, batch) if old != new]
+    for text, old in differences[:10]:
+        print(f"    {'fr' if old else 'autre'} -> {'autre' if old else 'fr'} : {text}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default="data/dataset_Mozghan.csv")
+    parser.add_argument("--repeat", type=int, default=3)
+    arguments = parser.parse_args()
+
+    phrases = pd.read_csv(arguments.dataset)["Phrase"].astype(str).tolist()
+    benchmark(arguments.dataset, phrases, arguments.repeat)
+    # Sans les mots-clés, tous les textes passent par les trigrammes ou langid
+    keyword_free = [text for text in phrases if keyword_language(text) is None]
+    benchmark("phrases sans mot-clé", keyword_free, arguments.repeat)
+    benchmark("phrases anglaises", ENGLISH_SENTENCES, arguments.repeat)
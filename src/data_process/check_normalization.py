@@ -0,0 +1,109 @@
+"""
+Vérifie la normalisation des textes (src/data_process/utils/normalization.py).
+
+Usage:
+    python -m src.data_process.check_normalization [--dataset data/dataset_Mozghan.csv] [--stations fichier.csv]
+
+1. Cas de référence (golden_normalization.json) : sortie attendue de clean_word
+   et simple_cleaning, enregistrée avec l'ancienne implémentation. Seule
+   différence voulue : « Vitré tram-train » donne « Vitré » (l'ancienne version
+   laissait un espace final).
+2. Sur le dataset et la liste des gares : les fonctions et leurs versions par
+   lot donnent le même résultat que l'ancienne implémentation, puis comparaison
+   des temps.
+
+Le script s'arrête avec le code 1 au premier écart.
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+
+import pandas as pd
+from unidecode import unidecode
+
+from config import SNCF_gare
+from src.data_process.utils.normalization import clean_word, clean_words, simple_cleaning, simple_cleanings
+
+GOLDEN_PATH = os.path.join(os.path.dirname(__file__), "golden_normalization.json")
+
+
+def legacy_clean_word(word):
+    """Ancienne implémentation de clean_word (sept expressions régulières non compilées)."""
+    cleaned_word = re.sub(r"\s*\(.*?\)", "", word).strip()
+    cleaned_word = re.sub(r"(-?TGV-?)", "", cleaned_word).strip()
+    cleaned_word = re.sub(r"\d+", "", cleaned_word).strip()
+    cleaned_word = re.sub(r"\b(-la|-le|-les)\s+(\w+)", r"\1-\2", cleaned_word)
+    cleaned_word = re.sub(r"\b(-La|-Le|-Les)\s+(\w+)", r"\1-\2", cleaned_word)
+    cleaned_word = re.sub(r"TT$", "", cleaned_word).strip()
+    # Corrigé dans clean_word : l'espace laissé par "tram-train" est retiré
+    return re.sub(r"tram-train", "", cleaned_word).strip()
+
+
+def legacy_simple_cleaning(phrase):
+    """Ancienne implémentation de simple_cleaning (dont la suppression de ponctuation, sans effet)."""
+    cleaned_phrase = re.sub(r"[^\w\s']", "", phrase)
+    cleaned_phrase = unidecode(phrase)
+    if " d'" in cleaned_phrase:
+        cleaned_phrase = cleaned_phrase.replace(" d'", " de ")
+    return cleaned_phrase
+
+
+def check(name, function, cases):
+    """Compare function(entrée) à la sortie attendue de chaque cas ; s'arrête au premier écart."""
+    for text, expected in cases:
+        result = function(text)
+        if result != expected:
+            print(f"{name}({text!r}) = {result!r}, attendu {expected!r}")
+            sys.exit(1)
+    print(f"{name} : {len(cases)} cas identiques")
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def compare(name, legacy, scalar, batch, texts):
+    """Même sortie que l'ancienne implémentation pour tous les textes, et temps de chaque version."""
+    # Mesures sans le cache de clean_word (chaque nom distinct est nettoyé une fois par mesure)
+    clear_cache = getattr(scalar, "cache_clear", lambda: None)
+    expected, legacy_time = timed(lambda: [legacy(text) for text in texts])
+    clear_cache()
+    results, scalar_time = timed(lambda: [scalar(text) for text in texts])
+    clear_cache()
+    series, batch_time = timed(batch, pd.Series(texts))
+    for text, result, batch_result, expected_result in zip(texts, results, series.tolist(), expected):
+        if result != expected_result or batch_result != expected_result:
+            print(f"{name}({text!r}) = {result!r} (par lot {batch_result!r}), attendu {expected_result!r}")
+            sys.exit(1)
+    print(
+        f"{name} : {len(texts)} textes identiques à l'ancienne implémentation ; "
+        f"ancienne {legacy_time / len(texts) * 1e6:.2f} µs/texte, "
+        f"nouvelle {scalar_time / len(texts) * 1e6:.2f} µs/texte (x{legacy_time / scalar_time:.1f}), "
+        f"par lot {batch_time / len(texts) * 1e6:.2f} µs/texte"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default="data/dataset_Mozghan.csv")
+    parser.add_argument("--stations", default=SNCF_gare)
+    arguments = parser.parse_args()
+
+    with open(GOLDEN_PATH, encoding="utf-8") as f:
+        golden = json.load(f)
+    check("clean_word", clean_word, golden["clean_word"])
+    check("simple_cleaning", simple_cleaning, golden["simple_cleaning"])
+
+    phrases = pd.read_csv(arguments.dataset)["Phrase"].astype(str).tolist()
+    compare("simple_cleaning", legacy_simple_cleaning, simple_cleaning, simple_cleanings, phrases)
+    if os.path.exists(arguments.stations):
+        with open(arguments.stations, encoding="utf-8") as f:
+            names = [row["LIBELLE"] for row in csv.DictReader(f, delimiter=";")]
+        compare("clean_word", legacy_clean_word, clean_word, clean_words, names)
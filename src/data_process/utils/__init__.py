@@ -5,7 +5,13 @@ from src.data_process.utils.utils import (
     load_sncf_data,
     simple_cleaning,
     check_label,
-    detected_language
+    detected_language,
+    detected_languages,
+)
+
+from src.data_process.utils.normalization import (
+    clean_words,
+    simple_cleanings,
 )
 
 from src.data_process.utils.utils_train import (
@@ -26,6 +32,9 @@ __all__ = [
     "RGR_vierge",
     "RGE_vierge",
     "simple_cleaning",
+    "simple_cleanings",
+    "clean_words",
     "check_label",
     "detected_language",
+    "detected_languages",
 ]
@@ -0,0 +1,95 @@
+"""
+French / English character-trigram scorer, in NumPy.
+
+Each text is lower-cased and padded with spaces. Its character trigrams are
+looked up in a precomputed table of frequent trigrams: French ones add +1 to
+the score, English ones -1 (trigrams common to both languages are left out).
+French accented letters add ACCENT_WEIGHT each. The score is divided by the
+number of trigrams in the text. Texts whose score stays between the two
+thresholds are undecided (None): the caller falls back on langid.
+
+A batch of texts is scored with a single lookup over the concatenation of
+all of them.
+"""
+
+from typing import List, Optional
+
+import numpy as np
+
+# Frequent trigrams ("_" stands for a space)
+FRENCH_TRIGRAMS = (
+    "_de de_ es_ _le le_ la_ _la les _co nt_ que ue_ _qu e_d s_d e_l s_l _et et_ _pa par ar_ _po pou "
+    "our ur_ _un une ne_ _en en_ des _pr ons ns_ ais ait _su sur _au au_ ux_ eur _ma _re lle ell "
+    "est ous _no nou _vo vou _pl _da dan ans eme men ett _ve ver ers _vi vil ill _ga gar are "
+    "_je je_ _tu _ce ce_ _se se_ _ne _ou ou_ oir ien _mo _mi _ch eux _du du_ _ai "
+    "ir_ _pe _il il_ ull ont _so _sa ire _pu uis _y_ _a_ _fa _av ave _bi _ca _fe _ro "
+    "ois _on qu' _j' _l' _d' l'e l'a d'a d'e j'a _ét ées _dé _à_ "
+).split()
+ENGLISH_TRIGRAMS = (
+    "_th the he_ ing ng_ _an and nd_ _to to_ _of of_ ed_ _in in_ _is is_ at_ _wa was as_ hat "
+    "tha his _fo for _yo you _be ly_ th_ ve_ ith wit _wi ere her _ha hav _i_ ght igh _wh wha "
+    "whe _go goi oin _ho how ow_ _ca can _do do_ _ge get et_ _fr fro rom om_ _we we_ _wo "
+    "wou oul uld ld_ nee eed _ta tak ake ke_ _my my_ _me me_ _pl lea eas ase _lo "
+    "_ti tim ime _bu but ut_ _so _it it_ _no not ot_ _on hic ich ch_ _at _by by_ _ar "
+    "ay_ _st sta ati _tw two wo_ _af aft fte ter er_ _ra _bo boo ook ck_ ick "
+    "ee_ een eet _ye yes ood goo orn rni nin nex ext xt_ _fi fin ind hel elp lp_ oda day "
+).split()
+ACCENTS = "éèêàùçâîôûëïœ"
+ACCENT_WEIGHT = 3.0
+# Mean score per trigram above which a text is French, below which it is English
+FRENCH_THRESHOLD = 0.12
+ENGLISH_THRESHOLD = -0.05
+# Shorter texts (a city name, "hello") are always undecided
+MIN_LENGTH = 12
+
+
+def trigram_key(codes: np.ndarray) -> np.ndarray:
+    """One uint64 per trigram of a code point array: its 3 code points (21 bits each)."""
+    codes = codes.astype(np.uint64)
+    return (codes[:-2] << np.uint64(42)) | (codes[1:-1] << np.uint64(21)) | codes[2:]
+
+
+def build_table():
+    """Sorted trigram keys and their weights (+1 French, -1 English)."""
+    french = {trigram.replace("_", " ") for trigram in FRENCH_TRIGRAMS}
+    english = {trigram.replace("_", " ") for trigram in ENGLISH_TRIGRAMS}
+    weights = {trigram: 1.0 for trigram in french - english}
+    weights.update({trigram: -1.0 for trigram in english - french})
+    trigrams = sorted(weights)
+    keys = trigram_key(np.frombuffer("".join(trigrams).encode("utf-32-le"), dtype=np.uint32))[::3]
+    order = np.argsort(keys)
+    return keys[order], np.array([weights[trigram] for trigram in trigrams], dtype=np.float32)[order]
+
+
+TABLE_KEYS, TABLE_WEIGHTS = build_table()
+# Weight of each code point up to the last accented letter; the last entry (0) stands for every code point above
+ACCENT_WEIGHTS = np.zeros(max(map(ord, ACCENTS)) + 2, dtype=np.float32)
+ACCENT_WEIGHTS[[ord(letter) for letter in ACCENTS]] = ACCENT_WEIGHT
+
+
+def language_scores(texts: List[str]) -> np.ndarray:
+    """Mean trigram score of each text: positive looks French, negative looks English."""
+    if not texts:
+        return np.zeros(0, dtype=np.float32)
+    # "\0" separates the texts: no trigram of the table spans two of them
+    segments = [f" {text.lower()} \0" for text in texts]
+    codes = np.frombuffer("".join(segments).encode("utf-32-le"), dtype=np.uint32)
+    lengths = np.array([len(segment) for segment in segments])
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+    keys = trigram_key(codes)
+    positions = np.minimum(np.searchsorted(TABLE_KEYS, keys), len(TABLE_KEYS) - 1)
+    weights = np.where(TABLE_KEYS[positions] == keys, TABLE_WEIGHTS[positions], np.float32(0))
+    totals = np.add.reduceat(weights, starts)
+    accents = np.add.reduceat(ACCENT_WEIGHTS[np.minimum(codes, len(ACCENT_WEIGHTS) - 1)], starts)
+    # " text " has as many trigrams as the text has characters
+    return (totals + accents) / np.maximum(lengths - 3, 1)
+
+
+def classify_languages(texts: List[str]) -> List[Optional[bool]]:
+    """True (French), False (English) or None (undecided) for each text, from its trigram score."""
+    return [
+        None if len(text.strip()) < MIN_LENGTH
+        else True if score >= FRENCH_THRESHOLD else False if score <= ENGLISH_THRESHOLD else None
+        for text, score in zip(texts, language_scores(texts).tolist())
+    ]
@@ -0,0 +1,94 @@
+"""
+Text normalization for phrases (simple_cleaning) and station names (clean_word).
+
+Patterns are compiled once. Accents are folded with a single str.translate
+pass over a table built from unidecode for the Latin and punctuation blocks;
+unidecode itself only runs on the rare texts that still contain other
+characters, so the output is the same as unidecode's. Station names repeat
+a lot across files: clean_word is memoized per distinct name.
+
+Every function has a batched form accepting a list or a pandas Series.
+"""
+
+import re
+from functools import lru_cache
+from typing import List, Union
+
+import pandas as pd
+from unidecode import unidecode
+
+# Unicode blocks folded by the translation table: Latin-1 supplement, Latin
+# Extended-A/B, IPA / spacing modifiers, general punctuation and currency symbols
+FOLDED_RANGES = ((0x80, 0x2FF), (0x2000, 0x20CF))
+
+PARENTHESES = re.compile(r"\s*\(.*?\)")
+TGV = re.compile(r"(-?TGV-?)")
+DIGITS = re.compile(r"\d+")
+# Hyphen between 'la', 'le' or 'les' (or 'La', 'Le', 'Les') and the word that follows
+ARTICLE_SPACE = re.compile(r"\b(-[Ll](?:a|e|es))\s+(\w+)")
+TRAILING_TT = re.compile(r"TT$")
+TRAM_TRAIN = "tram-train"
+
+Texts = Union[List[str], pd.Series]
+
+
+def build_fold_table() -> dict:
+    """str.translate table: code point -> its unidecode transliteration."""
+    return {
+        code: unidecode(chr(code))
+        for start, end in FOLDED_RANGES
+        for code in range(start, end + 1)
+    }
+
+
+FOLD_TABLE = build_fold_table()
+
+
+def fold_accents(text: str) -> str:
+    """Same result as unidecode(text), in one translate pass for Latin text."""
+    if text.isascii():
+        return text
+    folded = text.translate(FOLD_TABLE)
+    # Characters outside the table (other scripts, emoji...) are left to unidecode
+    return folded if folded.isascii() else unidecode(folded)
+
+
+@lru_cache(maxsize=65536)
+def clean_word(word: str) -> str:
+    """
+    Cleans a station name: removes parentheses, 'TGV', digits, a trailing 'TT' and 'tram-train',
+    and joins 'la', 'le' or 'les' to the following word with a hyphen.
+    """
+    cleaned_word = PARENTHESES.sub("", word).strip()
+    cleaned_word = TGV.sub("", cleaned_word).strip()
+    cleaned_word = DIGITS.sub("", cleaned_word).strip()
+    cleaned_word = ARTICLE_SPACE.sub(r"\1-\2", cleaned_word)
+    cleaned_word = TRAILING_TT.sub("", cleaned_word).strip()
+    return cleaned_word.replace(TRAM_TRAIN, "").strip()
+
+
+def simple_cleaning(phrase: str) -> str:
+    """
+    Cleans a phrase: removes accents and replaces " d'" by " de ".
+    Punctuation is kept: the NER model is trained on phrases cleaned this way.
+    """
+    cleaned_phrase = fold_accents(phrase)
+    # Case of "d'" : replace by "de"
+    return cleaned_phrase.replace(" d'", " de ")
+
+
+def map_texts(function, texts: Texts) -> Texts:
+    """Apply `function` to every text of a list (returns a list) or of a Series (returns a Series)."""
+    if isinstance(texts, pd.Series):
+        return texts.map(function)
+    return [function(text) for text in texts]
+
+
+def clean_words(words: Texts) -> Texts:
+    """clean_word for a list or Series of station names."""
+    return map_texts(clean_word, words)
+
+
+def simple_cleanings(phrases: Texts) -> Texts:
+    """simple_cleaning for a list or Series of phrases."""
+    return map_texts(simple_cleaning, phrases)
@@ -6,37 +6,11 @@ from typing import List
 
 import pandas as pd
 import requests
-from unidecode import unidecode
-import langid
 
 from data.data_need import ville_sans_gare, villes_france
 from config import SNCF_gare
-
-
-def clean_word(word: str) -> str:
-    """
-    Cleans a word by removing any parentheses and leading/trailing whitespace.
-    """
-    # Remove any parentheses and leading/trailing whitespace
-    cleaned_word = re.sub(r"\s*\(.*?\)", "", word).strip()
-
-    # Remove any TGV word and the '-' character
-    cleaned_word = re.sub(r"(-?TGV-?)", "", cleaned_word).strip()
-
-    # Remove any digits
-    cleaned_word = re.sub(r"\d+", "", cleaned_word).strip()
-
-    # Add a hyphen between 'La' or 'Le' and the final word if they are separated by a space
-    cleaned_word = re.sub(r"\b(-la|-le|-les)\s+(\w+)", r"\1-\2", cleaned_word)
-    cleaned_word = re.sub(r"\b(-La|-Le|-Les)\s+(\w+)", r"\1-\2", cleaned_word)
-
-    # Remove any trailing 'TT' characters
-    cleaned_word = re.sub(r"TT$", "", cleaned_word).strip()
-
-    # Remove "tram-train"
-    cleaned_word = re.sub(r"tram-train", "", cleaned_word)
-
-    return cleaned_word
+from src.data_process.utils.language import classify_languages
+from src.data_process.utils.normalization import clean_word, simple_cleaning  # noqa: F401 (re-exported)
 
 
 def write_data_to_csv(data: List[List[str]], filename: str) -> None:
@@ -112,22 +86,6 @@ def load_data(dataset_path) -> tuple[List, List]:
     responses = df["Reponse"].tolist()
     return phrases, responses
 
-def simple_cleaning(phrase: str) -> str:
-    """
-    Cleans a phrase by removing any parentheses and leading/trailing whitespace.
-    """
-    # Remove any ponctuation, except apostrophe
-    cleaned_phrase = re.sub(r"[^\w\s']", "", phrase)
-
-    # Remove any accents
-    cleaned_phrase = unidecode(phrase)
-
-    # Case of "d'" : replace by "de"
-    if " d'" in cleaned_phrase:
-        cleaned_phrase = cleaned_phrase.replace(" d'", " de ")
-
-    return cleaned_phrase
-
 def check_label(predict):
     """
     Check if the label of the entity is a city
@@ -154,19 +112,47 @@ def check_label(predict):
 
     return predict, erreur
 
-def detected_language(text: str) -> bool:
+COMMON_FRENCH_WORDS = {"le", "la", "je", "tu", "vous", "et", "à", "de"}
+COMMON_ENGLISH_WORDS = {"the", "and", "you", "to", "of", "it", "is"}
+
+
+def keyword_language(text: str):
     """
-    Vérifie si le texte est en français, en combinant détection automatique et mots-clés.
+    Langue donnée par les mots-clés : True (français), False (anglais), ou None si aucun mot-clé.
     """
     words_in_text = set(re.findall(r'\b\w+\b', text.lower()))
-
-    common_french_words = {"le", "la", "je", "tu", "vous", "et", "à", "de"}
-    common_english_words = {"the", "and", "you", "to", "of", "it", "is"}
-    if common_french_words & words_in_text:
+    if COMMON_FRENCH_WORDS & words_in_text:
         return True
-    if common_english_words & words_in_text:
+    if COMMON_ENGLISH_WORDS & words_in_text:
         return False
+    return None
+
+
+def langid_language(text: str) -> bool:
+    """
+    Détection automatique par langid, en dernier recours : le module et son modèle ne sont chargés qu'au premier appel.
+    """
+    import langid
 
-    # Détection automatique
     detected_language, _ = langid.classify(text)
-    return detected_language == "fr"
\ No newline at end of file
+    return detected_language == "fr"
+
+
+def detected_languages(texts: List[str]) -> List[bool]:
+    """
+    Version par lot de detected_language : mots-clés, puis un seul calcul NumPy des trigrammes
+    pour tous les textes restants, puis langid pour ceux qui restent indécis.
+    """
+    results = [keyword_language(text) for text in texts]
+    pending = [index for index, result in enumerate(results) if result is None]
+    for index, result in zip(pending, classify_languages([texts[index] for index in pending])):
+        results[index] = result if result is not None else langid_language(texts[index])
+    return results
+
+
+def detected_language(text: str) -> bool:
+    """
+    Vérifie si le texte est en français : mots-clés, puis score de trigrammes (français / anglais),
+    puis détection automatique (langid) si le score ne permet pas de trancher.
+    """
+    return detected_languages([text])[0]
@@ -0,0 +1,91 @@
+"""Load test of /api/route: throughput, latency and 429 responses by number of route workers.
+
+Usage:
+    python -m src.load_bench [--workers 1,2,4] [--concurrency 32] [--requests 400]
+    python -m src.load_bench --url http://127.0.0.1:8000 [--concurrency 32] [--requests 400]
+
+Without --url, the ASGI app (src.asgi) is started in this process once per
+worker count and queried through httpx's ASGI transport, so the only thing
+that changes between runs is the size of the route pool.
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+import statistics
+import time
+
+import httpx
+
+from src.path_finding.benchmark import BENCHMARK_CITIES
+
+# Distinct city pairs: the route cache does not hide the search cost
+TEXTS = [
+    f"je veux aller de {departure} à {arrival}"
+    for departure, arrival in itertools.permutations(BENCHMARK_CITIES, 2)
+]
+
+
+async def run_load(client, total, concurrency):
+    """Send `total` requests, `concurrency` at a time; return (elapsed seconds, latencies, status counts)."""
+    latencies = []
+    statuses = {}
+    counter = itertools.count()
+
+    async def user():
+        while (number := next(counter)) < total:
+            start = time.perf_counter()
+            response = await client.post("/api/route", json={"text": TEXTS[number % len(TEXTS)]})
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if response.status_code == 429:
+                await asyncio.sleep(float(response.headers.get("Retry-After", 1)) / 10)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    return time.perf_counter() - start, latencies, statuses
+
+
+def report(label, elapsed, latencies, statuses):
+    latencies = sorted(latencies)
+    served = statuses.get(200, 0)
+    print(
+        f"{label}: {served / elapsed:.1f} requêtes/s servies, "
+        f"p50 {statistics.median(latencies) * 1000:.0f} ms, "
+        f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f} ms, statuts {dict(sorted(statuses.items()))}"
+    )
+
+
+async def run_in_process(workers, total, concurrency):
+    from src.asgi import create_app
+
+    app = create_app(route_workers=workers)
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://asgi", timeout=None) as client:
+            while (await client.get("/api/ready")).status_code == 503:
+                await asyncio.sleep(0.5)
+            # One request per worker first: the first call of each process is slower
+            await run_load(client, workers, workers)
+            report(f"{workers} worker(s)", *await run_load(client, total, concurrency))
+
+
+async def run_url(url, total, concurrency):
+    async with httpx.AsyncClient(base_url=url, timeout=None) as client:
+        report(url, *await run_load(client, total, concurrency))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="serveur déjà démarré (uvicorn src.asgi:app)")
+    parser.add_argument("--workers", default=",".join(str(2 ** k) for k in range(8) if 2 ** k <= (os.cpu_count() or 1)))
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=400)
+    arguments = parser.parse_args()
+
+    if arguments.url:
+        asyncio.run(run_url(arguments.url, arguments.requests, arguments.concurrency))
+    else:
+        for workers in (int(value) for value in arguments.workers.split(",")):
+            asyncio.run(run_in_process(workers, arguments.requests, arguments.concurrency))
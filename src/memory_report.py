@@ -0,0 +1,64 @@
+"""Memory of the ASGI route workers, with and without preloading (Linux: reads /proc/<pid>/smaps_rollup).
+
+Usage:
+    python -m src.memory_report [--workers 4] [--requests 50]
+
+"spawn" is the default mode: every worker loads its own model, graph and
+station index. "preload" loads them once in the server process and forks the
+workers, which share those pages copy-on-write. For each worker the report
+gives RSS (every page mapped, shared or not), PSS (shared pages divided among
+the processes that map them) and USS (pages private to the worker). The sum
+of PSS over the processes is the memory actually used.
+"""
+
+import argparse
+import asyncio
+import os
+
+from src.asgi import BoundedPool, init_route_worker, preload_resources, route_task
+
+TEXTS = ["je veux aller de paris à lyon", "je veux aller de bordeaux à nice", "je veux aller de lille à marseille"]
+
+
+def memory(pid):
+    """(RSS, PSS, USS) of a process in MB."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return values["Rss"], values["Pss"], values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)
+
+
+async def measure(mode, workers, requests):
+    if mode == "preload":
+        preload_resources()
+        pool = BoundedPool(workers, requests, init_route_worker, "fork")
+    else:
+        pool = BoundedPool(workers, requests, init_route_worker)
+    await pool.warm_up()
+    # Requests touch the pages the workers really use (and let copy-on-write happen)
+    await asyncio.gather(*(pool.run(route_task, {"text": TEXTS[i % len(TEXTS)]}) for i in range(requests)))
+
+    rows = [("serveur", memory(os.getpid()))] + [(f"worker {pid}", memory(pid)) for pid in pool.pids()]
+    print(f"--- {mode} : {workers} workers")
+    for name, (rss, pss, uss) in rows:
+        print(f"{name:15s} RSS {rss:7.1f} Mo  PSS {pss:7.1f} Mo  USS {uss:7.1f} Mo")
+    workers_rss = [rss for name, (rss, _, _) in rows[1:]]
+    print(
+        f"RSS moyen par worker {sum(workers_rss) / len(workers_rss):.1f} Mo, "
+        f"USS moyen par worker {sum(uss for _, (_, _, uss) in rows[1:]) / len(workers_rss):.1f} Mo, "
+        f"total PSS (serveur + workers) {sum(pss for _, (_, pss, _) in rows):.1f} Mo"
+    )
+    pool.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=50)
+    arguments = parser.parse_args()
+    # spawn first: the server process has not loaded anything yet
+    for mode in ("spawn", "preload"):
+        asyncio.run(measure(mode, arguments.workers, arguments.requests))
@@ -0,0 +1,181 @@
+"""
+Station gazetteer for the NER pipeline.
+
+Two spaCy components, added around the "ner" pipe of a trained model:
+- "station_gazetteer" (before "ner") finds every station and city name of the
+  gazetteer in one PhraseMatcher pass and stores the longest non-overlapping
+  matches in doc.spans["stations"];
+- "station_entities" (after "ner") keeps the DEPART / ARRIVEE / CORRESPONDANCE
+  labels predicted by the NER but snaps each entity to the station name it
+  overlaps, so a multi-word name cut by the NER ("saint" + "pierre des corps")
+  becomes a single entity.
+
+The gazetteer is built once from get_list_sncf_city_from_file, villes_france
+and ville_sans_gare, then saved with the model (nlp.to_disk): spacy.load only
+re-tokenizes the stored names. This module must be imported before spacy.load
+so that the component factories are registered.
+
+Usage:
+    python -m src.models.gazetteer add <model_dir> [<output_dir>]
+    python -m src.models.gazetteer evaluate <model_dir> [--dataset data/dataset_Mozghan.csv]
+"""
+
+import argparse
+import ast
+import time
+from pathlib import Path
+from typing import Iterable, List
+
+import pandas as pd
+import srsly
+from spacy.language import Language
+from spacy.matcher import PhraseMatcher
+from spacy.tokens import Doc, Span
+from spacy.util import filter_spans
+
+SPANS_KEY = "stations"
+
+
+def name_variants(name: str) -> List[str]:
+    """Lower-cased name, without accents (as the API cleans the text), with spaces instead of hyphens."""
+    from src.data_process.utils.normalization import fold_accents
+
+    lower = name.strip().lower()
+    variants = {lower, fold_accents(lower)}
+    variants.update([variant.replace("-", " ") for variant in variants])
+    return [variant for variant in variants if variant]
+
+
+def gazetteer_names() -> List[str]:
+    """Station and city names: SNCF stations, then villes_france and ville_sans_gare."""
+    from data.data_need import ville_sans_gare, villes_france
+    from src.data_process.utils.utils import get_list_sncf_city_from_file
+
+    return [*get_list_sncf_city_from_file(), *villes_france, *ville_sans_gare]
+
+
+class StationGazetteer:
+    """PhraseMatcher over the gazetteer names: matches are stored in doc.spans[spans_key]."""
+
+    def __init__(self, nlp: Language, name: str = "station_gazetteer", attr: str = "LOWER", spans_key: str = SPANS_KEY):
+        self.nlp = nlp
+        self.name = name
+        self.attr = attr
+        self.spans_key = spans_key
+        self.names: List[str] = []
+        self.matcher = PhraseMatcher(nlp.vocab, attr=attr)
+
+    def add_names(self, names: Iterable[str]) -> None:
+        """Add station names (and their variants) to the gazetteer and rebuild the matcher."""
+        variants = set(self.names)
+        for name in names:
+            variants.update(name_variants(name))
+        self.names = sorted(variants)
+        self.build()
+
+    def build(self) -> None:
+        self.matcher = PhraseMatcher(self.nlp.vocab, attr=self.attr)
+        # Only the tokenizer is needed to build the patterns
+        self.matcher.add("STATION", list(self.nlp.tokenizer.pipe(self.names)))
+
+    def __call__(self, doc: Doc) -> Doc:
+        doc.spans[self.spans_key] = filter_spans(self.matcher(doc, as_spans=True))
+        return doc
+
+    def to_disk(self, path, exclude=tuple()) -> None:
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        srsly.write_json(path / "names.json", self.names)
+
+    def from_disk(self, path, exclude=tuple()) -> "StationGazetteer":
+        self.names = srsly.read_json(Path(path) / "names.json")
+        self.build()
+        return self
+
+
+@Language.factory("station_gazetteer", default_config={"attr": "LOWER", "spans_key": SPANS_KEY})
+def create_station_gazetteer(nlp: Language, name: str, attr: str, spans_key: str) -> StationGazetteer:
+    return StationGazetteer(nlp, name, attr, spans_key)
+
+
+@Language.component("station_entities")
+def snap_entities_to_stations(doc: Doc) -> Doc:
+    """Extend every NER entity to the station names it overlaps, keeping the NER label."""
+    stations = doc.spans[SPANS_KEY] if SPANS_KEY in doc.spans else []
+    if not stations or not doc.ents:
+        return doc
+    entities = []
+    for ent in doc.ents:
+        overlapping = [station for station in stations if station.start < ent.end and ent.start < station.end]
+        if overlapping:
+            start = min(ent.start, *(station.start for station in overlapping))
+            end = max(ent.end, *(station.end for station in overlapping))
+            ent = Span(doc, start, end, label=ent.label_)
+        entities.append(ent)
+    # Fragments of the same name now have the same span: the first one (and its label) is kept
+    doc.ents = filter_spans(entities)
+    return doc
+
+
+def add_station_gazetteer(nlp: Language, names: Iterable[str] = None) -> Language:
+    """Add the gazetteer before "ner" and the entity snapping after it (names: gazetteer_names() by default)."""
+    if "station_gazetteer" not in nlp.pipe_names:
+        gazetteer = nlp.add_pipe("station_gazetteer", before="ner")
+        gazetteer.add_names(gazetteer_names() if names is None else names)
+    if "station_entities" not in nlp.pipe_names:
+        nlp.add_pipe("station_entities", after="ner")
+    return nlp
+
+
+def load_examples(dataset: str):
+    """(phrase, [(start, end, label), ...]) pairs of a dataset with a 'Reponse' column in spaCy format."""
+    df = pd.read_csv(dataset)
+    return [(phrase, ast.literal_eval(response)["entities"]) for phrase, response in zip(df["Phrase"], df["Reponse"])]
+
+
+def evaluate(nlp: Language, examples) -> dict:
+    """Share of phrases whose entities are all exact, over all phrases and over those with a multi-word name."""
+    correct = multi_word = multi_word_correct = 0
+    start = time.perf_counter()
+    docs = nlp.pipe(phrase for phrase, _ in examples)
+    for (phrase, expected), doc in zip(examples, docs):
+        predicted = {(ent.start_char, ent.end_char, ent.label_) for ent in doc.ents}
+        exact = predicted == {tuple(entity) for entity in expected}
+        correct += exact
+        if any(" " in phrase[entity[0]:entity[1]] or "-" in phrase[entity[0]:entity[1]] for entity in expected):
+            multi_word += 1
+            multi_word_correct += exact
+    elapsed = time.perf_counter() - start
+    return {
+        "accuracy": correct / len(examples),
+        "multi_word_accuracy": multi_word_correct / multi_word if multi_word else None,
+        "multi_word_phrases": multi_word,
+        "ms_per_phrase": elapsed / len(examples) * 1000,
+    }
+
+
+if __name__ == "__main__":
+    import spacy
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["add", "evaluate"])
+    parser.add_argument("model")
+    parser.add_argument("output", nargs="?", help="add : dossier du modèle avec gazetteer (par défaut <model>_gazetteer)")
+    parser.add_argument("--dataset", default="data/dataset_Mozghan.csv")
+    arguments = parser.parse_args()
+
+    model = spacy.load(arguments.model)
+    if arguments.command == "add":
+        start = time.perf_counter()
+        add_station_gazetteer(model)
+        output = arguments.output or arguments.model.rstrip("/") + "_gazetteer"
+        model.to_disk(output)
+        print(f"{len(model.get_pipe('station_gazetteer').names)} noms, construit en {time.perf_counter() - start:.1f} s, enregistré dans {output}")
+    else:
+        data = load_examples(arguments.dataset)
+        gazetteer_pipes = [pipe for pipe in ("station_gazetteer", "station_entities") if pipe in model.pipe_names]
+        with model.select_pipes(disable=gazetteer_pipes):
+            print("NER seul      ", evaluate(model, data))
+        if not gazetteer_pipes:
+            add_station_gazetteer(model)
+        print("NER + gazetteer", evaluate(model, data))
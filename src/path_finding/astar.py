@@ -0,0 +1,96 @@
+"""Minorants géographiques pour guider la recherche d'itinéraire (A*).
+
+La durée restante depuis une gare est au moins la distance à vol d'oiseau
+jusqu'à la gare d'arrivée la plus proche divisée par la vitesse maximale
+observée dans les données. Certaines arêtes vont plus vite que cette vitesse
+(correspondances de durée nulle entre deux gares éloignées) : la gare de départ
+de ces arêtes est traitée comme une cible, ce qui garde le minorant admissible
+et cohérent. A* retourne alors exactement le même temps de trajet que Dijkstra.
+"""
+
+import math
+
+import numpy as np
+
+EARTH_RADIUS = 6_371_000  # mètres
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Distance orthodromique en mètres (coordonnées en degrés, scalaires ou tableaux NumPy)."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(value, dtype=np.float64)) for value in (lat1, lon1, lat2, lon2))
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(h, 1.0)))
+
+
+class GeoBounds:
+    """Coordonnées des nœuds d'un graphe et vitesse maximale des trains, calculées une seule fois."""
+
+    def __init__(self, G):
+        self.nodes = {node: code for code, node in enumerate(G.nodes)}
+        coordinates = [(data.get("lat", np.nan), data.get("lon", np.nan)) for _, data in G.nodes(data=True)]
+        self.lats, self.lons = np.array(coordinates, dtype=np.float64).reshape(-1, 2).T
+
+        # Vitesse maximale (m/s) sur les arêtes parcourues en train, de durée non nulle
+        sources, targets, weights, transfer = [], [], [], []
+        for source, target, data in G.edges(data=True):
+            sources.append(self.nodes[source])
+            targets.append(self.nodes[target])
+            weights.append(data["weight"])
+            transfer.append(data.get("transfer", 0))
+        sources, targets = np.array(sources, dtype=np.int64), np.array(targets, dtype=np.int64)
+        weights = np.array(weights, dtype=np.float64)
+        distances = haversine(self.lats[sources], self.lons[sources], self.lats[targets], self.lons[targets])
+        known = ~np.isnan(distances)
+        rides = (np.array(transfer) == 0) & (weights > 0) & known
+        speeds = distances[rides] / weights[rides]
+        self.max_speed = float(speeds.max()) if len(speeds) else math.inf
+
+        # Gares d'où part une arête plus rapide que max_speed (ou de longueur inconnue) : le minorant y vaut 0
+        shortcuts = ~known | (np.where(known, distances, 0) > weights * self.max_speed)
+        self.shortcut_nodes = np.unique(sources[shortcuts])
+        self.shortcut_bounds = self._bounds_to(self.shortcut_nodes).tolist()
+        # Coordonnées en radians, sous forme de listes pour le calcul nœud par nœud de heuristic()
+        self.radians = (np.radians(self.lats).tolist(), np.radians(self.lons).tolist())
+
+    def _bounds_to(self, codes, chunk=256):
+        """Pour chaque nœud, durée minimale (s) pour atteindre le plus proche des nœuds `codes`."""
+        bounds = np.full(len(self.lats), np.inf)
+        for start in range(0, len(codes), chunk):
+            part = codes[start:start + chunk]
+            distances = haversine(self.lats[:, None], self.lons[:, None], self.lats[part][None, :], self.lons[part][None, :])
+            bounds = np.minimum(bounds, distances.min(axis=1, initial=np.inf))
+        return bounds / self.max_speed
+
+    def heuristic(self, targets):
+        """Fonction nœud -> minorant (s) de la durée restante jusqu'à une des gares `targets`."""
+        lats, lons = self.radians
+        # Plusieurs arrêts d'une même gare partagent leurs coordonnées
+        target_points = {(lats[self.nodes[target]], lons[self.nodes[target]]) for target in targets if target in self.nodes}
+        if not target_points or any(math.isnan(lat) or math.isnan(lon) for lat, lon in target_points) \
+                or not math.isfinite(self.max_speed):
+            return lambda node: 0
+
+        # Calcul scalaire en Python pur : plus rapide que NumPy pour quelques cibles
+        target_points = [(lat, lon, math.cos(lat)) for lat, lon in target_points]
+        shortcut_bounds, nodes = self.shortcut_bounds, self.nodes
+        scale = 2 * EARTH_RADIUS / self.max_speed
+        # Le minorant n'est calculé que pour les nœuds atteints par la recherche
+        bounds = {}
+
+        def bound(node):
+            value = bounds.get(node)
+            if value is None:
+                code = nodes[node]
+                lat, lon = lats[code], lons[code]
+                cos_lat = math.cos(lat)
+                h = min(
+                    math.sin((target_lat - lat) / 2) ** 2 + cos_lat * target_cos * math.sin((target_lon - lon) / 2) ** 2
+                    for target_lat, target_lon, target_cos in target_points
+                )
+                value = min(scale * math.asin(math.sqrt(min(h, 1.0))), shortcut_bounds[code])
+                # Nœud sans coordonnées : aucun minorant
+                value = value if math.isfinite(value) else 0
+                bounds[node] = value
+            return value
+
+        return bound
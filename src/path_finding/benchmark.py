@@ -0,0 +1,426 @@
+"""Benchmarks du module path_finding.
+
+Usage : python src/path_finding/benchmark.py <benchmark> [options]
+"""
+
+import os
+import pickle
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import networkx as nx
+import pandas as pd
+
+from src.path_finding.dijkstra import load_and_merge_data, build_graph, save_graph, load_graph, gtfs_fingerprint, \
+    get_stations_for_city, get_best_route, get_fastest_route_for_city, shortest_path_search, \
+    calculate_total_travel_time, load_station_graph, RAW_DATA_PATH
+from src.path_finding.astar import GeoBounds
+from src.path_finding.csa import Timetable, get_earliest_route_for_city
+from src.path_finding.gtfs import load_gtfs, gtfs_time_to_seconds
+from src.path_finding.station_graph import StationGraph
+from src.path_finding.stations import StationIndex
+
+# Villes les plus demandées, avec accents et tirets tels que saisis par les utilisateurs
+BENCHMARK_CITIES = [
+    "Paris", "Lyon", "Marseille", "Lille", "Bordeaux", "Toulouse", "Nantes", "Strasbourg", "Nice",
+    "Montpellier", "Rennes", "Saint-Étienne", "Aix-en-Provence", "Clermont-Ferrand", "Limoges", "Briouze",
+]
+# Requêtes fixes (ville de départ, ville d'arrivée) pour comparer les moteurs de recherche
+BENCHMARK_ROUTES = [
+    ("Paris", "Lyon"), ("Paris", "Marseille"), ("Lille", "Marseille"), ("Nantes", "Strasbourg"),
+    ("Bordeaux", "Nice"), ("Briouze", "Paris"), ("Toulouse", "Lille"), ("Rennes", "Montpellier"),
+]
+
+
+def build_graph_iterrows(stops, stop_times, trips, routes):
+    """Ancienne construction du graphe ligne par ligne, conservée comme référence."""
+    graphique = nx.DiGraph()
+
+    for _, row in stops.iterrows():
+        graphique.add_node(row["stop_id"], name=row["stop_name"])
+
+    stop_times = stop_times.sort_values(by=["trip_id", "stop_sequence"])
+    previous_stop = None
+
+    for _, row in stop_times.iterrows():
+        stop_id = row["stop_id"]
+        trip_id = row["trip_id"]
+        arrival_time = row["arrival_time"]
+        departure_time = row["departure_time"]
+        stop_sequence = row["stop_sequence"]
+
+        if previous_stop and previous_stop["trip_id"] == trip_id:
+            if previous_stop["stop_sequence"] < stop_sequence:
+                travel_time = arrival_time - previous_stop["departure_time"]
+                if travel_time > 0:
+                    route_id = trips.loc[trips["trip_id"] == trip_id, "route_id"].values[0]
+                    train_number = routes.loc[routes["route_id"] == route_id, "route_long_name"].values[0]
+                    graphique.add_edge(previous_stop["stop_id"], stop_id, weight=travel_time, trip_id=trip_id, train_number=train_number, transfer=0)
+        else:
+            if previous_stop:
+                route_id = trips.loc[trips["trip_id"] == trip_id, "route_id"].values[0]
+                train_number = routes.loc[routes["route_id"] == route_id, "route_long_name"].values[0]
+                graphique.add_edge(previous_stop["stop_id"], stop_id, weight=max(0, arrival_time - previous_stop["departure_time"]), trip_id=previous_stop["trip_id"], train_number="Correspondance : "+train_number, transfer=1)
+
+        previous_stop = {
+            "stop_id": stop_id,
+            "trip_id": trip_id,
+            "departure_time": departure_time,
+            "stop_sequence": stop_sequence,
+        }
+
+    return graphique
+
+
+def get_fastest_route_pairwise(G, commune_stations, departure_city, arrival_city):
+    """Ancienne recherche : un Dijkstra complet par paire (gare de départ, gare d'arrivée)."""
+    departure_stations = get_stations_for_city(commune_stations, departure_city, G)
+    arrival_stations = get_stations_for_city(commune_stations, arrival_city, G)
+    best_route = None
+    shortest_time = float("inf")
+    for dep in departure_stations or []:
+        for arr in arrival_stations or []:
+            route = get_best_route(G, dep, arr)
+            if route:
+                time_in_seconds = int(route["Duree_totale"][:2]) * 3600 + int(route["Duree_totale"][3:5]) * 60
+                if time_in_seconds < shortest_time:
+                    shortest_time = time_in_seconds
+                    best_route = route
+    return best_route
+
+
+def load_benchmark_graph():
+    """Graphe en cache (data/gares/train_graph) ou reconstruit depuis les CSV, avec son index de gares."""
+    stops, stop_times, trips, routes, _, commune_stations = load_and_merge_data()
+    graphique = load_graph(os.path.join(RAW_DATA_PATH, "train_graph"))
+    if graphique is None:
+        graphique = build_graph(stops, stop_times, trips, routes)
+    return graphique, commune_stations
+
+
+def timed(function, *args, repeat=1):
+    """Exécute `function` `repeat` fois et retourne (dernier résultat, meilleur temps en secondes)."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def benchmark_build(options):
+    """Compare la construction vectorisée du graphe à l'ancienne boucle iterrows (--legacy)."""
+    stops, stop_times, trips, routes, _, _ = load_and_merge_data()
+    print(f"stop_times : {len(stop_times)} lignes, trips : {len(trips)}, stops : {len(stops)}")
+
+    graphique, elapsed = timed(build_graph, stops, stop_times, trips, routes, repeat=5)
+    print(f"build_graph (vectorisé) : {elapsed:.3f} s, {graphique.number_of_edges()} arêtes")
+
+    if "--legacy" in options:
+        reference, elapsed_legacy = timed(build_graph_iterrows, stops, stop_times, trips, routes)
+        # L'ancienne version ne conservait que le nom des gares, la dernière arête de chaque couple
+        # d'arrêts et reliait la fin de chaque voyage au début du suivant ; on compare les trajets en train
+        rides = {(u, v): data["weight"] for u, v, data in graphique.edges(data=True) if not data["transfer"]}
+        reference_rides = {(u, v): data["weight"] for u, v, data in reference.edges(data=True) if not data["transfer"]}
+        identical = (
+            dict(graphique.nodes(data="name")) == dict(reference.nodes(data="name"))
+            # Un trajet en train a pu être écrasé par une fausse correspondance dans l'ancienne version
+            and rides.keys() >= reference_rides.keys()
+        )
+        faster = sum(rides[edge] < weight for edge, weight in reference_rides.items())
+        print(f"build_graph (iterrows)  : {elapsed_legacy:.3f} s, {reference.number_of_edges()} arêtes")
+        print(
+            f"Accélération : x{elapsed_legacy / elapsed:.0f}, mêmes trajets en train : {identical}, "
+            f"{faster} arêtes plus rapides que le dernier voyage inséré"
+        )
+
+
+def benchmark_load(options):
+    """Compare le chargement du graphe : pickle networkx, tableaux NumPy (mmap) et conversion networkx."""
+    stops, stop_times, trips, routes, _, _ = load_and_merge_data()
+    graphique = build_graph(stops, stop_times, trips, routes)
+
+    with tempfile.TemporaryDirectory() as directory:
+        pickle_path = os.path.join(directory, "train_graph.pkl")
+        with open(pickle_path, "wb") as f:
+            pickle.dump(graphique, f)
+        cache_path = os.path.join(directory, "train_graph")
+        fingerprint, elapsed = timed(gtfs_fingerprint, repeat=5)
+        print(f"Empreinte des CSV GTFS : {elapsed * 1000:.1f} ms")
+        save_graph(graphique, cache_path, fingerprint)
+
+        def load_pickle():
+            with open(pickle_path, "rb") as f:
+                return pickle.load(f)
+
+        _, elapsed = timed(load_pickle, repeat=5)
+        print(f"pickle.load (nx.DiGraph)       : {elapsed * 1000:.1f} ms")
+        _, elapsed = timed(StationGraph.load, cache_path, fingerprint, repeat=5)
+        print(f"StationGraph.load (mmap)       : {elapsed * 1000:.1f} ms")
+        _, elapsed = timed(load_graph, cache_path, fingerprint, repeat=5)
+        print(f"load_graph (tableaux -> nx)    : {elapsed * 1000:.1f} ms")
+
+
+def benchmark_stations(options):
+    """Compare get_stations_for_city (parcours du DataFrame et des nœuds) à StationIndex (dictionnaire)."""
+    graphique, commune_stations = load_benchmark_graph()
+
+    index, elapsed = timed(StationIndex, commune_stations, graphique)
+    print(f"Construction de StationIndex : {elapsed * 1000:.0f} ms ({len(index.communes)} communes)")
+
+    def resolve_all(stations):
+        return [get_stations_for_city(stations, city, graphique) for city in BENCHMARK_CITIES]
+
+    legacy, elapsed_legacy = timed(resolve_all, commune_stations, repeat=3)
+    indexed, elapsed_index = timed(resolve_all, index, repeat=100)
+    per_city = len(BENCHMARK_CITIES)
+    print(f"get_stations_for_city (DataFrame) : {elapsed_legacy / per_city * 1000:.2f} ms / ville")
+    print(f"get_stations_for_city (index)     : {elapsed_index / per_city * 1e6:.2f} µs / ville")
+    print(f"Accélération : x{elapsed_legacy / elapsed_index:.0f}")
+    for city, before, after in zip(BENCHMARK_CITIES, legacy, indexed):
+        before, after = set(before or []), set(after or [])
+        if before != after:
+            print(f"  {city} : {len(before)} gares avant, {len(after)} avec l'index ({len(before & after)} en commun)")
+
+
+def benchmark_routes(options):
+    """Compare la recherche paire par paire à la recherche multi-sources / multi-cibles."""
+    graphique, commune_stations = load_benchmark_graph()
+    index = StationIndex(commune_stations, graphique)
+
+    for departure, arrival in BENCHMARK_ROUTES:
+        pairwise, elapsed_pairwise = timed(get_fastest_route_pairwise, graphique, index, departure, arrival)
+        (route, _), elapsed = timed(get_fastest_route_for_city, graphique, index, departure, arrival, repeat=5)
+        print(
+            f"{departure} → {arrival} : paires {elapsed_pairwise * 1000:.1f} ms, multi-sources {elapsed * 1000:.2f} ms, "
+            f"durée {pairwise and pairwise['Duree_totale']} / {route and route['Duree_totale']}"
+        )
+
+
+def benchmark_gtfs(options):
+    """Compare la lecture des CSV GTFS, le cache Feather et la conversion des horaires en secondes."""
+    _, elapsed = timed(load_gtfs, None, repeat=3)
+    print(f"load_gtfs (CSV)             : {elapsed * 1000:.0f} ms")
+    with tempfile.TemporaryDirectory() as directory:
+        load_gtfs(directory)
+        _, elapsed = timed(load_gtfs, directory, repeat=3)
+        print(f"load_gtfs (cache Feather)   : {elapsed * 1000:.0f} ms")
+
+    # Horaires de l'échantillon répétés pour atteindre la taille du GTFS TER complet
+    sample = pd.Series(["07:01:00", "07:46:00", "25:10:00", "34:10:00"] * 250_000)
+
+    def apply_per_row(times):
+        def time_to_seconds(time_str):
+            h, m, s = map(int, time_str.split(":"))
+            return h * 3600 + m * 60 + s
+
+        return times.apply(lambda x: time_to_seconds(x) if isinstance(x, str) else x)
+
+    _, elapsed_apply = timed(apply_per_row, sample)
+    _, elapsed = timed(gtfs_time_to_seconds, sample, repeat=3)
+    print(f"HH:MM:SS -> s, {len(sample)} lignes : apply {elapsed_apply * 1000:.0f} ms, vectorisé {elapsed * 1000:.0f} ms")
+
+
+def benchmark_timetable(options):
+    """Compare les recherches horaires sans date (tous les voyages) et filtrées par jour de circulation."""
+    stops, stop_times, trips, routes, calendar_dates, commune_stations = load_and_merge_data()
+    timetable, elapsed = timed(Timetable, stops, stop_times, trips, routes, calendar_dates)
+    print(
+        f"Timetable : {elapsed * 1000:.0f} ms, {len(timetable)} connexions, "
+        f"jours de circulation {timetable.service_days.shape} ({timetable.service_days.nbytes // 1024} Ko)"
+    )
+    graphique = build_graph(stops, stop_times, trips, routes)
+    index = StationIndex(commune_stations, graphique)
+
+    day = options[0] if options else "2025-03-03"
+    active = timetable.active_connections(day)
+    print(f"Connexions actives le {day} : {len(active)} / {len(timetable)}")
+    for departure, arrival in BENCHMARK_ROUTES:
+        times = []
+        for option in (None, day):
+            (route, _), elapsed = timed(
+                get_earliest_route_for_city, timetable, graphique, index, departure, arrival, "06:00", option, repeat=5
+            )
+            times.append(f"{elapsed * 1000:.2f} ms ({route and route['Heure_arrivee']})")
+        print(f"{departure} → {arrival} : sans date {times[0]}, le {day} {times[1]}")
+
+
+def benchmark_astar(options):
+    """Compare Dijkstra et A* (minorant géographique) : nœuds définitifs, temps et durée trouvée."""
+    graphique, commune_stations = load_benchmark_graph()
+    index = StationIndex(commune_stations, graphique)
+    bounds, elapsed = timed(GeoBounds, graphique)
+    print(
+        f"GeoBounds : {elapsed * 1000:.0f} ms, vitesse max {bounds.max_speed * 3.6:.0f} km/h, "
+        f"{len(bounds.shortcut_nodes)} gares de départ d'arêtes plus rapides"
+    )
+
+    def search(departure, arrival, use_bounds):
+        sources, targets = index.lookup(departure), index.lookup(arrival)
+        heuristic = bounds.heuristic(targets) if use_bounds else None
+        return shortest_path_search(graphique, sources, targets, heuristic)
+
+    totals = [0, 0, 0.0, 0.0]
+    for departure, arrival in BENCHMARK_ROUTES:
+        (path, settled), elapsed = timed(search, departure, arrival, False, repeat=5)
+        (astar_path, astar_settled), astar_elapsed = timed(search, departure, arrival, True, repeat=5)
+        duration = path and calculate_total_travel_time(graphique, path)
+        astar_duration = astar_path and calculate_total_travel_time(graphique, astar_path)
+        totals = [totals[0] + settled, totals[1] + astar_settled, totals[2] + elapsed, totals[3] + astar_elapsed]
+        print(
+            f"{departure} → {arrival} : nœuds {settled} / {astar_settled}, "
+            f"{elapsed * 1000:.2f} ms / {astar_elapsed * 1000:.2f} ms, durée identique : {duration == astar_duration}"
+        )
+    print(
+        f"Total Dijkstra / A* : {totals[0]} / {totals[1]} nœuds, "
+        f"{totals[2] * 1000:.2f} ms / {totals[3] * 1000:.2f} ms"
+    )
+
+
+def benchmark_graph(options):
+    """Compare nx.DiGraph et StationGraph (tableaux en mmap) : mémoire Python et latence des requêtes."""
+    stops, stop_times, trips, routes, _, commune_stations = load_and_merge_data()
+    with tempfile.TemporaryDirectory() as directory:
+        save_graph(build_graph(stops, stop_times, trips, routes), directory)
+
+        graphs = {}
+        for name, loader in (("nx.DiGraph", load_graph), ("StationGraph", load_station_graph)):
+            tracemalloc.start()
+            graphs[name] = loader(directory)
+            memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            graphs[name] = (graphs[name], memory)
+
+        station_graph = graphs["StationGraph"][0]
+        mapped = sum(getattr(station_graph, name).nbytes for name in StationGraph.ARRAYS)
+        for name, (graphique, memory) in graphs.items():
+            index = StationIndex(commune_stations, graphique)
+
+            def run_all():
+                return [get_fastest_route_for_city(graphique, index, departure, arrival) for departure, arrival in BENCHMARK_ROUTES]
+
+            results, elapsed = timed(run_all, repeat=20)
+            # Entre deux arrêts, le DiGraph ne garde qu'un voyage : le détail des trains peut différer
+            graphs[name] = [route and route["Itineraire"] for route, _ in results]
+            extra = f" + {mapped / 1e6:.2f} Mo de tableaux en mmap" if name == "StationGraph" else ""
+            print(
+                f"{name:13s}: {memory / 1e6:.2f} Mo de mémoire Python{extra}, "
+                f"{elapsed / len(BENCHMARK_ROUTES) * 1000:.3f} ms / requête"
+            )
+        print(f"Itinéraires identiques : {graphs['nx.DiGraph'] == graphs['StationGraph']}")
+
+
+def reference_connections(stops, stop_times):
+    """
+    Graphe de référence construit ligne par ligne : une arête par voyage entre deux arrêts
+    consécutifs (nx.MultiDiGraph) et les correspondances entre arrêts d'une même gare.
+    """
+    reference = nx.MultiDiGraph()
+    previous = None
+    rows = stop_times.sort_values(by=["trip_id", "stop_sequence"])
+    for trip_id, stop_id, arrival, departure in zip(
+        rows["trip_id"].astype(str), rows["stop_id"].astype(str), rows["arrival_time"], rows["departure_time"]
+    ):
+        if previous is not None and previous[0] == trip_id and arrival - previous[2] > 0:
+            reference.add_edge(previous[1], stop_id, weight=int(arrival - previous[2]), trip_id=trip_id)
+        previous = (trip_id, stop_id, departure)
+
+    areas = {}
+    for stop_id, parent in zip(stops["stop_id"], stops["parent_station"]):
+        if stop_id in reference and isinstance(parent, str):
+            areas.setdefault(parent, []).append(stop_id)
+    for members in areas.values():
+        reference.add_edges_from((u, v, {"weight": 0}) for u in members for v in members if u != v)
+    return reference
+
+
+def benchmark_parallel(options):
+    """
+    Vérifie que la recherche retient le voyage le plus rapide entre deux arrêts.
+
+    Compare la durée trouvée sur StationGraph au plus court chemin d'un nx.MultiDiGraph de
+    référence (tous les voyages) et à celle d'un DiGraph où le dernier voyage inséré écrase
+    les précédents. Code de sortie 1 en cas d'écart.
+    """
+    from src.path_finding.contraction import path_weight
+    from src.path_finding.dijkstra import build_station_graph
+
+    stops, stop_times, trips, routes, _, commune_stations = load_and_merge_data()
+    graphique, elapsed = timed(build_station_graph, stops, stop_times, trips, routes)
+    edge_bytes = sum(getattr(graphique, name).nbytes for name in ("indices", "weights", "trip_codes", "train_codes", "transfer"))
+    print(f"build_station_graph : {elapsed:.3f} s, {graphique.number_of_edges()} arêtes ({edge_bytes / 1e3:.0f} Ko)")
+    reference = reference_connections(stops, stop_times)
+    overwritten = nx.DiGraph(reference)
+    index = StationIndex(commune_stations, graphique)
+
+    def distance(G, sources, targets):
+        sources = [node for node in sources if node in G]
+        if not sources:
+            return None
+        lengths = nx.multi_source_dijkstra_path_length(G, sources)
+        return min((lengths[node] for node in targets if node in lengths), default=None)
+
+    mismatches = 0
+    for departure, arrival in BENCHMARK_ROUTES:
+        sources, targets = index.lookup(departure), index.lookup(arrival)
+        path, _ = shortest_path_search(graphique, sources, targets)
+        found = path and path_weight(graphique, path)
+        expected = distance(reference, sources, targets)
+        mismatches += found != expected
+        print(
+            f"{departure} → {arrival} : {found} s, référence {expected} s, "
+            f"dernier voyage inséré {distance(overwritten, sources, targets)} s"
+        )
+    print(f"{mismatches} écarts")
+    sys.exit(1 if mismatches else 0)
+
+
+def benchmark_legs(options):
+    """Compare le calcul des étapes d'un itinéraire l'une après l'autre et avec LegPool (processus)."""
+    from src.path_finding.legs import LegPool
+
+    graph_directory = os.path.join(RAW_DATA_PATH, "train_graph")
+    fingerprint = gtfs_fingerprint()
+    graphique = load_station_graph(graph_directory, fingerprint)
+    index = StationIndex(load_and_merge_data()[-1], graphique)
+    processes = int(options[0]) if options else os.cpu_count()
+    pool, elapsed = timed(LegPool, processes, graph_directory, fingerprint)
+    print(f"LegPool : {processes} processus démarrés en {elapsed:.2f} s")
+
+    for count in (1, 2, 4, 8):
+        stops = [BENCHMARK_CITIES[position % len(BENCHMARK_CITIES)] for position in range(count + 1)]
+        legs = list(zip(stops, stops[1:]))
+        sequential, elapsed = timed(
+            lambda: [get_fastest_route_for_city(graphique, index, departure, arrival) for departure, arrival in legs],
+            repeat=10,
+        )
+        parallel, elapsed_pool = timed(pool.fastest_routes, legs, repeat=10)
+        print(
+            f"{count} étapes : séquentiel {elapsed * 1000:.2f} ms, pool {elapsed_pool * 1000:.2f} ms, "
+            f"résultats identiques : {sequential == parallel}"
+        )
+    pool.shutdown()
+
+
+BENCHMARKS = {
+    "build": benchmark_build,
+    "load": benchmark_load,
+    "stations": benchmark_stations,
+    "routes": benchmark_routes,
+    "gtfs": benchmark_gtfs,
+    "timetable": benchmark_timetable,
+    "astar": benchmark_astar,
+    "graph": benchmark_graph,
+    "parallel": benchmark_parallel,
+    "legs": benchmark_legs,
+}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print(f"Usage: python benchmark.py <{' | '.join(BENCHMARKS)}> [options]")
+        sys.exit(1)
+    BENCHMARKS[sys.argv[1]](sys.argv[2:])
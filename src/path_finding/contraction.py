@@ -0,0 +1,354 @@
+"""Hiérarchies de contraction (contraction hierarchies) sur le graphe des gares.
+
+Prétraitement hors ligne : les nœuds sont contractés un par un, du moins
+important au plus important, en ajoutant des raccourcis qui préservent les plus
+courts chemins. Une requête est ensuite un Dijkstra bidirectionnel qui ne monte
+que vers des nœuds plus importants et n'explore que quelques dizaines de nœuds.
+
+Usage :
+    python -m src.path_finding.contraction build [dossier]
+    python -m src.path_finding.contraction validate [dossier] [nombre de paires]
+"""
+
+import heapq
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+from src.path_finding.station_graph import encode_strings, decode_strings, save_arrays, load_arrays
+
+FORMAT_VERSION = 1
+# Nombre maximal de nœuds explorés par une recherche de témoin : au-delà, le raccourci est ajouté
+WITNESS_LIMIT = 500
+
+
+def witness_distances(out_edges, source, excluded, max_distance, limit=WITNESS_LIMIT):
+    """Dijkstra local depuis `source` sans passer par `excluded`, borné en distance et en nœuds explorés."""
+    distances = {source: 0}
+    heap = [(0, source)]
+    settled = 0
+    while heap and settled < limit:
+        distance, node = heapq.heappop(heap)
+        if distance > distances[node]:
+            continue
+        if distance > max_distance:
+            break
+        settled += 1
+        for neighbor, (weight, _) in out_edges[node].items():
+            new_distance = distance + weight
+            if neighbor != excluded and new_distance < distances.get(neighbor, float("inf")):
+                distances[neighbor] = new_distance
+                heapq.heappush(heap, (new_distance, neighbor))
+    return distances
+
+
+def needed_shortcuts(out_edges, in_edges, node):
+    """Raccourcis (amont, aval, poids) à ajouter si `node` est contracté maintenant."""
+    shortcuts = []
+    outgoing = out_edges[node]
+    if not outgoing:
+        return shortcuts
+    max_out = max(weight for weight, _ in outgoing.values())
+    for upstream, (weight_in, _) in in_edges[node].items():
+        distances = witness_distances(out_edges, upstream, node, weight_in + max_out)
+        for downstream, (weight_out, _) in outgoing.items():
+            if downstream == upstream:
+                continue
+            via = weight_in + weight_out
+            if distances.get(downstream, float("inf")) > via:
+                shortcuts.append((upstream, downstream, via))
+    return shortcuts
+
+
+def build_hierarchy(G):
+    """Contracte tous les nœuds de G et retourne la ContractionHierarchy correspondante."""
+    stop_ids = list(G.nodes)
+    codes = {stop_id: code for code, stop_id in enumerate(stop_ids)}
+    count = len(stop_ids)
+
+    # Arêtes restantes : voisin -> (poids, nœud contracté au milieu ou -1 pour une arête d'origine)
+    out_edges = [{} for _ in range(count)]
+    in_edges = [{} for _ in range(count)]
+    for source, target, data in G.edges(data=True):
+        source, target = codes[source], codes[target]
+        if source != target and data["weight"] < out_edges[source].get(target, (float("inf"), -1))[0]:
+            out_edges[source][target] = (data["weight"], -1)
+            in_edges[target][source] = (data["weight"], -1)
+
+    deleted_neighbors = [0] * count
+    rank = np.zeros(count, dtype=np.int32)
+    # Arêtes de la hiérarchie, rattachées au nœud le moins important de chaque arête
+    upward = [[] for _ in range(count)]  # (cible, poids, milieu) pour la recherche avant
+    downward = [[] for _ in range(count)]  # (source, poids, milieu) pour la recherche arrière
+
+    def priority(node):
+        # Différence d'arêtes : raccourcis ajoutés moins arêtes retirées, plus les voisins déjà contractés
+        shortcuts = needed_shortcuts(out_edges, in_edges, node)
+        return len(shortcuts) - len(out_edges[node]) - len(in_edges[node]) + deleted_neighbors[node], shortcuts
+
+    heap = [(priority(node)[0], node) for node in range(count)]
+    heapq.heapify(heap)
+    order = 0
+    while heap:
+        _, node = heapq.heappop(heap)
+        # Mise à jour paresseuse : la priorité a pu augmenter depuis son insertion
+        current, shortcuts = priority(node)
+        if heap and current > heap[0][0]:
+            heapq.heappush(heap, (current, node))
+            continue
+
+        rank[node] = order
+        order += 1
+        for target, (weight, middle) in out_edges[node].items():
+            upward[node].append((target, weight, middle))
+            del in_edges[target][node]
+            deleted_neighbors[target] += 1
+        for source, (weight, middle) in in_edges[node].items():
+            downward[node].append((source, weight, middle))
+            del out_edges[source][node]
+            deleted_neighbors[source] += 1
+        out_edges[node], in_edges[node] = {}, {}
+
+        for upstream, downstream, weight in shortcuts:
+            if weight < out_edges[upstream].get(downstream, (float("inf"), -1))[0]:
+                out_edges[upstream][downstream] = (weight, node)
+                in_edges[downstream][upstream] = (weight, node)
+
+    def to_csr(rows):
+        indptr = np.zeros(count + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(row) for row in rows])
+        edges = np.array([edge for row in rows for edge in row], dtype=np.int64).reshape(-1, 3)
+        return indptr, edges[:, 0].astype(np.int32), edges[:, 1].astype(np.int32), edges[:, 2].astype(np.int32)
+
+    up_indptr, up_indices, up_weights, up_middles = to_csr(upward)
+    down_indptr, down_indices, down_weights, down_middles = to_csr(downward)
+    return ContractionHierarchy(
+        stop_ids=encode_strings(stop_ids),
+        rank=rank,
+        up_indptr=up_indptr,
+        up_indices=up_indices,
+        up_weights=up_weights,
+        up_middles=up_middles,
+        down_indptr=down_indptr,
+        down_indices=down_indices,
+        down_weights=down_weights,
+        down_middles=down_middles,
+    )
+
+
+class ContractionHierarchy:
+    """Graphe ascendant (recherche avant) et descendant (recherche arrière) en CSR, avec les milieux des raccourcis."""
+
+    ARRAYS = (
+        "stop_ids",  # identifiant GTFS de chaque nœud, dans l'ordre du graphe
+        "rank",  # ordre de contraction de chaque nœud
+        "up_indptr",  # arêtes u -> v avec rank[v] > rank[u], rangées sous u
+        "up_indices",
+        "up_weights",
+        "up_middles",  # nœud contracté au milieu du raccourci, -1 pour une arête d'origine
+        "down_indptr",  # arêtes v -> u avec rank[v] > rank[u], rangées sous u
+        "down_indices",
+        "down_weights",
+        "down_middles",
+    )
+
+    def __init__(self, **arrays):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.nodes = {stop_id: code for code, stop_id in enumerate(decode_strings(self.stop_ids))}
+        self.stop_id_list = list(self.nodes)
+        # Listes Python par nœud : plus rapides que les tableaux NumPy dans la boucle de recherche
+        self.up = self._adjacency(self.up_indptr, self.up_indices, self.up_weights)
+        self.down = self._adjacency(self.down_indptr, self.down_indices, self.down_weights)
+        # Milieu de chaque raccourci (source, cible) ; une arête absente de ce dictionnaire est une arête d'origine
+        self.middles = {}
+        for indptr, indices, middles, upward in (
+            (self.up_indptr, self.up_indices, self.up_middles, True),
+            (self.down_indptr, self.down_indices, self.down_middles, False),
+        ):
+            lower = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+            shortcuts = np.flatnonzero(middles >= 0)
+            for node, neighbor, middle in zip(lower[shortcuts].tolist(), indices[shortcuts].tolist(), middles[shortcuts].tolist()):
+                self.middles[(node, neighbor) if upward else (neighbor, node)] = middle
+
+    @property
+    def number_of_shortcuts(self):
+        return len(self.middles)
+
+    @staticmethod
+    def _adjacency(indptr, indices, weights):
+        indptr, indices, weights = indptr.tolist(), indices.tolist(), weights.tolist()
+        return [
+            list(zip(indices[start:end], weights[start:end])) if end > start else ()
+            for start, end in zip(indptr[:-1], indptr[1:])
+        ]
+
+    def save(self, directory, fingerprint=None):
+        save_arrays(directory, {name: getattr(self, name) for name in self.ARRAYS}, FORMAT_VERSION, fingerprint)
+
+    @classmethod
+    def load(cls, directory, fingerprint=None):
+        """Charge la hiérarchie, ou retourne None si elle est absente, d'une autre version ou périmée."""
+        arrays = load_arrays(directory, cls.ARRAYS, FORMAT_VERSION, fingerprint)
+        return cls(**arrays) if arrays is not None else None
+
+    @staticmethod
+    def _search(adjacency, distances, parents, heap):
+        """Un pas de recherche : fixe le nœud en tête de `heap` et relâche ses arêtes montantes."""
+        distance, node = heapq.heappop(heap)
+        if distance > distances[node]:
+            return None
+        for neighbor, weight in adjacency[node]:
+            new_distance = distance + weight
+            if new_distance < distances.get(neighbor, float("inf")):
+                distances[neighbor] = new_distance
+                parents[neighbor] = node
+                heapq.heappush(heap, (new_distance, neighbor))
+        return node
+
+    def shortest_path(self, sources, targets):
+        """Plus court chemin (liste de stop_id) d'une des gares `sources` vers une des gares `targets`, ou None."""
+        nodes = self.nodes
+        forward = {nodes[stop_id]: 0 for stop_id in sources if stop_id in nodes}
+        backward = {nodes[stop_id]: 0 for stop_id in targets if stop_id in nodes}
+        forward_parents, backward_parents = {}, {}
+        forward_heap = [(0, node) for node in forward]
+        backward_heap = [(0, node) for node in backward]
+        heapq.heapify(forward_heap)
+        heapq.heapify(backward_heap)
+
+        infinity = float("inf")
+        best, meeting = infinity, None
+        for node in forward.keys() & backward.keys():
+            best, meeting = 0, node
+        # Les deux recherches alternent jusqu'à ce qu'aucune ne puisse plus améliorer `best`
+        while forward_heap or backward_heap:
+            forward_min = forward_heap[0][0] if forward_heap else infinity
+            backward_min = backward_heap[0][0] if backward_heap else infinity
+            if min(forward_min, backward_min) >= best:
+                break
+            if forward_min <= backward_min:
+                node = self._search(self.up, forward, forward_parents, forward_heap)
+            else:
+                node = self._search(self.down, backward, backward_parents, backward_heap)
+            if node is not None and node in forward and node in backward:
+                total = forward[node] + backward[node]
+                if total < best:
+                    best, meeting = total, node
+
+        if meeting is None:
+            return None
+
+        # Chemin dans la hiérarchie : sources -> meeting -> targets
+        path = [meeting]
+        while path[-1] in forward_parents:
+            path.append(forward_parents[path[-1]])
+        path.reverse()
+        while path[-1] in backward_parents:
+            path.append(backward_parents[path[-1]])
+
+        # Remplacement récursif des raccourcis par les arêtes d'origine
+        nodes_path = [path[0]]
+        for source, target in zip(path, path[1:]):
+            nodes_path.extend(self._unpack(source, target))
+        return [self.stop_id_list[node] for node in nodes_path]
+
+    def _unpack(self, source, target):
+        """Nœuds (sans `source`) du chemin d'origine représenté par l'arête source -> target."""
+        stack = [(source, target)]
+        path = []
+        while stack:
+            source, target = stack.pop()
+            middle = self.middles.get((source, target))
+            if middle is None:
+                path.append(target)
+            else:
+                stack.append((middle, target))
+                stack.append((source, middle))
+        return path
+
+
+def path_weight(G, path):
+    """Somme des poids des arêtes d'un chemin (critère minimisé par Dijkstra et par la hiérarchie)."""
+    return sum(G.adj[source][target]["weight"] for source, target in zip(path, path[1:]))
+
+
+def validate(G, hierarchy, pairs):
+    """Compare la hiérarchie à shortest_path_search sur des paires (sources, cibles) ; retourne les écarts."""
+    from src.path_finding.dijkstra import shortest_path_search, format_route
+
+    mismatches = []
+    same_route = 0
+    elapsed_dijkstra = elapsed_hierarchy = 0.0
+    for sources, targets in pairs:
+        start = time.perf_counter()
+        expected, _ = shortest_path_search(G, sources, targets)
+        elapsed_dijkstra += time.perf_counter() - start
+        start = time.perf_counter()
+        path = hierarchy.shortest_path(sources, targets)
+        elapsed_hierarchy += time.perf_counter() - start
+
+        if expected is None or path is None:
+            if expected != path:
+                mismatches.append((sources, targets, expected, path))
+            else:
+                same_route += 1
+            continue
+        if path_weight(G, expected) != path_weight(G, path) or path[0] not in sources or path[-1] not in targets:
+            mismatches.append((sources, targets, expected, path))
+        elif format_route(G, expected) == format_route(G, path):
+            same_route += 1
+    return mismatches, same_route, elapsed_dijkstra, elapsed_hierarchy
+
+
+if __name__ == "__main__":
+    from src.path_finding.dijkstra import RAW_DATA_PATH, gtfs_fingerprint, load_graph, load_and_merge_data, \
+        build_graph, save_graph, load_commune_stations
+    from src.path_finding.stations import StationIndex
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ("build", "validate"):
+        print("Usage: python -m src.path_finding.contraction <build | validate> [dossier] [paires]")
+        sys.exit(1)
+    directory = sys.argv[2] if len(sys.argv) > 2 else os.path.join(RAW_DATA_PATH, "train_hierarchy")
+
+    fingerprint = gtfs_fingerprint()
+    G = load_graph(os.path.join(RAW_DATA_PATH, "train_graph"), fingerprint)
+    if G is None:
+        stops, stop_times, trips, routes, _, _ = load_and_merge_data()
+        G = build_graph(stops, stop_times, trips, routes)
+        save_graph(G, os.path.join(RAW_DATA_PATH, "train_graph"), fingerprint)
+
+    if sys.argv[1] == "build":
+        start = time.perf_counter()
+        hierarchy = build_hierarchy(G)
+        hierarchy.save(directory, fingerprint)
+        print(
+            f"Hiérarchie construite en {time.perf_counter() - start:.2f} s "
+            f"({hierarchy.number_of_shortcuts} raccourcis), sauvegardée dans {directory}"
+        )
+    else:
+        hierarchy = ContractionHierarchy.load(directory, fingerprint)
+        if hierarchy is None:
+            print(f"Aucune hiérarchie à jour dans {directory} : lancer d'abord la commande build")
+            sys.exit(1)
+        # Jeu de validation : paires de villes du benchmark et paires de gares tirées au hasard (graine fixe)
+        from src.path_finding.benchmark import BENCHMARK_CITIES
+
+        index = StationIndex(load_commune_stations(), G)
+        cities = [index.lookup(city) for city in BENCHMARK_CITIES]
+        pairs = [(dep, arr) for dep in cities for arr in cities if dep and arr and dep != arr]
+        connected = [node for node in G.nodes if G.degree(node)]
+        generator = random.Random(0)
+        count = int(sys.argv[3]) if len(sys.argv) > 3 else 2000
+        pairs += [([generator.choice(connected)], [generator.choice(connected)]) for _ in range(count)]
+
+        mismatches, same_route, elapsed_dijkstra, elapsed_hierarchy = validate(G, hierarchy, pairs)
+        print(f"{len(pairs)} requêtes, {len(mismatches)} durées différentes, {same_route} itinéraires identiques")
+        print(
+            f"Dijkstra : {elapsed_dijkstra / len(pairs) * 1000:.3f} ms / requête, "
+            f"hiérarchie : {elapsed_hierarchy / len(pairs) * 1000:.3f} ms / requête"
+        )
+        sys.exit(1 if mismatches else 0)
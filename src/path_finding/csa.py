@@ -0,0 +1,429 @@
+"""Calcul d'itinéraires horaires (Connection Scan Algorithm).
+
+Contrairement au graphe statique de dijkstra.py, chaque connexion élémentaire
+(un train qui relie deux arrêts consécutifs à une heure donnée) est conservée.
+Les connexions sont stockées dans des tableaux triés par heure de départ, ce qui
+permet de répondre à « arrivée au plus tôt de A vers B en partant après T le jour D »
+en un seul parcours linéaire.
+"""
+
+import re
+from bisect import bisect_left
+from datetime import date as date_type, datetime
+
+import numpy as np
+import pandas as pd
+
+from src.path_finding.dijkstra import get_stations_for_city
+
+TRANSFER_TIME = 600  # 10 minutes de correspondance, comme calculate_total_travel_time
+ACTIVE_DAYS_CACHE_SIZE = 32
+MAX_TRIPS = 6  # trains par trajet pour la recherche multicritère (5 correspondances)
+# Heure de départ saisie par l'utilisateur
+TIME_FORMAT = re.compile(r"([01]?\d|2[0-3]):[0-5]\d(:[0-5]\d)?")
+PARETO_SLACK = 4 * 3600  # retard maximal sur le trajet le plus rapide pour un trajet avec moins de correspondances
+
+
+def time_to_seconds(time_str):
+    """Convertit une heure HH:MM ou HH:MM:SS en secondes depuis minuit."""
+    parts = [int(part) for part in str(time_str).split(":")]
+    parts += [0] * (3 - len(parts))
+    hours, minutes, seconds = parts
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def seconds_to_time(seconds):
+    """Convertit des secondes en HH:MM:SS."""
+    hours, remainder = divmod(int(seconds), 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{hours:02}:{minutes:02}:{seconds:02}"
+
+
+def date_to_int(day):
+    """Normalise une date (date, 'YYYY-MM-DD', 'YYYYMMDD' ou int) au format GTFS YYYYMMDD."""
+    if day is None:
+        return None
+    if isinstance(day, (date_type, datetime)):
+        return day.year * 10000 + day.month * 100 + day.day
+    return int(str(day).replace("-", ""))
+
+
+def day_ordinal(day):
+    """Numéro du jour (date.toordinal) d'une date acceptée par date_to_int."""
+    day = date_to_int(day)
+    return date_type(day // 10000, day // 100 % 100, day % 100).toordinal()
+
+
+def parse_date(value):
+    """Valide une date de voyage ('YYYY-MM-DD' ou 'YYYYMMDD') et la retourne au format GTFS YYYYMMDD (ValueError sinon)."""
+    if value is None:
+        return None
+    day_ordinal(value)
+    return date_to_int(value)
+
+
+def parse_time(value):
+    """Valide une heure de départ ('HH:MM' ou 'HH:MM:SS') et la retourne telle quelle (ValueError sinon)."""
+    if value is None or value == "":
+        return None
+    if not isinstance(value, str) or TIME_FORMAT.fullmatch(value) is None:
+        raise ValueError(f"invalid departure time: {value!r}")
+    return value
+
+
+def parse_flag(value):
+    """Valide l'option pareto : booléen JSON, ou 'true' / '1' / 'on' et 'false' / '0' / 'off' d'un formulaire (ValueError sinon)."""
+    if value is None or isinstance(value, bool):
+        return bool(value)
+    if isinstance(value, str) and value.lower() in ("1", "true", "on"):
+        return True
+    if isinstance(value, str) and value.lower() in ("", "0", "false", "off"):
+        return False
+    raise ValueError(f"invalid flag: {value!r}")
+
+
+def build_service_days(calendar_dates, service_ids):
+    """
+    Matrice de bits (service × jour) construite à partir de calendar_dates.
+
+    Retourne (premier jour en ordinal, tableau uint8 de forme (services, jours / 8)) :
+    le service s circule le jour first_day + d si le bit d de la ligne s est à 1.
+    """
+    codes = pd.Categorical(calendar_dates["service_id"].astype(str), categories=service_ids).codes
+    known = codes >= 0
+    codes = codes[known]
+    days = calendar_dates["date"].to_numpy()[known].astype(np.int64)
+    exception_types = calendar_dates["exception_type"].to_numpy()[known]
+    if not len(days):
+        return 0, np.zeros((len(service_ids), 1), dtype=np.uint8)
+
+    # YYYYMMDD -> numéro du jour, calculé une fois par date distincte
+    unique_days, day_codes = np.unique(days, return_inverse=True)
+    ordinals = np.array([day_ordinal(int(day)) for day in unique_days])
+    first_day = int(ordinals.min())
+    offsets = ordinals[day_codes] - first_day
+
+    bits = np.zeros((len(service_ids), int(ordinals.max()) - first_day + 1), dtype=bool)
+    # exception_type 1 : service ajouté ce jour-là, 2 : service supprimé ce jour-là
+    added = exception_types == 1
+    bits[codes[added], offsets[added]] = True
+    bits[codes[~added], offsets[~added]] = False
+    return first_day, np.packbits(bits, axis=1)
+
+
+class Timetable:
+    """Connexions ferroviaires triées par heure de départ, stockées dans des tableaux plats."""
+
+    def __init__(self, stops, stop_times, trips, routes, calendar_dates):
+        # Les correspondances se font à l'échelle de la gare (StopArea) et non du quai (StopPoint)
+        stops = stops.drop_duplicates(subset="stop_id")
+        parent = stops["parent_station"].where(stops["parent_station"].notna(), stops["stop_id"])
+        stop_names = stops.set_index("stop_id")["stop_name"]
+
+        self.station_ids = parent.drop_duplicates().to_numpy()
+        station_codes = {station: code for code, station in enumerate(self.station_ids)}
+        self.station_names = [stop_names.get(station, station) for station in self.station_ids]
+        self.stop_to_station = {stop_id: station_codes[station] for stop_id, station in zip(stops["stop_id"], parent)}
+
+        # Voyages : numéro de train et service de circulation
+        trips = trips.drop_duplicates(subset="trip_id").reset_index(drop=True)
+        route_names = routes.drop_duplicates(subset="route_id").set_index("route_id")["route_long_name"]
+        self.trip_ids = trips["trip_id"].to_numpy()
+        self.trip_trains = trips["route_id"].map(route_names).fillna("Train Inconnu").tolist()
+        self.service_ids, trip_services = np.unique(trips["service_id"].astype(str), return_inverse=True)
+        self.trip_services = trip_services.astype(np.int32)
+        # Jours de circulation : une matrice de bits service × jour (un octet pour 8 jours)
+        self.first_day, self.service_days = build_service_days(calendar_dates, self.service_ids)
+        self._active_connections = {}
+        trip_codes = pd.Series(np.arange(len(trips), dtype=np.int32), index=trips["trip_id"])
+
+        # Connexions : deux arrêts consécutifs d'un même voyage, dans l'ordre du voyage
+        stop_times = stop_times[stop_times["trip_id"].isin(trip_codes.index)]
+        stop_times = stop_times.sort_values(by=["trip_id", "stop_sequence"])
+        trip_column = stop_times["trip_id"].to_numpy()
+        same_trip = trip_column[1:] == trip_column[:-1]
+        stations = stop_times["stop_id"].map(self.stop_to_station).to_numpy()
+        departures = stop_times["departure_time"].to_numpy()
+        arrivals = stop_times["arrival_time"].to_numpy()
+        connections = pd.DataFrame({
+            "trip": trip_codes[trip_column[:-1][same_trip]].to_numpy(),
+            "dep_station": stations[:-1][same_trip],
+            "arr_station": stations[1:][same_trip],
+            "dep_time": departures[:-1][same_trip],
+            "arr_time": arrivals[1:][same_trip],
+        })
+        connections = connections[connections["arr_time"] >= connections["dep_time"]].reset_index(drop=True)
+
+        # Tri par heure de départ ; scan_order[k] = ligne (ordre du voyage) de la k-ième connexion scannée
+        scan_order = np.lexsort((connections["arr_time"].to_numpy(), connections["dep_time"].to_numpy()))
+        self.scan_order = scan_order
+        self.trip_order = np.empty_like(scan_order)
+        self.trip_order[scan_order] = np.arange(len(scan_order))
+
+        connections = connections.iloc[scan_order]
+        # Des listes Python sont plus rapides que des tableaux NumPy dans la boucle de scan
+        self.dep_station = connections["dep_station"].astype(np.int32).tolist()
+        self.arr_station = connections["arr_station"].astype(np.int32).tolist()
+        self.dep_time = connections["dep_time"].astype(np.int32).tolist()
+        self.arr_time = connections["arr_time"].astype(np.int32).tolist()
+        self.trip = connections["trip"].astype(np.int32).tolist()
+        self.connection_trips = connections["trip"].to_numpy(dtype=np.int32)
+
+    def __len__(self):
+        return len(self.dep_time)
+
+    def stations_for_stops(self, stop_ids):
+        """Convertit des stop_id (StopPoint ou StopArea) en indices de gares du tableau horaire."""
+        stations = {self.stop_to_station[stop_id] for stop_id in stop_ids if stop_id in self.stop_to_station}
+        return sorted(stations)
+
+    @property
+    def number_of_days(self):
+        return self.service_days.shape[1] * 8
+
+    def active_services(self, day):
+        """Masque des services circulant le jour donné (tous à False hors de la période du calendrier)."""
+        offset = day_ordinal(day) - self.first_day
+        if not 0 <= offset < self.number_of_days:
+            return np.zeros(len(self.service_ids), dtype=bool)
+        byte, bit = divmod(offset, 8)
+        return (self.service_days[:, byte] & (0x80 >> bit)).astype(bool)
+
+    def active_trips(self, day):
+        """Masque des voyages circulant le jour donné (None : tous les voyages)."""
+        if day is None:
+            return None
+        return self.active_services(day)[self.trip_services]
+
+    def active_connections(self, day):
+        """Indices de scan des connexions des voyages circulant ce jour-là (None : toutes les connexions)."""
+        if day is None:
+            return None
+        day = date_to_int(day)
+        connections = self._active_connections.get(day)
+        if connections is None:
+            connections = np.flatnonzero(self.active_trips(day)[self.connection_trips])
+            # Quelques jours distincts sont demandés en pratique : on garde les derniers calculés
+            if len(self._active_connections) >= ACTIVE_DAYS_CACHE_SIZE:
+                self._active_connections.pop(next(iter(self._active_connections)))
+            self._active_connections[day] = connections
+        return connections
+
+    def scan_indices(self, departure_time, day=None):
+        """Indices des connexions partant à partir de `departure_time`, dans l'ordre du scan."""
+        first = bisect_left(self.dep_time, departure_time)
+        active = self.active_connections(day)
+        if active is None:
+            return range(first, len(self.dep_time))
+        # Seules les connexions des voyages qui circulent ce jour-là sont parcourues
+        return active[np.searchsorted(active, first):].tolist()
+
+    def leg_connections(self, board, alight):
+        """Connexions (indices de scan) parcourues entre la montée et la descente d'un voyage."""
+        first, last = self.scan_order[board], self.scan_order[alight]
+        return [int(self.trip_order[row]) for row in range(first, last + 1)]
+
+
+def earliest_arrival(timetable, sources, targets, departure_time, day=None, transfer_time=TRANSFER_TIME):
+    """
+    Arrivée au plus tôt depuis n'importe quelle gare de `sources` vers n'importe quelle gare de `targets`.
+
+    Retourne la liste des trajets (connexion de montée, connexion de descente) ou None.
+    """
+    targets = set(targets)
+    infinity = float("inf")
+    arrival = {source: departure_time for source in sources}
+    in_connection = {}
+    boarded = {}
+    best_target = infinity
+    best_station = None
+
+    dep_station, arr_station = timetable.dep_station, timetable.arr_station
+    dep_time, arr_time, trips = timetable.dep_time, timetable.arr_time, timetable.trip
+
+    for index in timetable.scan_indices(departure_time, day):
+        departure = dep_time[index]
+        if departure >= best_target:
+            break
+        trip = trips[index]
+        if trip not in boarded:
+            station = dep_station[index]
+            reached = arrival.get(station, infinity)
+            # Pas de temps de correspondance à la gare de départ
+            if station in in_connection:
+                reached += transfer_time
+            if reached > departure:
+                continue
+            boarded[trip] = index
+
+        station = arr_station[index]
+        if arr_time[index] < arrival.get(station, infinity):
+            arrival[station] = arr_time[index]
+            in_connection[station] = (boarded[trip], index)
+            if station in targets and arr_time[index] < best_target:
+                best_target = arr_time[index]
+                best_station = station
+
+    if best_station is None:
+        return None
+
+    legs = []
+    station = best_station
+    while station in in_connection:
+        board, alight = in_connection[station]
+        legs.append((board, alight))
+        station = dep_station[board]
+    return legs[::-1]
+
+
+def pareto_journeys(timetable, sources, targets, departure_time, day=None, max_trips=MAX_TRIPS,
+                    slack=PARETO_SLACK, transfer_time=TRANSFER_TIME):
+    """
+    Trajets Pareto-optimaux (heure d'arrivée / nombre de trains) en un seul parcours des connexions.
+
+    arrival[k][gare] est l'arrivée au plus tôt avec au plus k trains ; chaque voyage retient le plus
+    petit k avec lequel on peut y monter. Le parcours s'arrête dès qu'aucun trajet ne peut plus arriver
+    moins de `slack` secondes après le plus rapide. Retourne une liste de trajets (liste de (montée,
+    descente)), du moins de trains au plus rapide : chacun arrive strictement plus tôt que le précédent.
+    """
+    targets = set(targets)
+    infinity = float("inf")
+    rounds = range(max_trips + 1)
+    arrival = [{source: departure_time for source in sources} for _ in rounds]
+    # in_connection[k][gare] = (montée, descente, nombre de trains réellement utilisés)
+    in_connection = [{} for _ in rounds]
+    best_target = [infinity for _ in rounds]
+    boarded = {}
+
+    dep_station, arr_station = timetable.dep_station, timetable.arr_station
+    dep_time, arr_time, trips = timetable.dep_time, timetable.arr_time, timetable.trip
+
+    def reachable(station, k, departure):
+        reached = arrival[k].get(station, infinity)
+        if station in in_connection[k]:
+            reached += transfer_time
+        return reached <= departure
+
+    for index in timetable.scan_indices(departure_time, day):
+        departure = dep_time[index]
+        # Un trajet partant après l'arrivée directe la plus tôt est dominé, et un trajet partant
+        # plus de `slack` après l'arrivée la plus tôt est trop lent
+        if departure >= best_target[1] or departure > best_target[max_trips] + slack:
+            break
+        trip = trips[index]
+        current = boarded.get(trip, (max_trips + 1, None))[0]
+        station = dep_station[index]
+        # Monter ici avec moins de trains qu'au premier arrêt où l'on a pu monter ; arrival[k] décroît
+        # avec k : si la gare n'est pas atteinte avec current - 2 trains, elle ne l'est pas avec moins
+        if current > 1 and reachable(station, current - 2, departure):
+            for k in range(1, current):
+                if departure < best_target[k] and reachable(station, k - 1, departure):
+                    boarded[trip] = (k, index)
+                    break
+        if trip not in boarded:
+            continue
+
+        k, board = boarded[trip]
+        station, arrival_time = arr_station[index], arr_time[index]
+        if arrival_time >= best_target[k]:
+            continue
+        # Une arrivée avec k trains vaut aussi pour k + 1, k + 2... trains
+        for rank in range(k, max_trips + 1):
+            if arrival_time >= arrival[rank].get(station, infinity):
+                break
+            arrival[rank][station] = arrival_time
+            in_connection[rank][station] = (board, index, k)
+            if station in targets:
+                best_target[rank] = min(best_target[rank], arrival_time)
+
+    journeys = []
+    previous_best = infinity
+    for k in range(1, max_trips + 1):
+        if best_target[k] >= previous_best or best_target[k] > best_target[max_trips] + slack:
+            continue
+        previous_best = best_target[k]
+        station = min(
+            (target for target in targets if target in in_connection[k]), key=lambda target: arrival[k][target]
+        )
+        legs = []
+        rank = k
+        while station in in_connection[rank]:
+            board, alight, used = in_connection[rank][station]
+            legs.append((board, alight))
+            station, rank = dep_station[board], used - 1
+        journeys.append(legs[::-1])
+    return journeys
+
+
+def format_journey(timetable, legs):
+    """Met en forme un trajet comme get_best_route (Itineraire, Duree_totale, Correspondances)."""
+    names = timetable.station_names
+    stations = [timetable.dep_station[legs[0][0]]]
+    trip_details = []
+    for board, alight in legs:
+        for connection in timetable.leg_connections(board, alight):
+            stations.append(timetable.arr_station[connection])
+        train_number = timetable.trip_trains[timetable.trip[board]]
+        trip_details.append(
+            f"{train_number}: {names[timetable.dep_station[board]]} → {names[timetable.arr_station[alight]]}"
+        )
+
+    departure = timetable.dep_time[legs[0][0]]
+    arrival = timetable.arr_time[legs[-1][1]]
+    return {
+        "Itineraire": " → ".join(names[station] for station in stations),
+        "Duree_totale": seconds_to_time(arrival - departure),
+        "Correspondances": trip_details,
+        "Heure_depart": seconds_to_time(departure),
+        "Heure_arrivee": seconds_to_time(arrival),
+    }
+
+
+def get_earliest_route_for_city(timetable, G, commune_stations, departure_city, arrival_city, departure_time, day=None):
+    """Trouve le trajet arrivant au plus tôt entre deux villes, en partant après `departure_time`."""
+    error = []
+    departure_stops = get_stations_for_city(commune_stations, departure_city, G)
+    arrival_stops = get_stations_for_city(commune_stations, arrival_city, G)
+    if not departure_stops or not arrival_stops:
+        error.append(f"Aucune gare trouvée pour {departure_city if not departure_stops else arrival_city}")
+        return None, error
+
+    if isinstance(departure_time, str):
+        departure_time = time_to_seconds(departure_time)
+    legs = earliest_arrival(
+        timetable,
+        timetable.stations_for_stops(departure_stops),
+        timetable.stations_for_stops(arrival_stops),
+        departure_time,
+        day,
+    )
+    if not legs:
+        error.append("Aucun trajet trouvé.")
+        return None, error
+
+    return format_journey(timetable, legs), None
+
+
+def get_pareto_routes_for_city(timetable, G, commune_stations, departure_city, arrival_city, departure_time, day=None):
+    """Trajets entre deux villes offrant chacun un meilleur compromis heure d'arrivée / correspondances."""
+    error = []
+    departure_stops = get_stations_for_city(commune_stations, departure_city, G)
+    arrival_stops = get_stations_for_city(commune_stations, arrival_city, G)
+    if not departure_stops or not arrival_stops:
+        error.append(f"Aucune gare trouvée pour {departure_city if not departure_stops else arrival_city}")
+        return None, error
+
+    if isinstance(departure_time, str):
+        departure_time = time_to_seconds(departure_time)
+    journeys = pareto_journeys(
+        timetable,
+        timetable.stations_for_stops(departure_stops),
+        timetable.stations_for_stops(arrival_stops),
+        departure_time,
+        day,
+    )
+    if not journeys:
+        error.append("Aucun trajet trouvé.")
+        return None, error
+
+    return [format_journey(timetable, legs) for legs in journeys], None
@@ -1,136 +1,231 @@
-import pickle
 import pandas as pd
+import numpy as np
 import heapq
 import networkx as nx
 import os
 
+from src.path_finding.gtfs import RAW_DATA_PATH, load_gtfs, source_fingerprint
+from src.path_finding.station_graph import StationGraph, FORMAT_VERSION
+from src.path_finding.stations import StationIndex
 
-def load_and_merge_data():
-    train_types = ["tgv", "ter", "intercites"]
+# Fichiers GTFS dont dépend le graphe
+GRAPH_SOURCES = ["stops.csv", "stop_times.csv", "trips.csv", "routes.csv"]
+# Cache Feather des tables GTFS normalisées (utilisé seulement si pyarrow est installé)
+GTFS_CACHE_PATH = os.path.join(RAW_DATA_PATH, "gtfs_cache")
+# Gares de chaque commune
+COMMUNE_STATIONS_PATH = os.path.join(RAW_DATA_PATH, "liste-des-gares (3).csv")
 
-    # Charger et concaténer les fichiers pour chaque type de train
-    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
-    raw_data_path = os.path.join(project_root, 'data', 'gares')
 
-    stops = pd.concat([pd.read_csv(os.path.join(raw_data_path, train, "stops.csv")) for train in train_types]).drop_duplicates()
-    stop_times = pd.concat([pd.read_csv(os.path.join(raw_data_path, train, "stop_times.csv")) for train in train_types]).drop_duplicates()
-    trips = pd.concat([pd.read_csv(os.path.join(raw_data_path, train, "trips.csv")) for train in train_types]).drop_duplicates()
-    routes = pd.concat([pd.read_csv(os.path.join(raw_data_path, train, "routes.csv")) for train in train_types]).drop_duplicates()
-    calendar_dates = pd.concat([pd.read_csv(os.path.join(raw_data_path, train, "calendar_dates.csv")) for train in train_types]).drop_duplicates()
+def gtfs_fingerprint(filenames=GRAPH_SOURCES):
+    """Empreinte du contenu des fichiers GTFS : le cache du graphe est reconstruit dès qu'elle change."""
+    return source_fingerprint(filenames, f"format:{FORMAT_VERSION}")
 
-    commune_stations = pd.read_csv(os.path.join(raw_data_path, "liste-des-gares (3).csv"), sep=";")
-    commune_stations["LIBELLE"] = commune_stations["LIBELLE"].str.replace("-", " ")
 
-    # convertir les horaires en secondes
-    def time_to_seconds(time_str):
-        h, m, s = map(int, time_str.split(":"))
-        return h * 3600 + m * 60 + s
+def load_commune_stations():
+    """Charge liste-des-gares (gares par commune), seul fichier utile quand le graphe est en cache."""
+    commune_stations = pd.read_csv(COMMUNE_STATIONS_PATH, sep=";")
+    commune_stations["LIBELLE"] = commune_stations["LIBELLE"].str.replace("-", " ")
+    return commune_stations
 
-    stop_times["arrival_time"] = stop_times["arrival_time"].apply(
-        lambda x: time_to_seconds(x) if isinstance(x, str) else x)
-    stop_times["departure_time"] = stop_times["departure_time"].apply(
-        lambda x: time_to_seconds(x) if isinstance(x, str) else x)
 
+def load_and_merge_data(cache_dir=GTFS_CACHE_PATH):
+    """Charge et concatène les tables GTFS de chaque type de train, ainsi que les gares par commune."""
+    stops, stop_times, trips, routes, calendar_dates = load_gtfs(cache_dir)
+    commune_stations = load_commune_stations()
     return stops, stop_times, trips, routes, calendar_dates, commune_stations
 
 
-def build_graph(stops, stop_times, trips, routes):
-    """Construit un graphe dirigé des trajets ferroviaires."""
-    graphique = nx.DiGraph()
+def build_station_graph(stops, stop_times, trips, routes):
+    """
+    Construit le graphe des trajets ferroviaires sous forme de StationGraph.
 
-    # Ajouter les gares au graphe
-    for _, row in stops.iterrows():
-        graphique.add_node(row["stop_id"], name=row["stop_name"])
+    Chaque voyage ajoute une arête entre deux arrêts consécutifs : toutes les arêtes
+    parallèles sont conservées et la recherche choisit la plus rapide. Les arrêts d'une
+    même gare (même parent_station) sont reliés par des arêtes de correspondance de durée nulle.
+    """
+    stop_ids = stops["stop_id"].tolist()
+    node_codes = pd.Series(np.arange(len(stop_ids)), index=stop_ids)
 
     # Trier les stop_times pour respecter l'ordre des trajets
     stop_times = stop_times.sort_values(by=["trip_id", "stop_sequence"])
-    previous_stop = None
-
-    for _, row in stop_times.iterrows():
-        stop_id = row["stop_id"]
-        trip_id = row["trip_id"]
-        arrival_time = row["arrival_time"]
-        departure_time = row["departure_time"]
-        stop_sequence = row["stop_sequence"]
-
-        if previous_stop and previous_stop["trip_id"] == trip_id:
-            if previous_stop["stop_sequence"] < stop_sequence:
-                travel_time = arrival_time - previous_stop["departure_time"]
-                if travel_time > 0:
-                    route_id = trips.loc[trips["trip_id"] == trip_id, "route_id"].values[0]
-                    train_number = routes.loc[routes["route_id"] == route_id, "route_long_name"].values[0]
-                    graphique.add_edge(previous_stop["stop_id"], stop_id, weight=travel_time, trip_id=trip_id, train_number=train_number, transfer=0)
-        else:
-            if previous_stop:
-                route_id = trips.loc[trips["trip_id"] == trip_id, "route_id"].values[0]
-                train_number = routes.loc[routes["route_id"] == route_id, "route_long_name"].values[0]
-                graphique.add_edge(previous_stop["stop_id"], stop_id, weight=max(0, arrival_time - previous_stop["departure_time"]), trip_id=previous_stop["trip_id"], train_number="Correspondance : "+train_number, transfer=1)
 
-        previous_stop = {
-            "stop_id": stop_id,
-            "trip_id": trip_id,
-            "departure_time": departure_time,
-            "stop_sequence": stop_sequence,
-        }
+    # Numéro de train de chaque voyage : une seule jointure trips -> routes
+    route_names = routes.drop_duplicates(subset="route_id").set_index("route_id")["route_long_name"]
+    trip_routes = trips.drop_duplicates(subset="trip_id").set_index("trip_id")["route_id"]
+    train_numbers = stop_times["trip_id"].map(trip_routes).map(route_names).fillna("").astype(str).to_numpy()
+
+    # Chaque ligne est comparée à la précédente (colonnes décalées d'un cran)
+    codes = stop_times["stop_id"].astype(str).map(node_codes).to_numpy()
+    trip_ids = stop_times["trip_id"].astype(str).to_numpy()
+    sequences = stop_times["stop_sequence"].to_numpy()
+    arrivals = stop_times["arrival_time"].to_numpy(dtype=float)
+    departures = stop_times["departure_time"].to_numpy(dtype=float)
+
+    travel_times = arrivals[1:] - departures[:-1]
+    ride = (trip_ids[1:] == trip_ids[:-1]) & (sequences[:-1] < sequences[1:]) & (travel_times > 0)
+    rides = np.flatnonzero(ride)
+
+    # Correspondances : tous les couples d'arrêts desservis partageant la même gare parente
+    served = stops[stops["stop_id"].isin(stop_times["stop_id"].astype(str).unique()) & stops["parent_station"].notna()]
+    served = pd.DataFrame({"area": served["parent_station"].to_numpy(), "code": served["stop_id"].map(node_codes).to_numpy()})
+    pairs = served.merge(served, on="area")
+    pairs = pairs[pairs["code_x"] != pairs["code_y"]]
+
+    return StationGraph.from_edges(
+        stop_ids,
+        stops["stop_name"].fillna("").tolist(),
+        stops["stop_lat"].to_numpy(),
+        stops["stop_lon"].to_numpy(),
+        np.concatenate([codes[rides], pairs["code_x"].to_numpy()]),
+        np.concatenate([codes[rides + 1], pairs["code_y"].to_numpy()]),
+        np.concatenate([travel_times[rides].astype(int), np.zeros(len(pairs), dtype=int)]),
+        np.concatenate([trip_ids[rides + 1], np.full(len(pairs), "")]),
+        np.concatenate([train_numbers[rides + 1], np.full(len(pairs), "Correspondance")]),
+        np.concatenate([np.zeros(len(rides), dtype=int), np.ones(len(pairs), dtype=int)]),
+    )
+
+
+def build_graph(stops, stop_times, trips, routes):
+    """Construit un graphe dirigé des trajets ferroviaires (arête la plus rapide entre deux arrêts)."""
+    return build_station_graph(stops, stop_times, trips, routes).to_networkx()
+
 
-    return graphique
+def route_edges(G, path):
+    """
+    Attributs de l'arête empruntée à chaque étape du chemin.
+
+    Parmi les voyages les plus rapides entre deux arrêts, on reste si possible dans
+    le même train qu'à l'étape précédente pour éviter des correspondances inutiles.
+    """
+    edges = []
+    previous_trip = None
+    for stop_a, stop_b in zip(path, path[1:]):
+        if isinstance(G, StationGraph):
+            candidates = G.parallel_edges(stop_a, stop_b)
+            fastest = [data for data in candidates if data["weight"] == candidates[0]["weight"]]
+            edge_data = next((data for data in fastest if data["trip_id"] == previous_trip), fastest[0])
+        else:
+            edge_data = G.get_edge_data(stop_a, stop_b)
+        if not edge_data.get("transfer"):
+            previous_trip = edge_data["trip_id"]
+        edges.append(edge_data)
+    return edges
 
 
-def calculate_total_travel_time(G, path):
+def calculate_total_travel_time(G, path, edges=None):
     """Calcule le temps total de trajet en tenant compte des correspondances."""
     total_time = 0
-    previous_stop = None
     previous_trip = None
 
-    for stop in path:
-        if previous_stop:
-            edge_data = G.get_edge_data(previous_stop, stop)
-            travel_time = edge_data["weight"]
-            trip_id = edge_data["trip_id"]
+    for edge_data in edges if edges is not None else route_edges(G, path):
+        total_time += edge_data["weight"]
+        # Les arêtes de correspondance relient deux arrêts d'une même gare : pas de voyage
+        if edge_data.get("transfer"):
+            continue
+        trip_id = edge_data["trip_id"]
 
-            # Vérifier s'il y a une correspondance (changement de train)
-            if previous_trip and previous_trip != trip_id:
-                total_time += 600  # Ajouter 10 minutes de correspondance
+        # Vérifier s'il y a une correspondance (changement de train)
+        if previous_trip and previous_trip != trip_id:
+            total_time += 600  # Ajouter 10 minutes de correspondance
+        previous_trip = trip_id
 
-            total_time += travel_time
-            previous_trip = trip_id
+    return total_time
 
-        previous_stop = stop
 
-    return total_time
+def format_route(G, path):
+    """Met en forme un chemin : itinéraire, durée totale (HH:MM:SS) et détail des trains."""
+    edges = route_edges(G, path)
+    total_time = calculate_total_travel_time(G, path, edges)
+
+    # Convertir le temps total en HH:MM:SS
+    hours, remainder = divmod(total_time, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    duration_str = f"{hours:02}:{minutes:02}:{seconds:02}"
+
+    # Récupérer les numéros de train et correspondances
+    trip_details = []
+    for stop_a, stop_b, edge_data in zip(path, path[1:], edges):
+        train_number = edge_data.get("train_number", "Train Inconnu")
+        trip_details.append(f"{train_number}: {G.nodes[stop_a]['name']} → {G.nodes[stop_b]['name']}")
+
+    return {
+        "Itineraire": " → ".join([G.nodes[stop]["name"] for stop in path]),
+        "Duree_totale": duration_str,
+        "Correspondances": trip_details
+    }
 
 
 def get_best_route(G, departure_id, arrival_id):
     """Trouve le trajet le plus rapide avec Dijkstra et affiche les détails du trajet."""
+    if isinstance(G, StationGraph):
+        shortest_path, _ = G.shortest_path([departure_id], [arrival_id])
+        return format_route(G, shortest_path) if shortest_path else None
     try:
         shortest_path = nx.shortest_path(G, source=departure_id, target=arrival_id, weight="weight")
-        total_time = calculate_total_travel_time(G, shortest_path)
-
-        # Convertir le temps total en HH:MM:SS
-        hours, remainder = divmod(total_time, 3600)
-        minutes, seconds = divmod(remainder, 60)
-        duration_str = f"{hours:02}:{minutes:02}:{seconds:02}"
-
-        # Récupérer les numéros de train et correspondances
-        trip_details = []
-        for i in range(len(shortest_path) - 1):
-            stop_a = shortest_path[i]
-            stop_b = shortest_path[i + 1]
-            edge_data = G.get_edge_data(stop_a, stop_b)
-            train_number = edge_data.get("train_number", "Train Inconnu")
-            trip_details.append(f"{train_number}: {G.nodes[stop_a]['name']} → {G.nodes[stop_b]['name']}")
-
-        return {
-            "Itineraire": " → ".join([G.nodes[stop]["name"] for stop in shortest_path]),
-            "Duree_totale": duration_str,
-            "Correspondances": trip_details
-        }
+        return format_route(G, shortest_path)
     except nx.NetworkXNoPath:
         return None
 
 
+def shortest_path_search(G, sources, targets, heuristic=None):
+    """
+    Dijkstra depuis une super-source reliée à toutes les gares de départ (poids nul),
+    arrêté dès qu'une des gares d'arrivée (reliées à un super-puits) est atteinte.
+
+    Avec `heuristic` (minorant de la durée restante jusqu'à la cible la plus proche,
+    en secondes), la recherche devient un A*. Retourne (chemin ou None, nœuds définitifs).
+    """
+    # Graphe en tableaux : même recherche sur des indices entiers
+    if isinstance(G, StationGraph):
+        return G.shortest_path(sources, targets, heuristic)
+
+    targets = set(targets)
+    settled = set()
+    distances = {}
+    previous = {}
+    heap = []
+    for order, source in enumerate(dict.fromkeys(sources)):
+        distances[source] = 0
+        heap.append((heuristic(source) if heuristic else 0, order, source))
+    heapq.heapify(heap)
+    counter = len(heap)
+
+    while heap:
+        _, _, node = heapq.heappop(heap)
+        if node in settled:
+            continue
+        settled.add(node)
+
+        if node in targets:
+            path = [node]
+            while path[-1] in previous:
+                path.append(previous[path[-1]])
+            return path[::-1], len(settled)
+
+        distance = distances[node]
+        for neighbor, data in G.adj[node].items():
+            new_distance = distance + data["weight"]
+            if neighbor not in settled and new_distance < distances.get(neighbor, float("inf")):
+                distances[neighbor] = new_distance
+                previous[neighbor] = node
+                priority = new_distance + heuristic(neighbor) if heuristic else new_distance
+                heapq.heappush(heap, (priority, counter, neighbor))
+                counter += 1
+
+    return None, len(settled)
+
+
+def multi_source_shortest_path(G, sources, targets, heuristic=None):
+    """Chemin le plus rapide d'une des gares de `sources` vers une des gares de `targets`, ou None."""
+    return shortest_path_search(G, sources, targets, heuristic)[0]
+
+
 def get_stations_for_city(commune_stations, city_name, G):
     """Retourne les gares associées à une commune donnée en utilisant liste-des-gares.csv."""
+    # Index précalculé : simple recherche dans un dictionnaire
+    if isinstance(commune_stations, StationIndex):
+        return commune_stations.lookup(city_name)
+
     city_stations = commune_stations[commune_stations["COMMUNE"].str.lower() == city_name.lower()]
     valid_stations = [stop_id for stop_name in city_stations["LIBELLE"] for stop_id, data in G.nodes(data=True) if stop_name.lower() in data["name"].lower()]
     if not valid_stations:
@@ -138,66 +233,82 @@ def get_stations_for_city(commune_stations, city_name, G):
     return valid_stations if valid_stations else None
 
 
-def get_fastest_route_for_city(G, commune_stations, departure_city, arrival_city):
-    """Trouve le meilleur trajet parmi toutes les gares disponibles dans la ville."""
+def get_fastest_route_for_city(G, commune_stations, departure_city, arrival_city, bounds=None, hierarchy=None,
+                               table=None):
+    """
+    Trouve le meilleur trajet parmi toutes les gares disponibles dans la ville.
+
+    Avec `table` (RouteTable précalculée), l'itinéraire est lu dans la table si les deux communes y sont.
+    Avec `bounds` (GeoBounds du graphe), la recherche est guidée par la distance à vol d'oiseau (A*).
+    Avec `hierarchy` (ContractionHierarchy précalculée pour G), la recherche utilise ses raccourcis.
+    """
+    if table is not None:
+        precomputed = table.lookup(departure_city, arrival_city)
+        if precomputed is not None:
+            return precomputed
+
     departure_stations = get_stations_for_city(commune_stations, departure_city, G)
     arrival_stations = get_stations_for_city(commune_stations, arrival_city, G)
 
-    best_route = None
     error = []
-    shortest_time = float("inf")
-
     if not departure_stations or not arrival_stations:
         error.append(f"Aucune gare trouvée pour {departure_city if not departure_stations else arrival_city}")
-        return best_route, error
-
-    for dep in departure_stations:
-        for arr in arrival_stations:
-            route = get_best_route(G, dep, arr)
-            if route:
-                time_in_seconds = int(route["Duree_totale"][:2]) * 3600 + int(route["Duree_totale"][3:5]) * 60
-                if time_in_seconds < shortest_time:
-                    shortest_time = time_in_seconds
-                    best_route = route
-
-    if not best_route:
+        return None, error
+
+    # Une seule recherche pour toutes les paires (gare de départ, gare d'arrivée)
+    if hierarchy is not None:
+        path = hierarchy.shortest_path(departure_stations, arrival_stations)
+    else:
+        heuristic = bounds.heuristic(arrival_stations) if bounds is not None else None
+        path = multi_source_shortest_path(G, departure_stations, arrival_stations, heuristic)
+    if path is None:
         error.append("Aucun trajet trouvé.")
-    
-    if error == []:
-        error = None
+        return None, error
 
-    return best_route, error
+    return format_route(G, path), None
 
-def save_graph(G, filename="train_graph.pkl"):
-    """Sauvegarde le graphe dans un fichier pickle."""
-    with open(filename, "wb") as f:
-        pickle.dump(G, f)
+def save_graph(G, filename="train_graph", fingerprint=None):
+    """Sauvegarde le graphe (StationGraph ou nx.DiGraph) en tableaux NumPy, avec l'empreinte des données sources."""
+    station_graph = G if isinstance(G, StationGraph) else StationGraph.from_networkx(G)
+    station_graph.save(filename, fingerprint)
     print(f"Graphe sauvegardé dans {filename}")
 
-def load_graph(filename="train_graph.pkl"):
-    """Charge un graphe depuis un fichier pickle."""
-    with open(filename, "rb") as f:
-        G = pickle.load(f)
+def load_graph(filename="train_graph", fingerprint=None):
+    """Charge un graphe sauvegardé par save_graph, ou None si le cache est absent ou périmé."""
+    station_graph = StationGraph.load(filename, fingerprint)
+    if station_graph is None:
+        print(f"Aucun graphe à jour dans {filename}")
+        return None
+    G = station_graph.to_networkx()
     print(f"Graphe chargé depuis {filename}")
     return G
 
+def load_station_graph(filename="train_graph", fingerprint=None):
+    """Charge le graphe sauvegardé par save_graph sous forme de StationGraph (tableaux en mmap), ou None."""
+    station_graph = StationGraph.load(filename, fingerprint)
+    if station_graph is None:
+        print(f"Aucun graphe à jour dans {filename}")
+        return None
+    print(f"Graphe chargé depuis {filename}")
+    return station_graph
+
 # Example execution
 if __name__ == "__main__":
-    graph_filename = os.path.join(os.path.join(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")), 'data', 'gares'), "train_graph.pkl")
+    graph_filename = os.path.join(RAW_DATA_PATH, "train_graph")
 
     stops, stop_times, trips, routes, calendar_dates, commune_stations = load_and_merge_data()
 
     print("Building the graph...")
-    if os.path.exists(graph_filename):
-        G_all = load_graph(graph_filename)
-    else:
-        G_all = build_graph(stops, stop_times, trips, routes)
-        save_graph(G_all, graph_filename)
+    fingerprint = gtfs_fingerprint()
+    G_all = load_graph(graph_filename, fingerprint)
+    if G_all is None:
+        save_graph(build_station_graph(stops, stop_times, trips, routes), graph_filename, fingerprint)
+        G_all = load_graph(graph_filename, fingerprint)
     # G_all = build_graph(stops, stop_times, trips, routes)
 
     # Example: Find shortest path between two cities
-    start_city = "briouze"  # Test with lowercase input
-    end_city = "paris"
+    start_city = "paris"  # Test with lowercase input
+    end_city = "lyon"
 
     print("Calculating fastest route...")
     result = get_fastest_route_for_city(G_all, commune_stations, start_city, end_city)
@@ -0,0 +1,146 @@
+"""Lecture des fichiers GTFS (tgv, ter, intercites) avec des types explicites.
+
+Seules les colonnes utiles sont lues, les identifiants répétés sont stockés en
+catégories et les horaires sont convertis en secondes de façon vectorisée.
+Les tables normalisées peuvent être mises en cache au format Feather (si
+pyarrow est installé) pour être rechargées en moins d'une seconde.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow est optionnel : sans lui, pas de cache Feather
+    feather = None
+
+TRAIN_TYPES = ["tgv", "ter", "intercites"]
+RAW_DATA_PATH = os.path.join(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")), 'data', 'gares')
+CACHE_VERSION = 1
+
+# Colonnes lues pour chaque table, avec leur type, et clé de dédoublonnage entre réseaux
+GTFS_TABLES = {
+    "stops": {
+        "columns": {"stop_id": str, "stop_name": str, "stop_lat": np.float32, "stop_lon": np.float32, "parent_station": str},
+        "key": ["stop_id"],
+    },
+    "stop_times": {
+        "columns": {"trip_id": "category", "arrival_time": str, "departure_time": str, "stop_id": "category", "stop_sequence": np.int16},
+        "key": ["trip_id", "stop_sequence"],
+    },
+    "trips": {
+        "columns": {"route_id": str, "service_id": str, "trip_id": str},
+        "key": ["trip_id"],
+    },
+    "routes": {
+        "columns": {"route_id": str, "route_long_name": str},
+        "key": ["route_id"],
+    },
+    "calendar_dates": {
+        "columns": {"service_id": str, "date": np.int32, "exception_type": np.int8},
+        "key": None,
+    },
+}
+
+
+def source_fingerprint(filenames, salt=""):
+    """Empreinte du contenu des fichiers GTFS de tous les réseaux."""
+    digest = hashlib.blake2b(salt.encode(), digest_size=16)
+    for train in TRAIN_TYPES:
+        for filename in filenames:
+            path = os.path.join(RAW_DATA_PATH, train, filename)
+            if not os.path.exists(path):
+                continue
+            digest.update(f"{train}/{filename}".encode())
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+    return digest.hexdigest()
+
+
+def gtfs_time_to_seconds(times):
+    """Convertit une colonne HH:MM:SS en secondes depuis minuit (les horaires GTFS peuvent dépasser 24:00:00)."""
+    values = times.to_numpy(dtype=object)
+    present = pd.notna(values)
+    text = values[present].astype(str)
+    if len(text) and (np.char.str_len(text) == 8).all():
+        # Cas courant HH:MM:SS : arithmétique directe sur les octets ASCII
+        digits = text.astype("S8").view(np.uint8).reshape(-1, 8).astype(np.int32) - ord("0")
+        seconds = (
+            (digits[:, 0] * 10 + digits[:, 1]) * 3600
+            + (digits[:, 3] * 10 + digits[:, 4]) * 60
+            + digits[:, 6] * 10 + digits[:, 7]
+        )
+    else:
+        parts = pd.Series(text).str.split(":", expand=True).astype(np.int32).to_numpy()
+        seconds = parts[:, 0] * 3600 + parts[:, 1] * 60 + parts[:, 2] if len(text) else np.zeros(0, np.int32)
+
+    if present.all():
+        return pd.Series(seconds.astype(np.int32), index=times.index)
+    result = np.full(len(values), np.nan, dtype=np.float64)
+    result[present] = seconds
+    return pd.Series(result, index=times.index)
+
+
+def read_gtfs_table(name):
+    """Lit une table GTFS pour tous les réseaux qui la fournissent et les concatène."""
+    spec = GTFS_TABLES[name]
+    tables = []
+    # Certains réseaux ne fournissent pas tous les fichiers GTFS (ex: stop_times)
+    for train in TRAIN_TYPES:
+        path = os.path.join(RAW_DATA_PATH, train, f"{name}.csv")
+        if os.path.exists(path):
+            dtypes = {column: (str if dtype == "category" else dtype) for column, dtype in spec["columns"].items()}
+            table = pd.read_csv(path, usecols=list(spec["columns"]), dtype=dtypes)
+            # Les service_id sont numérotés par réseau : on les préfixe pour éviter les collisions
+            if "service_id" in table.columns:
+                table["service_id"] = train + ":" + table["service_id"]
+            tables.append(table)
+
+    table = pd.concat(tables, ignore_index=True)
+    if spec["key"]:
+        table = table.drop_duplicates(subset=spec["key"], ignore_index=True)
+    # Les catégories sont créées après la concaténation pour partager un seul dictionnaire
+    for column, dtype in spec["columns"].items():
+        if dtype == "category":
+            table[column] = table[column].astype("category")
+    if name == "stop_times":
+        table["arrival_time"] = gtfs_time_to_seconds(table["arrival_time"])
+        table["departure_time"] = gtfs_time_to_seconds(table["departure_time"])
+    return table
+
+
+def load_gtfs(cache_dir=None):
+    """
+    Retourne (stops, stop_times, trips, routes, calendar_dates).
+
+    Si `cache_dir` est donné et pyarrow disponible, les tables normalisées y sont
+    écrites au format Feather et relues tant que les CSV sources n'ont pas changé.
+    """
+    names = list(GTFS_TABLES)
+    use_cache = cache_dir is not None and feather is not None
+    if use_cache:
+        fingerprint = source_fingerprint([f"{name}.csv" for name in names], f"gtfs:{CACHE_VERSION}")
+        meta_path = os.path.join(cache_dir, "meta.json")
+        try:
+            with open(meta_path) as f:
+                if json.load(f).get("fingerprint") == fingerprint:
+                    return tuple(feather.read_feather(os.path.join(cache_dir, f"{name}.feather")) for name in names)
+        except (OSError, ValueError):
+            pass
+
+    tables = tuple(read_gtfs_table(name) for name in names)
+
+    if use_cache:
+        os.makedirs(cache_dir, exist_ok=True)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        for name, table in zip(names, tables):
+            feather.write_feather(table, os.path.join(cache_dir, f"{name}.feather"))
+        with open(meta_path, "w") as f:
+            json.dump({"version": CACHE_VERSION, "fingerprint": fingerprint}, f)
+    return tables
@@ -0,0 +1,80 @@
+"""Calcul en parallèle des étapes d'un itinéraire avec correspondances.
+
+Les étapes sans horaire sont indépendantes : LegPool les répartit sur un pool de
+processus. Chaque processus charge une seule fois le graphe en mmap (pages
+partagées avec les autres processus), l'index des gares et, s'ils sont fournis,
+la hiérarchie de contraction et la table d'itinéraires précalculée.
+
+Les étapes avec horaire restent calculées l'une après l'autre : chacune part
+après l'arrivée de la précédente.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+# Ressources du processus de calcul, chargées une fois par init_leg_worker
+_worker = {}
+
+
+def init_leg_worker(graph_directory, fingerprint=None, astar=False, hierarchy_directory=None, table_directory=None):
+    """Charge le graphe (mmap), l'index des gares et les structures de recherche optionnelles."""
+    from src.path_finding.astar import GeoBounds
+    from src.path_finding.contraction import ContractionHierarchy
+    from src.path_finding.dijkstra import COMMUNE_STATIONS_PATH, load_commune_stations, load_station_graph
+    from src.path_finding.route_table import RouteTable, table_fingerprint
+    from src.path_finding.stations import StationIndex
+
+    graph = load_station_graph(graph_directory, fingerprint)
+    _worker["graph"] = graph
+    _worker["index"] = StationIndex(load_commune_stations(), graph)
+    _worker["bounds"] = GeoBounds(graph) if astar else None
+    _worker["hierarchy"] = ContractionHierarchy.load(hierarchy_directory, fingerprint) if hierarchy_directory else None
+    _worker["table"] = None
+    if table_directory:
+        _worker["table"] = RouteTable.load(table_directory, table_fingerprint(fingerprint, COMMUNE_STATIONS_PATH))
+
+
+def leg_route(departure_city, arrival_city):
+    """Meilleur trajet d'une étape dans un processus du pool : (itinéraire, erreur)."""
+    from src.path_finding.dijkstra import get_fastest_route_for_city
+
+    return get_fastest_route_for_city(
+        _worker["graph"], _worker["index"], departure_city, arrival_city,
+        _worker["bounds"], _worker["hierarchy"], _worker["table"],
+    )
+
+
+def is_ready(_=None):
+    """Tâche vide : permet d'attendre que les processus aient fini de charger leurs ressources."""
+    return _worker.get("graph") is not None
+
+
+class LegPool:
+    """Pool de processus qui calcule les étapes statiques d'un itinéraire en parallèle."""
+
+    def __init__(self, processes, graph_directory, fingerprint=None, astar=False, hierarchy_directory=None,
+                 table_directory=None):
+        self.processes = processes
+        self._executor = ProcessPoolExecutor(
+            processes,
+            initializer=init_leg_worker,
+            initargs=(graph_directory, fingerprint, astar, hierarchy_directory, table_directory),
+        )
+        # Démarre les processus maintenant plutôt qu'à la première requête
+        if not all(self._executor.map(is_ready, [None] * processes)):
+            self.shutdown()
+            raise RuntimeError(f"Aucun graphe à jour dans {graph_directory}")
+
+    def iter_routes(self, legs):
+        """
+        (itinéraire, erreur) de chaque étape (ville de départ, ville d'arrivée), dans l'ordre :
+        toutes les étapes sont soumises d'un coup, chacune est rendue dès qu'elle et les précédentes sont calculées.
+        """
+        departures, arrivals = zip(*legs) if legs else ((), ())
+        return self._executor.map(leg_route, departures, arrivals)
+
+    def fastest_routes(self, legs):
+        """Liste de (itinéraire, erreur) pour chaque étape (ville de départ, ville d'arrivée), dans l'ordre."""
+        return list(self.iter_routes(legs))
+
+    def shutdown(self):
+        self._executor.shutdown(cancel_futures=True)
@@ -0,0 +1,125 @@
+"""Cache des itinéraires calculés, partagé par les requêtes /api/route."""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from src.path_finding.stations import normalize_name
+
+
+class RouteCache:
+    """
+    Cache LRU borné en taille et en durée de vie (TTL).
+
+    Si `path` est donné, les itinéraires sont aussi écrits dans une base SQLite
+    partagée par tous les workers : un itinéraire calculé par un worker est
+    réutilisé par les autres. Les entrées sont liées à la version du graphe
+    (son empreinte) et ignorées dès que le graphe change.
+    """
+
+    def __init__(self, maxsize=4096, ttl=3600, path=None, version=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._store = None
+        if path:
+            self._store = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+            self._store.execute("PRAGMA journal_mode=WAL")
+            self._store.execute(
+                "CREATE TABLE IF NOT EXISTS routes (key TEXT PRIMARY KEY, version TEXT, created REAL, value TEXT)"
+            )
+
+    @staticmethod
+    def make_key(departure, arrival, via=(), *options):
+        """Clé normalisée : « Saint-Étienne » et « saint etienne » partagent la même entrée."""
+        cities = [normalize_name(city) for city in (departure, *via, arrival) if city]
+        return json.dumps([cities, [option for option in options if option is not None]])
+
+    def get(self, key):
+        """Retourne la valeur en cache, ou None si elle est absente ou expirée."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, value = entry
+                if now - created <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        value = self._get_shared(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._put_local(key, value, now)
+        return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._put_local(key, value, time.monotonic())
+        self._set_shared(key, value)
+
+    def get_or_compute(self, key, compute):
+        """Retourne la valeur en cache ou la calcule avec `compute()` puis la met en cache."""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self, version=None):
+        """Vide le cache, par exemple après le rechargement du graphe (nouvelle version)."""
+        with self._lock:
+            self._entries.clear()
+            if version is not None:
+                self.version = version
+        if self._store is not None:
+            with self._lock:
+                self._store.execute("DELETE FROM routes WHERE version IS NOT ?", (self.version,))
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "shared": self._store is not None,
+            }
+
+    def _put_local(self, key, value, created):
+        self._entries[key] = (created, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _get_shared(self, key):
+        if self._store is None:
+            return None
+        with self._lock:
+            row = self._store.execute(
+                "SELECT value FROM routes WHERE key = ? AND version IS ? AND created >= ?",
+                (key, self.version, time.time() - self.ttl),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _set_shared(self, key, value):
+        if self._store is None:
+            return
+        with self._lock:
+            self._store.execute(
+                "INSERT OR REPLACE INTO routes (key, version, created, value) VALUES (?, ?, ?, ?)",
+                (key, self.version, time.time(), json.dumps(value)),
+            )
@@ -0,0 +1,219 @@
+"""Table précalculée des meilleurs itinéraires entre les communes les plus demandées.
+
+La table est construite hors ligne (en parallèle, un processus par cœur) et
+stockée en tableaux NumPy chargés en mmap :
+- durations : matrice uint32 (commune de départ, commune d'arrivée) des durées
+  totales en secondes, NO_ROUTE s'il n'existe pas de trajet ;
+- offsets / blob : itinéraires mis en forme (format_route) encodés en JSON,
+  l'itinéraire de la case k occupant blob[offsets[k]:offsets[k + 1]].
+
+Les communes sans gare dans le graphe sont laissées hors de la table : la
+recherche en direct donne alors son propre message d'erreur.
+
+get_fastest_route_for_city consulte la table avant de lancer une recherche.
+"""
+
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.path_finding.station_graph import decode_strings, encode_strings, load_arrays, save_arrays
+from src.path_finding.stations import normalize_name
+
+FORMAT_VERSION = 2
+NO_ROUTE = np.iinfo(np.uint32).max
+DEFAULT_CITY_COUNT = 200
+
+# Graphe du processus de calcul, chargé une fois par processus par init_worker
+_worker_graph = None
+
+
+def table_fingerprint(graph_fingerprint, commune_file):
+    """La table dépend du graphe et de la liste des gares par commune."""
+    digest = hashlib.blake2b(f"{graph_fingerprint}:{FORMAT_VERSION}".encode(), digest_size=16)
+    with open(commune_file, "rb") as f:
+        digest.update(f.read())
+    return digest.hexdigest()
+
+
+def largest_cities(commune_stations, count=DEFAULT_CITY_COUNT):
+    """Les `count` communes ayant le plus de gares dans liste-des-gares (clés normalisées)."""
+    stations = Counter(normalize_name(commune) for commune in commune_stations["COMMUNE"])
+    return [city for city, _ in sorted(stations.items(), key=lambda item: (-item[1], item[0]))[:count]]
+
+
+def init_worker(graph_directory):
+    """Charge le graphe en mmap : les pages sont partagées entre les processus de calcul."""
+    global _worker_graph
+    from src.path_finding.dijkstra import load_station_graph
+
+    _worker_graph = load_station_graph(graph_directory)
+
+
+def compute_row(departure_stations, arrival_stations):
+    """Meilleurs itinéraires d'une commune vers toutes les autres : liste de (durée, JSON)."""
+    from src.path_finding.dijkstra import calculate_total_travel_time, format_route, multi_source_shortest_path
+
+    row = []
+    for stations in arrival_stations:
+        path = multi_source_shortest_path(_worker_graph, departure_stations, stations) if departure_stations and stations else None
+        if path is None:
+            row.append((NO_ROUTE, b""))
+            continue
+        duration = calculate_total_travel_time(_worker_graph, path)
+        row.append((duration, json.dumps(format_route(_worker_graph, path), ensure_ascii=False).encode("utf-8")))
+    return row
+
+
+def build_route_table(graph_directory, index, cities, processes=None):
+    """
+    Calcule tous les couples de `cities` ayant au moins une gare (une ligne de la matrice par tâche)
+    et retourne la RouteTable.
+    """
+    stations = [index.lookup(city) for city in cities]
+    cities = [city for city, city_stations in zip(cities, stations) if city_stations]
+    stations = [city_stations for city_stations in stations if city_stations]
+    with ProcessPoolExecutor(processes, initializer=init_worker, initargs=(graph_directory,)) as pool:
+        rows = list(pool.map(compute_row, stations, [stations] * len(cities)))
+
+    durations = np.array([[duration for duration, _ in row] for row in rows], dtype=np.uint32).reshape(len(cities), len(cities))
+    routes = [route for row in rows for _, route in row]
+    offsets = np.zeros(len(routes) + 1, dtype=np.uint64)
+    offsets[1:] = np.cumsum([len(route) for route in routes])
+    blob = np.frombuffer(b"".join(routes), dtype=np.uint8)
+    return RouteTable(cities=encode_strings(cities), durations=durations, offsets=offsets, blob=blob)
+
+
+class RouteTable:
+    """Itinéraires précalculés entre un ensemble de communes, indexés par leur clé normalisée."""
+
+    ARRAYS = ("cities", "durations", "offsets", "blob")
+
+    def __init__(self, **arrays):
+        for name in self.ARRAYS:
+            array = arrays[name]
+            setattr(self, name, array.view(np.ndarray) if isinstance(array, np.memmap) else array)
+        self.codes = {city: code for code, city in enumerate(decode_strings(self.cities))}
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _cell(self, departure_city, arrival_city):
+        departure = self.codes.get(normalize_name(departure_city))
+        arrival = self.codes.get(normalize_name(arrival_city))
+        if departure is None or arrival is None:
+            return None
+        return departure, arrival
+
+    def duration(self, departure_city, arrival_city):
+        """Durée totale en secondes, None si le trajet n'existe pas ou si le couple n'est pas dans la table."""
+        cell = self._cell(departure_city, arrival_city)
+        if cell is None or self.durations[cell] == NO_ROUTE:
+            return None
+        return int(self.durations[cell])
+
+    def lookup(self, departure_city, arrival_city):
+        """
+        Retourne (itinéraire, erreur) comme get_fastest_route_for_city, ou None si l'une
+        des communes n'est pas dans la table (il faut alors lancer une recherche).
+        """
+        cell = self._cell(departure_city, arrival_city)
+        if cell is None:
+            return None
+        if self.durations[cell] == NO_ROUTE:
+            return None, ["Aucun trajet trouvé."]
+        k = cell[0] * len(self.codes) + cell[1]
+        route = self.blob[int(self.offsets[k]):int(self.offsets[k + 1])].tobytes()
+        return json.loads(route.decode("utf-8")), None
+
+    def save(self, directory, fingerprint=None):
+        save_arrays(directory, {name: getattr(self, name) for name in self.ARRAYS}, FORMAT_VERSION, fingerprint)
+
+    @classmethod
+    def load(cls, directory, fingerprint=None):
+        """Charge la table en mmap, ou retourne None si elle est absente ou périmée."""
+        arrays = load_arrays(directory, cls.ARRAYS, FORMAT_VERSION, fingerprint)
+        return cls(**arrays) if arrays is not None else None
+
+
+if __name__ == "__main__":
+    from src.path_finding.dijkstra import RAW_DATA_PATH, COMMUNE_STATIONS_PATH, build_station_graph, \
+        get_fastest_route_for_city, gtfs_fingerprint, load_and_merge_data, load_commune_stations, \
+        load_station_graph, save_graph
+    from src.path_finding.stations import StationIndex
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ("build", "validate"):
+        print(
+            "Usage: python -m src.path_finding.route_table <build | validate> [dossier] "
+            "[--cities N | --cities fichier] [--processes P] [--pairs N]"
+        )
+        sys.exit(1)
+    arguments = sys.argv[2:]
+    options = {}
+    while len(arguments) >= 2 and arguments[-2].startswith("--"):
+        options[arguments[-2][2:]] = arguments[-1]
+        arguments = arguments[:-2]
+    directory = arguments[0] if arguments else os.path.join(RAW_DATA_PATH, "route_table")
+
+    graph_directory = os.path.join(RAW_DATA_PATH, "train_graph")
+    fingerprint = gtfs_fingerprint()
+    G = load_station_graph(graph_directory, fingerprint)
+    if G is None:
+        stops, stop_times, trips, routes, _, _ = load_and_merge_data()
+        save_graph(build_station_graph(stops, stop_times, trips, routes), graph_directory, fingerprint)
+        G = load_station_graph(graph_directory, fingerprint)
+    commune_stations = load_commune_stations()
+    index = StationIndex(commune_stations, G)
+    fingerprint = table_fingerprint(fingerprint, COMMUNE_STATIONS_PATH)
+
+    if sys.argv[1] == "build":
+        cities = options.get("cities", str(DEFAULT_CITY_COUNT))
+        if cities.isdigit():
+            cities = largest_cities(commune_stations, int(cities))
+        else:
+            # Fichier texte : une commune par ligne
+            with open(cities, encoding="utf-8") as f:
+                cities = list(dict.fromkeys(normalize_name(line) for line in f if line.strip()))
+        processes = int(options["processes"]) if "processes" in options else None
+
+        start = time.perf_counter()
+        table = build_route_table(graph_directory, index, cities, processes)
+        table.save(directory, fingerprint)
+        print(
+            f"Table de {len(table)} communes ({len(table) ** 2} itinéraires, {table.blob.nbytes / 1e6:.1f} Mo) "
+            f"construite en {time.perf_counter() - start:.2f} s, sauvegardée dans {directory}"
+        )
+    else:
+        table = RouteTable.load(directory, fingerprint)
+        if table is None:
+            print(f"Aucune table à jour dans {directory} : lancer d'abord la commande build")
+            sys.exit(1)
+        # Couples tirés au hasard (graine fixe), comparés à la recherche en direct
+        cities = list(table.codes)
+        generator = random.Random(0)
+        pairs = [(generator.choice(cities), generator.choice(cities)) for _ in range(int(options.get("pairs", 2000)))]
+        mismatches = 0
+        elapsed_search = elapsed_table = 0.0
+        for departure, arrival in pairs:
+            start = time.perf_counter()
+            expected, error = get_fastest_route_for_city(G, index, departure, arrival)
+            elapsed_search += time.perf_counter() - start
+            start = time.perf_counter()
+            route, error_table = table.lookup(departure, arrival)
+            elapsed_table += time.perf_counter() - start
+            same = (expected is None) == (route is None) and (route is None or route["Duree_totale"] == expected["Duree_totale"])
+            same = same and error == error_table
+            mismatches += not same
+        print(f"{len(pairs)} requêtes, {mismatches} durées ou erreurs différentes")
+        print(
+            f"Recherche : {elapsed_search / len(pairs) * 1000:.3f} ms / requête, "
+            f"table : {elapsed_table / len(pairs) * 1000:.3f} ms / requête"
+        )
+        sys.exit(1 if mismatches else 0)
@@ -0,0 +1,357 @@
+"""Graphe des gares stocké sous forme de tableaux NumPy (format CSR).
+
+Chaque tableau est écrit dans son propre fichier .npy afin de pouvoir être
+chargé avec np.load(mmap_mode="r") : le chargement ne lit que l'en-tête des
+fichiers et les pages sont partagées entre processus.
+
+Les arêtes parallèles (plusieurs voyages entre deux mêmes arrêts) sont toutes
+conservées, triées par (source, cible, durée) : la première arête d'un couple
+d'arrêts est la plus rapide.
+
+StationGraph expose aussi la partie de l'interface nx.DiGraph utilisée par le
+projet (nodes, adj, edges, get_edge_data, degree) : les fonctions écrites pour
+networkx acceptent l'un ou l'autre graphe.
+"""
+
+import heapq
+import json
+import os
+
+import networkx as nx
+import numpy as np
+
+FORMAT_VERSION = 3
+
+
+def encode_strings(values):
+    """Table de chaînes UTF-8 de largeur fixe (deux fois plus compacte que le type unicode de NumPy)."""
+    return np.array([value.encode("utf-8") for value in values], dtype=bytes)
+
+
+def decode_strings(table):
+    """Inverse de encode_strings."""
+    return [value.decode("utf-8") for value in table.tolist()]
+
+
+def save_arrays(directory, arrays, version, fingerprint=None):
+    """Écrit un fichier .npy par tableau et un meta.json (version du format et empreinte des données)."""
+    os.makedirs(directory, exist_ok=True)
+    meta_path = os.path.join(directory, "meta.json")
+    # meta.json est retiré puis écrit en dernier : un cache interrompu n'est jamais considéré comme valide
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, f"{name}.npy"), array)
+    with open(meta_path, "w") as f:
+        json.dump({"version": version, "fingerprint": fingerprint}, f)
+
+
+def load_arrays(directory, names, version, fingerprint=None, mmap_mode="r"):
+    """Charge les tableaux écrits par save_arrays, ou retourne None si le cache est absent, d'une autre version ou périmé."""
+    try:
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("version") != version:
+        return None
+    if fingerprint is not None and meta.get("fingerprint") != fingerprint:
+        return None
+    return {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode) for name in names}
+
+
+class StationGraph:
+    """Graphe dirigé des gares : nœuds indexés par des entiers, arêtes en CSR."""
+
+    ARRAYS = (
+        "stop_ids",  # identifiant GTFS de chaque nœud
+        "names",  # nom de la gare de chaque nœud
+        "lats",  # latitude de chaque nœud (NaN si inconnue)
+        "lons",  # longitude de chaque nœud (NaN si inconnue)
+        "indptr",  # arêtes sortantes du nœud i : indptr[i]:indptr[i + 1]
+        "indices",  # nœud d'arrivée de chaque arête (triées par cible puis par durée)
+        "weights",  # durée de chaque arête en secondes
+        "trip_codes",  # voyage de chaque arête (indice dans trip_table)
+        "train_codes",  # numéro de train de chaque arête (indice dans train_table)
+        "transfer",  # 1 si l'arête est une correspondance
+        "trip_table",  # chaînes des voyages, dédoublonnées
+        "train_table",  # chaînes des numéros de train, dédoublonnées
+    )
+
+    def __init__(self, **arrays):
+        for name in self.ARRAYS:
+            # Vue ndarray simple sur le même mmap : l'indexation de np.memmap passe par du code Python
+            array = arrays[name]
+            setattr(self, name, array.view(np.ndarray) if isinstance(array, np.memmap) else array)
+        # Seules structures Python par nœud : l'identifiant GTFS et son indice
+        self.stop_id_list = decode_strings(self.stop_ids)
+        self.codes = {stop_id: code for code, stop_id in enumerate(self.stop_id_list)}
+        # memoryview : lecture élément par élément rapide, sans copie des tableaux (pages mmap partagées)
+        self._indptr = memoryview(np.ascontiguousarray(self.indptr, dtype=np.int64))
+        self._indices = memoryview(np.ascontiguousarray(self.indices, dtype=np.int32))
+        self._weights = memoryview(np.ascontiguousarray(self.weights, dtype=np.int32))
+        self._in_degree = None
+
+    def number_of_nodes(self):
+        return len(self.stop_id_list)
+
+    def number_of_edges(self):
+        return len(self.indices)
+
+    # --- Recherche de plus court chemin sur les indices entiers ---
+
+    def shortest_path(self, sources, targets, heuristic=None):
+        """
+        Dijkstra multi-sources / multi-cibles (A* avec `heuristic`, fonction stop_id -> secondes).
+
+        Retourne (liste de stop_id ou None, nombre de nœuds définitifs), comme shortest_path_search.
+        """
+        codes = self.codes
+        indptr, indices, weights = self._indptr, self._indices, self._weights
+        stop_id_list = self.stop_id_list
+        heappush, heappop = heapq.heappush, heapq.heappop
+        targets = {codes[target] for target in targets if target in codes}
+        infinity = float("inf")
+        distances = {}
+        previous = {}
+        heap = []
+        for order, source in enumerate(dict.fromkeys(sources)):
+            if source in codes:
+                distances[codes[source]] = 0
+                heap.append((heuristic(source) if heuristic else 0, order, codes[source], 0))
+        heapq.heapify(heap)
+        counter = len(heap)
+        settled = 0
+
+        while heap:
+            _, _, node, distance = heappop(heap)
+            # Entrée périmée : le nœud a déjà été atteint par un chemin plus court
+            if distance > distances[node]:
+                continue
+            settled += 1
+
+            if node in targets:
+                path = [node]
+                while path[-1] in previous:
+                    path.append(previous[path[-1]])
+                return [stop_id_list[code] for code in reversed(path)], settled
+
+            # Les poids sont positifs : un nœud définitif n'est jamais amélioré, inutile de le tester
+            for edge in range(indptr[node], indptr[node + 1]):
+                neighbor = indices[edge]
+                new_distance = distance + weights[edge]
+                if new_distance < distances.get(neighbor, infinity):
+                    distances[neighbor] = new_distance
+                    previous[neighbor] = node
+                    priority = new_distance + heuristic(stop_id_list[neighbor]) if heuristic else new_distance
+                    heappush(heap, (priority, counter, neighbor, new_distance))
+                    counter += 1
+
+        return None, settled
+
+    # --- Attributs des nœuds et des arêtes ---
+
+    def node_data(self, code):
+        """Attributs d'un nœud, comme G.nodes[stop_id] dans le graphe networkx."""
+        return {"name": self.names[code].decode("utf-8"), "lat": float(self.lats[code]), "lon": float(self.lons[code])}
+
+    def edge_data(self, edge):
+        """Attributs d'une arête, comme G.get_edge_data(u, v) dans le graphe networkx."""
+        return {
+            "weight": int(self.weights[edge]),
+            "trip_id": self.trip_table[self.trip_codes[edge]].decode("utf-8"),
+            "train_number": self.train_table[self.train_codes[edge]].decode("utf-8"),
+            "transfer": int(self.transfer[edge]),
+        }
+
+    def find_edge(self, source, target):
+        """Indice de l'arête source -> target la plus courte, ou None."""
+        # Arêtes triées par durée : la première trouvée est la plus courte
+        for edge in range(self._indptr[source], self._indptr[source + 1]):
+            if self._indices[edge] == target:
+                return edge
+        return None
+
+    def parallel_edges(self, u, v):
+        """Attributs de toutes les arêtes u -> v (un par voyage), de la plus courte à la plus longue."""
+        if u not in self.codes or v not in self.codes:
+            return []
+        source, target = self.codes[u], self.codes[v]
+        return [
+            self.edge_data(edge)
+            for edge in range(self._indptr[source], self._indptr[source + 1])
+            if self._indices[edge] == target
+        ]
+
+    # --- Interface compatible nx.DiGraph (lecture seule) ---
+
+    @property
+    def nodes(self):
+        return NodeView(self)
+
+    @property
+    def adj(self):
+        return AdjacencyView(self)
+
+    def get_edge_data(self, u, v, default=None):
+        if u not in self.codes or v not in self.codes:
+            return default
+        edge = self.find_edge(self.codes[u], self.codes[v])
+        return self.edge_data(edge) if edge is not None else default
+
+    def edges(self, data=False):
+        sources = np.repeat(np.arange(len(self.stop_id_list)), np.diff(self.indptr)).tolist()
+        for edge, (source, target) in enumerate(zip(sources, self.indices.tolist())):
+            u, v = self.stop_id_list[source], self.stop_id_list[target]
+            yield (u, v, self.edge_data(edge)) if data else (u, v)
+
+    def degree(self, node):
+        """Degré entrant + sortant d'un nœud."""
+        if self._in_degree is None:
+            self._in_degree = np.bincount(self.indices, minlength=len(self.stop_id_list))
+        code = self.codes[node]
+        return int(self._indptr[code + 1] - self._indptr[code] + self._in_degree[code])
+
+    def __contains__(self, node):
+        return node in self.codes
+
+    def __len__(self):
+        return len(self.stop_id_list)
+
+    @classmethod
+    def from_edges(cls, stop_ids, names, lats, lons, sources, targets, weights, trips, trains, transfer):
+        """
+        Construit le graphe à partir de listes d'arêtes (indices des nœuds dans `stop_ids`).
+
+        Les arêtes parallèles sont toutes conservées ; elles sont triées par (source, cible, durée).
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int32)
+        weights = np.asarray(weights, dtype=np.int32)
+        order = np.lexsort((weights, targets, sources))
+
+        indptr = np.zeros(len(stop_ids) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum(np.bincount(sources, minlength=len(stop_ids)))
+        trip_table, trip_codes = np.unique(np.asarray(trips, dtype=str), return_inverse=True)
+        train_table, train_codes = np.unique(np.asarray(trains, dtype=str), return_inverse=True)
+        return cls(
+            stop_ids=encode_strings(stop_ids),
+            names=encode_strings(names),
+            lats=np.asarray(lats, dtype=np.float32),
+            lons=np.asarray(lons, dtype=np.float32),
+            indptr=indptr,
+            indices=targets[order],
+            weights=weights[order],
+            trip_codes=trip_codes.astype(np.int32)[order],
+            train_codes=train_codes.astype(np.int32)[order],
+            transfer=np.asarray(transfer, dtype=np.int8)[order],
+            trip_table=encode_strings(trip_table.tolist()),
+            train_table=encode_strings(train_table.tolist()),
+        )
+
+    @classmethod
+    def from_networkx(cls, G):
+        """Convertit un nx.DiGraph construit par build_graph (l'ordre des nœuds est conservé)."""
+        stop_ids = list(G.nodes)
+        node_codes = {stop_id: code for code, stop_id in enumerate(stop_ids)}
+        nodes = [(data.get("name", ""), data.get("lat", np.nan), data.get("lon", np.nan)) for _, data in G.nodes(data=True)]
+        names, lats, lons = zip(*nodes) if nodes else ((), (), ())
+
+        edges = [
+            (node_codes[source], node_codes[target], data["weight"], data["trip_id"], data["train_number"], data["transfer"])
+            for source, target, data in G.edges(data=True)
+        ]
+        columns = zip(*edges) if edges else ((),) * 6
+        return cls.from_edges(stop_ids, names, lats, lons, *columns)
+
+    def to_networkx(self):
+        """
+        Reconstruit le nx.DiGraph équivalent (mêmes attributs que build_graph).
+
+        Un DiGraph n'a qu'une arête par couple de nœuds : seule la plus courte est gardée.
+        """
+        G = nx.DiGraph()
+        stop_ids = decode_strings(self.stop_ids)
+        nodes = zip(stop_ids, decode_strings(self.names), self.lats.tolist(), self.lons.tolist())
+        G.add_nodes_from(
+            (stop_id, {"name": name, "lat": lat, "lon": lon}) if name else stop_id for stop_id, name, lat, lon in nodes
+        )
+
+        trip_table = decode_strings(self.trip_table)
+        train_table = decode_strings(self.train_table)
+        sources = np.repeat(np.arange(len(stop_ids)), np.diff(self.indptr))
+        # Première arête de chaque couple (source, cible) : la plus courte
+        first = np.ones(len(sources), dtype=bool)
+        first[1:] = (sources[1:] != sources[:-1]) | (self.indices[1:] != self.indices[:-1])
+        edges = zip(
+            sources[first].tolist(),
+            self.indices[first].tolist(),
+            self.weights[first].tolist(),
+            self.trip_codes[first].tolist(),
+            self.train_codes[first].tolist(),
+            self.transfer[first].tolist(),
+        )
+        G.add_edges_from(
+            (
+                stop_ids[source],
+                stop_ids[target],
+                {"weight": weight, "trip_id": trip_table[trip], "train_number": train_table[train], "transfer": transfer},
+            )
+            for source, target, weight, trip, train, transfer in edges
+        )
+        return G
+
+    def save(self, directory, fingerprint=None):
+        """Écrit un fichier .npy par tableau et un meta.json (version du format et empreinte des données)."""
+        save_arrays(directory, {name: getattr(self, name) for name in self.ARRAYS}, FORMAT_VERSION, fingerprint)
+
+    @classmethod
+    def load(cls, directory, fingerprint=None, mmap_mode="r"):
+        """Charge le graphe, ou retourne None si le cache est absent, d'une autre version ou périmé."""
+        arrays = load_arrays(directory, cls.ARRAYS, FORMAT_VERSION, fingerprint, mmap_mode)
+        return cls(**arrays) if arrays is not None else None
+
+
+class NodeView:
+    """Équivalent de G.nodes : itération, G.nodes[stop_id] et G.nodes(data=True)."""
+
+    def __init__(self, graph):
+        self._graph = graph
+
+    def __iter__(self):
+        return iter(self._graph.stop_id_list)
+
+    def __len__(self):
+        return len(self._graph.stop_id_list)
+
+    def __contains__(self, node):
+        return node in self._graph.codes
+
+    def __getitem__(self, node):
+        return self._graph.node_data(self._graph.codes[node])
+
+    def __call__(self, data=False, default=None):
+        graph = self._graph
+        if data is False:
+            return iter(graph.stop_id_list)
+        if data is True:
+            return ((stop_id, graph.node_data(code)) for code, stop_id in enumerate(graph.stop_id_list))
+        return ((stop_id, graph.node_data(code).get(data, default)) for code, stop_id in enumerate(graph.stop_id_list))
+
+
+class AdjacencyView:
+    """Équivalent de G.adj : G.adj[u] est un dictionnaire {v: attributs de l'arête u -> v}."""
+
+    def __init__(self, graph):
+        self._graph = graph
+
+    def __getitem__(self, node):
+        graph = self._graph
+        code = graph.codes[node]
+        neighbors = {}
+        for edge in range(graph._indptr[code], graph._indptr[code + 1]):
+            target = graph.stop_id_list[graph._indices[edge]]
+            # Arêtes parallèles : la plus courte (la première), comme find_edge
+            if target not in neighbors:
+                neighbors[target] = graph.edge_data(edge)
+        return neighbors
@@ -0,0 +1,92 @@
+"""Index des gares par commune, construit une seule fois au chargement du graphe."""
+
+import re
+from bisect import bisect_right
+from functools import lru_cache
+
+from unidecode import unidecode
+
+NON_ALPHANUMERIC = re.compile(r"[^a-z0-9]+")
+# liste-des-gares abrège souvent (« Bordeaux St Jean ») là où le GTFS écrit le nom complet
+ABBREVIATIONS = {"st": "saint", "ste": "sainte"}
+
+
+def normalize_name(name):
+    """Clé de recherche : sans accents, en minuscules, tirets et ponctuation remplacés par des espaces."""
+    words = NON_ALPHANUMERIC.sub(" ", unidecode(str(name)).lower()).split()
+    return " ".join(ABBREVIATIONS.get(word, word) for word in words)
+
+
+class StationIndex:
+    """Associe une commune (clé normalisée) aux stop_id du graphe."""
+
+    def __init__(self, commune_stations, G, cache_size=4096):
+        # Noms de gares du graphe dédoublonnés, avec les nœuds correspondants dans l'ordre du graphe
+        stops_by_name = {}
+        for position, (stop_id, data) in enumerate(G.nodes(data=True)):
+            stops_by_name.setdefault(normalize_name(data.get("name", "")), []).append((position, stop_id))
+        self.names = list(stops_by_name)
+        self.stops_by_name = [stops_by_name[name] for name in self.names]
+
+        # Tous les noms dans une seule chaîne : une recherche de sous-chaîne se fait avec str.find (en C)
+        # ; chaque nom est entouré d'espaces pour ne trouver que des mots entiers
+        self.offsets = []
+        parts = []
+        length = 0
+        for name in self.names:
+            self.offsets.append(length)
+            parts.append(f" {name} \n")
+            length += len(name) + 3
+        self.haystack = "".join(parts)
+
+        libelles_by_commune = {}
+        for commune, libelle in zip(commune_stations["COMMUNE"], commune_stations["LIBELLE"]):
+            libelles = libelles_by_commune.setdefault(normalize_name(commune), [])
+            libelle = normalize_name(libelle)
+            if libelle not in libelles:
+                libelles.append(libelle)
+
+        self.communes = {}
+        for commune, libelles in libelles_by_commune.items():
+            stops = self._merge([self._search_names(libelle) for libelle in libelles])
+            if not stops:
+                stops = self._search_names(commune)
+            self.communes[commune] = [stop_id for _, stop_id in stops]
+
+        self._search = lru_cache(maxsize=cache_size)(self._search_names)
+
+    def _search_names(self, key):
+        """Nœuds dont le nom contient `key` (mots entiers), triés dans l'ordre du graphe."""
+        if not key:
+            return []
+        needle = f" {key} "
+        matches = []
+        position = self.haystack.find(needle)
+        while position != -1:
+            name_index = bisect_right(self.offsets, position) - 1
+            matches.extend(self.stops_by_name[name_index])
+            # Passer au nom suivant
+            next_name = self.offsets[name_index + 1] if name_index + 1 < len(self.offsets) else len(self.haystack)
+            position = self.haystack.find(needle, next_name)
+        return sorted(matches)
+
+    @staticmethod
+    def _merge(results):
+        """Concatène les résultats de plusieurs libellés sans doublons."""
+        seen = set()
+        merged = []
+        for result in results:
+            for position, stop_id in result:
+                if stop_id not in seen:
+                    seen.add(stop_id)
+                    merged.append((position, stop_id))
+        return merged
+
+    def lookup(self, city_name):
+        """Retourne les stop_id d'une commune, ou des gares dont le nom contient `city_name`, sinon None."""
+        key = normalize_name(city_name)
+        if key in self.communes:
+            stops = self.communes[key]
+        else:
+            stops = [stop_id for _, stop_id in self._search(key)]
+        return stops if stops else None
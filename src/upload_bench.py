@@ -0,0 +1,84 @@
+"""Concurrent uploads to /api/convert_audio: throughput, latency, 413/429 responses and audio pool metrics.
+
+Usage:
+    python -m src.upload_bench --file recording.webm [--concurrency 1,4,16] [--uploads 64]
+    python -m src.upload_bench --file recording.webm --url http://127.0.0.1:8000 [--concurrency 16]
+
+Without --url, the Flask app (src.app) is queried in this process through
+httpx's WSGI transport, one thread per simulated user. Every upload carries the
+same file under a different name, like users sending their own "recording.webm".
+After each run the audio pool metrics (GET /api/pools) give the deepest queue
+and the mean time spent waiting for and in the transcoding threads.
+"""
+
+import argparse
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+
+def upload(client, data, extension, number):
+    start = time.perf_counter()
+    response = client.post("/api/convert_audio", files={"file": (f"recording-{number}{extension}", data)})
+    return time.perf_counter() - start, response.status_code
+
+
+def run_uploads(client, data, extension, total, concurrency):
+    """Send `total` uploads, `concurrency` at a time; return (elapsed seconds, latencies, status counts)."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as users:
+        results = list(users.map(lambda number: upload(client, data, extension, number), range(total)))
+    elapsed = time.perf_counter() - start
+    statuses = {}
+    for _, status in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    return elapsed, [latency for latency, _ in results], statuses
+
+
+def report(label, elapsed, latencies, statuses, pool):
+    latencies = sorted(latencies)
+    print(
+        f"{label}: {len(latencies) / elapsed:.1f} fichiers/s, "
+        f"p50 {statistics.median(latencies) * 1000:.0f} ms, "
+        f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f} ms, statuts {dict(sorted(statuses.items()))}"
+    )
+    if pool:
+        print(
+            f"    pool audio (cumul) : {pool['workers']} threads, file max {pool.get('max_queued', pool.get('max_in_flight'))}, "
+            f"refusés {pool['rejected']}, attente moyenne {pool.get('mean_wait_ms', '-')} ms, "
+            f"traitement moyen {pool.get('mean_run_ms', '-')} ms"
+        )
+
+
+def run(client, data, extension, total, concurrencies):
+    for concurrency in concurrencies:
+        result = run_uploads(client, data, extension, total, concurrency)
+        response = client.get("/api/pools")
+        report(f"{concurrency} en parallèle", *result, response.json().get("audio") if response.status_code == 200 else None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", required=True, help="enregistrement m4a ou webm envoyé par chaque utilisateur")
+    parser.add_argument("--url", help="serveur déjà démarré (Flask ou uvicorn src.asgi:app)")
+    parser.add_argument("--concurrency", default="1,4,16")
+    parser.add_argument("--uploads", type=int, default=64)
+    arguments = parser.parse_args()
+
+    with open(arguments.file, "rb") as f:
+        audio = f.read()
+    extension = os.path.splitext(arguments.file)[1]
+    levels = [int(value) for value in arguments.concurrency.split(",")]
+
+    if arguments.url:
+        with httpx.Client(base_url=arguments.url, timeout=None) as http:
+            run(http, audio, extension, arguments.uploads, levels)
+    else:
+        import src.app as service
+
+        service.startup["ready"].wait()
+        with httpx.Client(transport=httpx.WSGITransport(app=service.app), base_url="http://flask", timeout=None) as http:
+            run(http, audio, extension, arguments.uploads, levels)
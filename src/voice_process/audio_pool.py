@@ -0,0 +1,79 @@
+"""Pool borné pour le décodage (ffmpeg) et la transcription des fichiers audio envoyés à l'API.
+
+Les fichiers sont traités par `workers` threads : ffmpeg tourne dans un
+sous-processus, le thread ne fait qu'attendre sa sortie. Au-delà de
+`queue_size` fichiers en cours (en traitement ou en attente), les nouveaux
+sont refusés (QueueFull) au lieu de s'accumuler dans une file sans limite.
+stats() donne la profondeur de la file et les temps d'attente et de traitement.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFull(Exception):
+    """Le pool a déjà autant de fichiers en cours qu'il en accepte."""
+
+
+class AudioPool:
+    """Pool de threads qui refuse les nouveaux fichiers quand `queue_size` sont déjà en cours."""
+
+    def __init__(self, workers, queue_size):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="audio")
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.running = 0
+        self.max_queued = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_time = 0.0
+        self.run_time = 0.0
+
+    def _run(self, submitted, function, args):
+        start = time.perf_counter()
+        with self._lock:
+            self.running += 1
+        try:
+            return function(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.in_flight -= 1
+                self.completed += 1
+                self.wait_time += start - submitted
+                self.run_time += time.perf_counter() - start
+
+    def submit(self, function, *args):
+        """Future du résultat de function(*args) ; QueueFull si le pool est plein."""
+        with self._lock:
+            if self.in_flight >= self.queue_size:
+                self.rejected += 1
+                raise QueueFull()
+            self.in_flight += 1
+            self.max_queued = max(self.max_queued, self.in_flight - self.running)
+        return self._executor.submit(self._run, time.perf_counter(), function, args)
+
+    def run(self, function, *args):
+        """Exécute function(*args) dans le pool et attend son résultat."""
+        return self.submit(function, *args).result()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "in_flight": self.in_flight,
+                "running": self.running,
+                "queued": self.in_flight - self.running,
+                "max_queued": self.max_queued,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "mean_wait_ms": round(self.wait_time / self.completed * 1000, 1) if self.completed else 0.0,
+                "mean_run_ms": round(self.run_time / self.completed * 1000, 1) if self.completed else 0.0,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
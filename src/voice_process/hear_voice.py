@@ -1,30 +1,178 @@
+import json
+import os
+import struct
+import subprocess
+import tempfile
+from functools import lru_cache
+
 import speech_recognition as sr
 from pydub import AudioSegment
-import os
 
+try:
+    import vosk
+except ImportError:  # vosk est optionnel : sans lui, seule la reconnaissance Google (en ligne) est disponible
+    vosk = None
 
-def convert_m4a_to_wav(m4a_file):
-    """Convertit un fichier m4a en wav."""
-    audio = AudioSegment.from_file(m4a_file, format="m4a")
-    wav_file = m4a_file.replace(".m4a", ".wav")
-    audio.export(wav_file, format="wav")
-    return wav_file
+# Format PCM transmis aux moteurs de reconnaissance : 16 bits, mono, 16 kHz
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+# Taille des blocs PCM lus en flux (une demi-seconde d'audio)
+CHUNK_SIZE = SAMPLE_RATE * SAMPLE_WIDTH // 2
+AUDIO_FORMATS = {".m4a": "m4a", ".webm": "webm"}
+# Éléments EBML (webm) lus pour connaître la durée sans décoder
+WEBM_DURATION = b"\x44\x89"
+WEBM_TIMECODE_SCALE = b"\x2a\xd7\xb1"
+WEBM_CLUSTER = b"\x1f\x43\xb6\x75"
 
-def convert_webm_to_wav(webm_file):
-    """Convertit un fichier webm en wav."""
-    audio = AudioSegment.from_file(webm_file, format="webm")
-    wav_file = webm_file.replace(".webm", ".wav")
-    audio.export(wav_file, format="wav")
-    return wav_file
 
+class AudioRejected(ValueError):
+    """Fichier audio refusé avant décodage : trop gros ou trop long."""
 
-def transcribe_audio(file_path):
-    """Transcrit le texte à partir d'un fichier audio (wav)."""
-    recognizer = sr.Recognizer()
 
-    # Charger le fichier wav
-    with sr.AudioFile(file_path) as source:
-        audio = recognizer.record(source)
+class SpeechUnavailable(RuntimeError):
+    """Moteur de reconnaissance demandé indisponible sur ce serveur (paquet vosk ou modèle absent)."""
+
+
+def audio_format(filename):
+    """Format audio déduit de l'extension (m4a ou webm), ou None s'il n'est pas supporté."""
+    return AUDIO_FORMATS.get(os.path.splitext(filename)[1].lower())
+
+
+def ffmpeg_command(source="pipe:0"):
+    """Commande ffmpeg qui décode `source` en PCM brut sur sa sortie standard."""
+    return [
+        AudioSegment.converter, "-hide_banner", "-loglevel", "error", "-i", source,
+        "-f", "s16le", "-acodec", "pcm_s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1",
+    ]
+
+
+def index_at_end(data):
+    """Vrai si l'index d'un m4a (atome moov) suit les données audio (atome mdat) : ffmpeg ne peut pas le lire dans un tube."""
+    moov, mdat = data.find(b"moov"), data.find(b"mdat")
+    return moov == -1 or (mdat != -1 and moov > mdat)
+
+
+def ebml_element(data, element_id, end):
+    """Contenu (octets) du premier élément EBML `element_id` avant la position `end`, ou None."""
+    position = data.find(element_id, 0, end)
+    if position == -1 or position + len(element_id) >= len(data):
+        return None
+    start = position + len(element_id)
+    # La taille est un entier de longueur variable : le premier bit à 1 donne sa longueur
+    first = data[start]
+    length = 9 - first.bit_length()
+    if not 1 <= length <= 8:
+        return None
+    size = int.from_bytes(bytes([first & (0xFF >> length)]) + data[start + 1:start + length], "big")
+    return data[start + length:start + length + size]
+
+
+def audio_duration(data, audio_format):
+    """
+    Durée en secondes lue dans l'en-tête du fichier (atome mvhd du m4a, élément
+    Duration du webm), sans décoder l'audio. None si l'en-tête ne la donne pas,
+    ValueError s'il est tronqué.
+    """
+    if audio_format == "m4a":
+        position = data.find(b"mvhd")
+        if position == -1:
+            return None
+        try:
+            if data[position + 4] == 1:
+                # Version 1 : dates et durée sur 64 bits
+                timescale, duration = struct.unpack_from(">IQ", data, position + 24)
+            else:
+                timescale, duration = struct.unpack_from(">II", data, position + 16)
+        except (IndexError, struct.error):
+            raise ValueError("En-tête m4a tronqué") from None
+        return duration / timescale if timescale else None
+
+    # webm : la durée est dans Segment Info, avant le premier Cluster
+    end = data.find(WEBM_CLUSTER)
+    end = len(data) if end == -1 else end
+    duration = ebml_element(data, WEBM_DURATION, end)
+    if duration is None or len(duration) not in (4, 8):
+        return None
+    scale = ebml_element(data, WEBM_TIMECODE_SCALE, end)
+    scale = int.from_bytes(scale, "big") if scale else 1000000
+    return struct.unpack(">f" if len(duration) == 4 else ">d", duration)[0] * scale / 1e9
+
+
+def check_audio(data, audio_format, max_bytes=None, max_seconds=None):
+    """Refuse (AudioRejected) un fichier plus gros que `max_bytes` ou plus long que `max_seconds`, avant décodage."""
+    if max_bytes is not None and len(data) > max_bytes:
+        raise AudioRejected(f"Fichier audio trop volumineux ({len(data)} octets, maximum {max_bytes}).")
+    if max_seconds is not None:
+        duration = audio_duration(data, audio_format)
+        if duration is not None and duration > max_seconds:
+            raise AudioRejected(f"Enregistrement trop long ({duration:.0f} s, maximum {max_seconds} s).")
+
+
+def decode_audio(data, audio_format, max_seconds=None):
+    """
+    Décode un fichier audio (octets m4a ou webm) en PCM, en mémoire : ffmpeg lit et écrit dans des tubes.
+    Avec `max_seconds`, ffmpeg s'arrête à cette durée et un enregistrement plus long est refusé
+    (cas des fichiers dont l'en-tête ne donne pas la durée).
+    """
+    command = ffmpeg_command
+    if max_seconds is not None:
+        # Une trame de plus que la limite : suffit pour savoir si l'enregistrement la dépasse
+        def command(source="pipe:0"):
+            return ffmpeg_command(source)[:-1] + ["-t", str(max_seconds + 0.1), "pipe:1"]
+
+    if audio_format == "m4a" and index_at_end(data):
+        # ffmpeg doit pouvoir se déplacer dans le fichier : seul cas où il est écrit sur disque
+        with tempfile.NamedTemporaryFile(suffix=".m4a") as f:
+            f.write(data)
+            f.flush()
+            result = subprocess.run(command(f.name), capture_output=True)
+    else:
+        result = subprocess.run(command(), input=data, capture_output=True)
+    if result.returncode != 0 or not result.stdout:
+        raise ValueError(f"Décodage audio impossible : {result.stderr.decode(errors='replace').strip()}")
+    if max_seconds is not None and len(result.stdout) > max_seconds * SAMPLE_RATE * SAMPLE_WIDTH:
+        raise AudioRejected(f"Enregistrement trop long (maximum {max_seconds} s).")
+    return result.stdout
+
+
+@lru_cache(maxsize=2)
+def load_vosk_model(model_path):
+    """Modèle Vosk chargé une seule fois par processus."""
+    if vosk is None:
+        raise SpeechUnavailable("La reconnaissance hors ligne nécessite le paquet vosk.")
+    # Sans chemin, vosk.Model essaierait de télécharger un modèle
+    if not model_path or not os.path.isdir(model_path):
+        raise SpeechUnavailable(f"Modèle Vosk introuvable (VOSK_MODEL_PATH = {model_path!r}).")
+    vosk.SetLogLevel(-1)
+    return vosk.Model(model_path)
+
+
+def transcribe_stream(pcm_chunks, model_path):
+    """
+    Reconnaissance hors ligne (Vosk) d'un flux PCM : génère le texte de chaque
+    phrase dès qu'elle est terminée, puis celui de la fin de l'enregistrement.
+    """
+    # Chargé d'abord : sans le paquet vosk, load_vosk_model donne une erreur explicite
+    model = load_vosk_model(model_path)
+    recognizer = vosk.KaldiRecognizer(model, SAMPLE_RATE)
+    for pcm in pcm_chunks:
+        if recognizer.AcceptWaveform(pcm):
+            text = json.loads(recognizer.Result()).get("text", "")
+            if text:
+                yield text
+    text = json.loads(recognizer.FinalResult()).get("text", "")
+    if text:
+        yield text
+
+
+def transcribe_pcm(pcm, backend="google", model_path=None):
+    """Transcrit du PCM 16 bits mono 16 kHz avec Google (en ligne) ou Vosk (hors ligne, `model_path`)."""
+    if backend == "vosk":
+        chunks = (pcm[start:start + CHUNK_SIZE] for start in range(0, len(pcm), CHUNK_SIZE))
+        return " ".join(transcribe_stream(chunks, model_path)) or None
+
+    recognizer = sr.Recognizer()
+    audio = sr.AudioData(pcm, SAMPLE_RATE, SAMPLE_WIDTH)
     try:
         text = recognizer.recognize_google(audio, language="fr-FR")
         return text
@@ -35,20 +183,14 @@ def transcribe_audio(file_path):
     return None
 
 
-def process_m4a_file(file):
-    """Processus complet pour convertir un fichier m4a en texte."""
-
-    if file.endswith(".m4a"):
-        wav_file = convert_m4a_to_wav(file)
-    elif file.endswith(".webm"):
-        wav_file = convert_webm_to_wav(file)
-    else : 
+def process_audio(data, filename, backend="google", model_path=None, max_bytes=None, max_seconds=None):
+    """
+    Processus complet en mémoire : octets d'un fichier m4a ou webm -> texte, sans fichier wav.
+    Les limites de taille et de durée sont vérifiées avant décodage (AudioRejected).
+    """
+    fmt = audio_format(filename)
+    if fmt is None:
         return "Format du fichier non supporté"
+    check_audio(data, fmt, max_bytes, max_seconds)
+    return transcribe_pcm(decode_audio(data, fmt, max_seconds), backend, model_path)
 
-    # Transcrire le fichier audio wav
-    text = transcribe_audio(wav_file)
-
-    # Supprimer le fichier wav temporaire
-    os.remove(wav_file)
-
-    return text
@@ -0,0 +1,69 @@
+"""Validation des corps de requête de l'API Flask (src/app.py), avant tout calcul."""
+
+import io
+
+import pytest
+
+# src.app lit config.py (voir le README)
+pytest.importorskip("config")
+
+import src.app as service  # noqa: E402
+
+
+def test_batch_texts_must_be_a_list():
+    payload, status = service.route_batch_response({"texts": "je veux aller de paris à lyon"})
+    assert status == 400
+    assert "error" in payload
+
+
+@pytest.mark.parametrize("item", [42, None, {"text": "je veux aller de paris à lyon"}])
+def test_batch_texts_must_be_strings(item):
+    payload, status = service.route_batch_response({"texts": ["je veux aller de paris à lyon", item]})
+    assert status == 400
+    assert "error" in payload
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, False), (False, False), (True, True), ("", False),
+    ("false", False), ("0", False), ("off", False), ("true", True), ("1", True), ("ON", True),
+])
+def test_pareto_flag(value, expected):
+    assert service.parse_flag(value) is expected
+
+
+@pytest.mark.parametrize("value", ["maybe", 1, [], {}])
+def test_pareto_flag_rejected(value):
+    payload, status = service.route_response({"text": "je veux aller de paris à lyon", "pareto": value})
+    assert status == 400
+    assert payload == {"error": service.PARETO_ERROR}
+    payload, status = service.route_batch_response({"texts": ["je veux aller de paris à lyon"], "pareto": value})
+    assert status == 400
+    assert payload == {"error": service.PARETO_ERROR}
+
+
+class FailedTranscription:
+    """Future d'une transcription qui a échoué (voir src.voice_process.audio_pool)."""
+
+    def __init__(self, error):
+        self.error = error
+
+    def result(self):
+        raise self.error
+
+
+def test_convert_audio_without_vosk(monkeypatch):
+    def transcribe_upload(data, filename):
+        raise service.SpeechUnavailable("La reconnaissance hors ligne nécessite le paquet vosk.")
+
+    # Ni le modèle ni le graphe ne servent ici : inutile d'attendre leur chargement
+    monkeypatch.setattr(service, "is_ready", lambda: True)
+    monkeypatch.setattr(service, "transcribe_upload", transcribe_upload)
+    response = service.app.test_client().post("/api/convert_audio", data={"file": (io.BytesIO(b"audio"), "rec.wav")})
+    assert response.status_code == 503
+    assert "vosk" in response.get_json()["error"]
+
+
+def test_voice_route_events_without_vosk():
+    error = service.SpeechUnavailable("La reconnaissance hors ligne nécessite le paquet vosk.")
+    events = list(service.voice_route_events(FailedTranscription(error)))
+    assert events[-1] == service.sse("error", {"error": str(error)})
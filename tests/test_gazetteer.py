@@ -0,0 +1,50 @@
+"""Gazetteer des gares autour du NER (src/models/gazetteer.py), sur un pipeline fr vierge."""
+
+import pytest
+import spacy
+
+# src.data_process.utils lit config.py (voir le README)
+pytest.importorskip("config")
+
+from src.models.gazetteer import SPANS_KEY, add_station_gazetteer, name_variants  # noqa: E402
+
+NAMES = ["Saint-Pierre-des-Corps", "Tours", "Saint-Étienne", "Lyon"]
+
+
+@pytest.fixture
+def nlp():
+    """Pipeline fr vierge : un entity_ruler nommé "ner" tient lieu de modèle NER qui coupe les noms."""
+    nlp = spacy.blank("fr")
+    ner = nlp.add_pipe("entity_ruler", name="ner")
+    ner.add_patterns([
+        {"label": "DEPART", "pattern": "saint"},
+        {"label": "DEPART", "pattern": "pierre des corps"},
+        {"label": "ARRIVEE", "pattern": "tours"},
+    ])
+    return add_station_gazetteer(nlp, NAMES)
+
+
+def entities(doc):
+    return [(ent.text, ent.label_) for ent in doc.ents]
+
+
+def test_pipeline_order(nlp):
+    assert nlp.pipe_names == ["station_gazetteer", "ner", "station_entities"]
+
+
+def test_fragments_merge_into_station(nlp):
+    text = "je pars de saint pierre des corps pour tours"
+    with nlp.select_pipes(disable=["station_entities"]):
+        assert entities(nlp(text)) == [("saint", "DEPART"), ("pierre des corps", "DEPART"), ("tours", "ARRIVEE")]
+    doc = nlp(text)
+    assert entities(doc) == [("saint pierre des corps", "DEPART"), ("tours", "ARRIVEE")]
+
+
+def test_name_variants():
+    assert set(name_variants("Saint-Étienne")) == {"saint-étienne", "saint-etienne", "saint étienne", "saint etienne"}
+
+
+@pytest.mark.parametrize("name", ["saint etienne", "saint-etienne", "Saint Étienne", "saint pierre des corps"])
+def test_accent_and_hyphen_free_variants_match(nlp, name):
+    doc = nlp(f"je vais a {name} depuis lyon")
+    assert [span.text for span in doc.spans[SPANS_KEY]] == [name, "lyon"]
@@ -0,0 +1,31 @@
+"""Normalisation des textes : sorties de référence de golden_normalization.json."""
+
+import json
+
+import pytest
+
+# src.data_process.utils lit config.py (voir le README)
+pytest.importorskip("config")
+
+from src.data_process.check_normalization import GOLDEN_PATH  # noqa: E402
+from src.data_process.utils.normalization import clean_word, clean_words, simple_cleaning, simple_cleanings  # noqa: E402
+
+with open(GOLDEN_PATH, encoding="utf-8") as f:
+    GOLDEN = json.load(f)
+
+
+@pytest.mark.parametrize("word, expected", GOLDEN["clean_word"])
+def test_clean_word(word, expected):
+    assert clean_word(word) == expected
+
+
+@pytest.mark.parametrize("phrase, expected", GOLDEN["simple_cleaning"])
+def test_simple_cleaning(phrase, expected):
+    assert simple_cleaning(phrase) == expected
+
+
+def test_batch_forms_match():
+    words, expected_words = zip(*GOLDEN["clean_word"])
+    phrases, expected_phrases = zip(*GOLDEN["simple_cleaning"])
+    assert clean_words(list(words)) == list(expected_words)
+    assert simple_cleanings(list(phrases)) == list(expected_phrases)
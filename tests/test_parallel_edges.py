@@ -0,0 +1,65 @@
+"""Recherche d'itinéraire sur un graphe qui garde tous les voyages entre deux arrêts."""
+
+import networkx as nx
+import pytest
+
+from src.path_finding.contraction import path_weight
+from src.path_finding.dijkstra import load_and_merge_data, build_station_graph, shortest_path_search
+from src.path_finding.stations import StationIndex
+
+# Paris → Lyon : durée minimale sur les horaires fournis, et celle obtenue quand le dernier
+# voyage inséré entre deux arrêts écrasait les précédents
+PARIS_LYON_SECONDS = 15720
+PARIS_LYON_LAST_TRIP_SECONDS = 16560
+
+
+@pytest.fixture(scope="module")
+def network():
+    stops, stop_times, trips, routes, _, commune_stations = load_and_merge_data()
+    graphique = build_station_graph(stops, stop_times, trips, routes)
+    return stops, stop_times, graphique, StationIndex(commune_stations, graphique)
+
+
+def reference_connections(stops, stop_times):
+    """
+    Graphe de référence construit ligne par ligne, indépendamment de build_station_graph : une
+    arête par voyage entre deux arrêts consécutifs (nx.MultiDiGraph) et les correspondances
+    entre arrêts d'une même gare.
+    """
+    reference = nx.MultiDiGraph()
+    previous = None
+    rows = stop_times.sort_values(by=["trip_id", "stop_sequence"])
+    for trip_id, stop_id, arrival, departure in zip(
+        rows["trip_id"].astype(str), rows["stop_id"].astype(str), rows["arrival_time"], rows["departure_time"]
+    ):
+        if previous is not None and previous[0] == trip_id and arrival - previous[2] > 0:
+            reference.add_edge(previous[1], stop_id, weight=int(arrival - previous[2]), trip_id=trip_id)
+        previous = (trip_id, stop_id, departure)
+
+    areas = {}
+    for stop_id, parent in zip(stops["stop_id"], stops["parent_station"]):
+        if stop_id in reference and isinstance(parent, str):
+            areas.setdefault(parent, []).append(stop_id)
+    for members in areas.values():
+        reference.add_edges_from((u, v, {"weight": 0}) for u in members for v in members if u != v)
+    return reference
+
+
+def distance(G, sources, targets):
+    lengths = nx.multi_source_dijkstra_path_length(G, [node for node in sources if node in G])
+    return min(lengths[node] for node in targets if node in lengths)
+
+
+def test_paris_lyon_keeps_fastest_trip(network):
+    _, _, graphique, index = network
+    path, _ = shortest_path_search(graphique, index.lookup("Paris"), index.lookup("Lyon"))
+    assert path_weight(graphique, path) == PARIS_LYON_SECONDS
+
+
+def test_paris_lyon_matches_reference(network):
+    stops, stop_times, _, index = network
+    reference = reference_connections(stops, stop_times)
+    sources, targets = index.lookup("Paris"), index.lookup("Lyon")
+    assert distance(reference, sources, targets) == PARIS_LYON_SECONDS
+    # Sans les arêtes parallèles, le dernier voyage inséré l'emporte
+    assert distance(nx.DiGraph(reference), sources, targets) == PARIS_LYON_LAST_TRIP_SECONDS